@@ -0,0 +1,109 @@
+"""Page view: lazy layout, keystroke cost by page, thumbnails and PDF export.
+
+    python benchmarks/bench_pages.py [--paragraphs 6000] [--keys 40] [--json out.json]
+
+Loads a generated document into a PageView, then prints as JSON how long
+the first paint takes and how many pages it laid out, the median cost
+of a keystroke (layout and repaint) on page 1, the middle page and page
+300, one page thumbnail, and a PDF export from the page view's layout
+against one that lays a clone out again.
+"""
+import argparse
+import json
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from PySide6.QtWidgets import QApplication
+from PySide6.QtGui import QTextCursor
+
+from ui.page_view import PageView
+from utils.pdf_export import print_to_pdf
+
+
+def make_html(paragraphs: int) -> str:
+    body = "".join(
+        f"<p>Paragraph {i}: the quick brown fox jumps over the lazy dog. "
+        + "Lorem ipsum dolor sit amet, consectetur adipiscing elit. " * 5
+        + "<b>Bold words</b> and <i>italics</i>.</p>"
+        for i in range(paragraphs))
+    return f"<html><body>{body}</body></html>"
+
+
+def keystroke_ms(app, view: PageView, page: int, keys: int) -> float:
+    """Median time to type one character at the end of the first block on `page`."""
+    doc = view.document()
+    layout = doc.documentLayout()
+    block = doc.begin()
+    while block.isValid() and layout.blockBoundingRect(block).top() < page * view.page_size().height():
+        block = block.next()
+    cursor = QTextCursor(block)
+    cursor.movePosition(QTextCursor.EndOfBlock)
+    view.setTextCursor(cursor)
+    view.ensureCursorVisible()
+    app.processEvents()
+    times = []
+    for _ in range(keys):
+        t0 = time.perf_counter()
+        view.textCursor().insertText("x")
+        app.processEvents()
+        times.append((time.perf_counter() - t0) * 1000)
+    return round(statistics.median(times), 3)
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--paragraphs", type=int, default=6000)
+    parser.add_argument("--keys", type=int, default=40, help="keystrokes per page measured")
+    parser.add_argument("--json", help="also write the results to this file")
+    args = parser.parse_args(argv)
+
+    app = QApplication.instance() or QApplication(["bench"])
+    view = PageView()
+    view.resize(1100, 800)
+    view.set_page_mode(True)
+    view.show()
+    app.processEvents()
+    html = make_html(args.paragraphs)
+    results = {"paragraphs": args.paragraphs}
+
+    t0 = time.perf_counter()
+    view.setHtml(html)
+    app.processEvents()
+    results["first_paint_s"] = round(time.perf_counter() - t0, 4)
+    results["pages_at_first_paint"] = view.page_count()
+    t0 = time.perf_counter()
+    pages = view.document().pageCount()
+    results["full_layout_s"] = round(time.perf_counter() - t0, 4)
+    results["pages"] = pages
+
+    results["keystroke_ms"] = {
+        str(page + 1): keystroke_ms(app, view, page, args.keys)
+        for page in sorted({0, pages // 2, min(299, pages - 1)})
+    }
+
+    t0 = time.perf_counter()
+    view.render_page(pages // 2, 120)
+    results["thumbnail_ms"] = round((time.perf_counter() - t0) * 1000, 3)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        results["pdf_reused_layout"] = print_to_pdf(view.document(), os.path.join(tmp, "a.pdf"), reuse_layout=True)
+        clone = view.document().clone()
+        results["pdf_relaid_out"] = print_to_pdf(clone, os.path.join(tmp, "b.pdf"))
+
+    out = json.dumps(results, indent=2)
+    print(out)
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            f.write(out + "\n")
+    view.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
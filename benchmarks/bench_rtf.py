@@ -0,0 +1,100 @@
+"""RTF reader/writer against the HTML path for the same document.
+
+    python benchmarks/bench_rtf.py [--paragraphs 20000] [--json out.json]
+
+Writes a generated document as .rtf and as .html, reads both back and
+prints times, file sizes and the Python heap peak of each step as JSON.
+Memory is measured in a second pass: tracemalloc slows the parser down
+several times over.
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from PySide6.QtGui import QGuiApplication, QTextDocument, QTextCursor, QTextCharFormat, QFont, QColor
+
+from utils.rtf import read_rtf, rtf_to_text, write_rtf
+
+
+def make_document(paragraphs: int) -> QTextDocument:
+    doc = QTextDocument()
+    cursor = QTextCursor(doc)
+    plain = QTextCharFormat()
+    bold = QTextCharFormat()
+    bold.setFontWeight(QFont.Bold)
+    colored = QTextCharFormat()
+    colored.setForeground(QColor(200, 40, 40))
+    colored.setFontItalic(True)
+    for i in range(paragraphs):
+        if i:
+            cursor.insertBlock()
+        cursor.insertText(f"Paragraph {i}: the quick brown fox jumps over the lazy dog. ", plain)
+        cursor.insertText("Bold words", bold)
+        cursor.insertText(" and ", plain)
+        cursor.insertText("red italics — ünïcödé", colored)
+        cursor.insertText(".", plain)
+    return doc
+
+
+def measure(fn):
+    t0 = time.perf_counter()
+    fn()
+    elapsed = time.perf_counter() - t0
+    tracemalloc.start()
+    fn()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return {"s": round(elapsed, 4), "py_peak_mb": round(peak / 1e6, 2)}
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--paragraphs", type=int, default=20000)
+    parser.add_argument("--json", help="also write the results to this file")
+    args = parser.parse_args(argv)
+
+    app = QGuiApplication.instance() or QGuiApplication(["bench"])
+    doc = make_document(args.paragraphs)
+    results = {"paragraphs": args.paragraphs, "chars": doc.characterCount()}
+    with tempfile.TemporaryDirectory() as tmp:
+        rtf_path = os.path.join(tmp, "doc.rtf")
+        html_path = os.path.join(tmp, "doc.html")
+
+        def write_html():
+            with open(html_path, "w", encoding="utf-8") as f:
+                f.write(doc.toHtml())
+
+        def read_html():
+            with open(html_path, "r", encoding="utf-8") as f:
+                QTextDocument().setHtml(f.read())
+
+        results["write_rtf"] = measure(lambda: write_rtf(doc, rtf_path))
+        results["write_html"] = measure(write_html)
+        results["read_rtf"] = measure(lambda: read_rtf(rtf_path, QTextDocument()))
+        results["read_html"] = measure(read_html)
+        results["rtf_to_text"] = measure(lambda: rtf_to_text(rtf_path))
+        results["rtf_bytes"] = os.path.getsize(rtf_path)
+        results["html_bytes"] = os.path.getsize(html_path)
+
+        check = QTextDocument()
+        read_rtf(rtf_path, check)
+        results["round_trip_ok"] = check.toPlainText() == doc.toPlainText()
+
+    out = json.dumps(results, indent=2)
+    print(out)
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            f.write(out + "\n")
+    del app
+    return 0 if results["round_trip_ok"] else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
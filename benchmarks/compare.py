@@ -0,0 +1,67 @@
+"""Compare two hot_paths.py result files.
+
+    python benchmarks/compare.py before.json after.json [--threshold 0.2]
+
+Prints the median time and peak RSS of every step for both runs. Exits
+with 1 when a step got slower (or used more memory) than the threshold
+allows, so it can gate a CI job.
+"""
+import argparse
+import json
+import sys
+
+# Steps faster than this are dominated by timer noise and never flagged
+MIN_MS = 1.0
+
+
+def _load(path: str) -> dict:
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def _ratio(old: float, new: float) -> float:
+    return new / old if old else 1.0
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Compare two benchmark result files")
+    parser.add_argument("before")
+    parser.add_argument("after")
+    parser.add_argument("--threshold", type=float, default=0.2,
+                        help="allowed slowdown as a fraction (default: %(default)s)")
+    args = parser.parse_args(argv)
+
+    old, new = _load(args.before), _load(args.after)
+    print(f"before {old.get('commit') or '?'}  after {new.get('commit') or '?'}")
+    regressions = []
+    for size, after in new.get("sizes", {}).items():
+        before = old.get("sizes", {}).get(size)
+        if before is None:
+            continue
+        print(f"\n{size} documents")
+        print(f"  {'step':<34} {'before ms':>10} {'after ms':>10} {'ratio':>7}")
+        for name, s in after["steps"].items():
+            b = before["steps"].get(name)
+            if not b or "median_ms" not in b or "median_ms" not in s:
+                continue
+            r = _ratio(b["median_ms"], s["median_ms"])
+            flag = ""
+            if r > 1 + args.threshold and s["median_ms"] >= MIN_MS:
+                flag = "  <-- slower"
+                regressions.append(f"{size}/{name}")
+            print(f"  {name:<34} {b['median_ms']:>10.2f} {s['median_ms']:>10.2f} {r:>6.2f}x{flag}")
+        r = _ratio(before["rss_peak_mb"], after["rss_peak_mb"])
+        flag = ""
+        if r > 1 + args.threshold:
+            flag = "  <-- more memory"
+            regressions.append(f"{size}/rss_peak_mb")
+        print(f"  {'peak RSS (MB)':<34} {before['rss_peak_mb']:>10.1f} {after['rss_peak_mb']:>10.1f} {r:>6.2f}x{flag}")
+
+    if regressions:
+        print(f"\n{len(regressions)} regression(s): {', '.join(regressions)}")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
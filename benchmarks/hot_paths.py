@@ -0,0 +1,395 @@
+"""Offscreen benchmarks for the open, save, export, thumbnail and home paths.
+
+    python benchmarks/hot_paths.py                      # 100, 1000 and 10000 documents
+    python benchmarks/hot_paths.py --sizes 100,1000 -o before.json
+    python benchmarks/compare.py before.json after.json
+
+Every library size runs in a fresh process with its own HOME, so caches,
+recents and the search index start empty and peak RSS belongs to that size
+alone. The library is generated in ~/.winpages/documents: mostly small
+documents, some medium ones and a few large enough for progressive loading,
+spread over .html, .txt, .wpg and .rtf.
+
+Results go to benchmarks/results/<time>-<commit>.json unless -o is given.
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+RESULTS_DIR = os.path.join(ROOT, "benchmarks", "results")
+DEFAULT_SIZES = (100, 1000, 10000)
+
+# (share of the library, min bytes, max bytes); large ones are capped in count
+SIZE_CLASSES = {
+    "small": (0.80, 1 * 1024, 4 * 1024),
+    "medium": (0.19, 16 * 1024, 64 * 1024),
+    "large": (0.01, 1200 * 1024, 1600 * 1024),
+}
+MAX_LARGE = 12
+KINDS = (("html", 0.5), ("txt", 0.2), ("wpg", 0.2), ("rtf", 0.1))
+# Containers are slow to build, so each (kind, size) gets this many variants that are copied around
+VARIANTS = 6
+
+WORDS = ("lorem ipsum dolor sit amet consectetur adipiscing elit sed do eiusmod tempor incididunt "
+         "ut labore et dolore magna aliqua quarterly report budget meeting notes draft chapter "
+         "invoice summary project roadmap review").split()
+
+
+def peak_rss_mb() -> float:
+    """Peak resident set size of this process so far, in MB."""
+    try:
+        import resource
+    except ImportError:
+        return _windows_peak_rss_mb()
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # bytes on macOS, kilobytes elsewhere
+    return round(peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024, 1)
+
+
+def _windows_peak_rss_mb() -> float:
+    import ctypes
+    from ctypes import wintypes
+
+    class PROCESS_MEMORY_COUNTERS(ctypes.Structure):
+        _fields_ = [("cb", wintypes.DWORD), ("PageFaultCount", wintypes.DWORD),
+                    ("PeakWorkingSetSize", ctypes.c_size_t), ("WorkingSetSize", ctypes.c_size_t),
+                    ("QuotaPeakPagedPoolUsage", ctypes.c_size_t), ("QuotaPagedPoolUsage", ctypes.c_size_t),
+                    ("QuotaPeakNonPagedPoolUsage", ctypes.c_size_t), ("QuotaNonPagedPoolUsage", ctypes.c_size_t),
+                    ("PagefileUsage", ctypes.c_size_t), ("PeakPagefileUsage", ctypes.c_size_t)]
+
+    counters = PROCESS_MEMORY_COUNTERS()
+    counters.cb = ctypes.sizeof(counters)
+    handle = ctypes.windll.kernel32.GetCurrentProcess()
+    ctypes.windll.psapi.GetProcessMemoryInfo(handle, ctypes.byref(counters), counters.cb)
+    return round(counters.PeakWorkingSetSize / (1024 * 1024), 1)
+
+
+def summarize(samples):
+    """Timing stats in milliseconds for a list of durations in seconds."""
+    ms = sorted(s * 1000 for s in samples)
+    if not ms:
+        return {"n": 0}
+    return {
+        "n": len(ms),
+        "total_s": round(sum(ms) / 1000, 4),
+        "mean_ms": round(statistics.fmean(ms), 3),
+        "median_ms": round(statistics.median(ms), 3),
+        "p95_ms": round(ms[min(len(ms) - 1, int(len(ms) * 0.95))], 3),
+        "max_ms": round(ms[-1], 3),
+    }
+
+
+# -- library generation ----------------------------------------------------
+
+def _paragraphs(rng: random.Random, size: int):
+    total = 0
+    while total < size:
+        p = " ".join(rng.choice(WORDS) for _ in range(rng.randint(30, 120))).capitalize() + "."
+        total += len(p) + 1
+        yield p
+
+
+def _html(rng: random.Random, size: int, title: str) -> str:
+    parts = [f"<h1>{title}</h1>"]
+    for i, p in enumerate(_paragraphs(rng, size)):
+        if i % 7 == 3:
+            words = p.split(" ")
+            p = " ".join(words[:5]) + " <b>" + " ".join(words[5:9]) + "</b> " + " ".join(words[9:])
+        parts.append(f"<p>{p}</p>")
+    return "<html><body>" + "".join(parts) + "</body></html>"
+
+
+def _plan(n: int, rng: random.Random):
+    """(kind, size class, target bytes) for each document of the library."""
+    plan = []
+    large = 0
+    for _ in range(n):
+        r = rng.random()
+        acc = 0.0
+        cls = "small"
+        for name, (share, _, _) in SIZE_CLASSES.items():
+            acc += share
+            if r < acc:
+                cls = name
+                break
+        if cls == "large":
+            if large >= MAX_LARGE:
+                cls = "medium"
+            else:
+                large += 1
+        r = rng.random()
+        acc = 0.0
+        kind = KINDS[-1][0]
+        for name, share in KINDS:
+            acc += share
+            if r < acc:
+                kind = name
+                break
+        _, lo, hi = SIZE_CLASSES[cls]
+        plan.append((kind, cls, rng.randint(lo, hi)))
+    return plan
+
+
+def generate_library(n: int, docs_dir: str, seed: int = 1):
+    from PySide6.QtGui import QTextDocument
+    from utils.wpg import write_wpg
+    from utils.rtf import write_rtf
+    from utils.thumbnails import render_thumbnail_image
+
+    rng = random.Random(seed)
+    variants = {}
+    paths = []
+    for i, (kind, cls, size) in enumerate(_plan(n, rng)):
+        title = f"Document {i}"
+        path = os.path.join(docs_dir, f"doc{i:05d}-{cls}.{kind}")
+        if kind == "html":
+            with open(path, "w", encoding="utf-8") as f:
+                f.write(_html(rng, size, title))
+        elif kind == "txt":
+            with open(path, "w", encoding="utf-8") as f:
+                f.write(title + "\n\n" + "\n".join(_paragraphs(rng, size)))
+        else:
+            key = (kind, cls, i % VARIANTS)
+            src = variants.get(key)
+            if src is None:
+                doc = QTextDocument()
+                doc.setHtml(_html(rng, size, title))
+                if kind == "wpg":
+                    write_wpg(path, doc, render_thumbnail_image(doc.toHtml(), True, doc))
+                else:
+                    write_rtf(doc, path)
+                variants[key] = path
+            else:
+                shutil.copyfile(src, path)
+        paths.append((path, kind, cls))
+    return paths
+
+
+# -- one library size, in its own process -----------------------------------
+
+def _wait(app, done, timeout: float = 120.0):
+    deadline = time.perf_counter() + timeout
+    while not done():
+        if time.perf_counter() > deadline:
+            raise TimeoutError("benchmark step did not finish")
+        app.processEvents()
+        time.sleep(0.001)
+
+
+def run_size(n: int, sample: int, exports: int) -> dict:
+    """Generate a library of `n` documents under $HOME and time the hot paths."""
+    from PySide6.QtWidgets import QApplication
+    app = QApplication.instance() or QApplication(["winpages-bench"])
+
+    from utils.document_store import app_documents_dir, touch_recent, flush_recents
+    from utils.thumbnails import cached_thumbnail, ensure_thumbnail_for_file, thumbnail_cache_bytes
+    from utils.search_index import search_index
+    import ui.editor as editor_module
+    from ui.editor import EditorWindow
+    from ui.home import HomeWindow
+
+    rng = random.Random(2)
+    results = {"documents": n, "steps": {}}
+    steps = results["steps"]
+
+    def step(name: str, samples, **extra):
+        steps[name] = {**summarize(samples), **extra, "rss_peak_mb": peak_rss_mb()}
+
+    docs_dir = app_documents_dir()
+    t0 = time.perf_counter()
+    library = generate_library(n, docs_dir)
+    results["generate_s"] = round(time.perf_counter() - t0, 2)
+    results["library_mb"] = round(sum(os.path.getsize(p) for p, _, _ in library) / 1e6, 1)
+    results["rss_baseline_mb"] = peak_rss_mb()
+
+    # Every document lands in recents once, as after importing the library
+    samples = []
+    for path, _, _ in library:
+        t = time.perf_counter()
+        touch_recent(path)
+        samples.append(time.perf_counter() - t)
+    t = time.perf_counter()
+    flush_recents()
+    step("touch_recent", samples, flush_ms=round((time.perf_counter() - t) * 1000, 3))
+
+    # A sample spread over all kinds and size classes, large ones always included
+    large = [d for d in library if d[2] == "large"]
+    rest = [d for d in library if d[2] != "large"]
+    picked = large[:sample] + rng.sample(rest, min(len(rest), max(0, sample - len(large))))
+
+    samples = [0.0] * len(picked)
+    for i, (path, _, _) in enumerate(picked):
+        t = time.perf_counter()
+        ensure_thumbnail_for_file(path)
+        samples[i] = time.perf_counter() - t
+    step("ensure_thumbnail_for_file.cold", samples)
+    # Same documents again: should be cache lookups only
+    samples = [0.0] * len(picked)
+    hits = 0
+    for i, (path, _, _) in enumerate(picked):
+        hits += cached_thumbnail(path) is not None
+        t = time.perf_counter()
+        ensure_thumbnail_for_file(path)
+        samples[i] = time.perf_counter() - t
+    step("ensure_thumbnail_for_file.warm", samples, hits=hits, cache_mb=round(thumbnail_cache_bytes() / 1e6, 1))
+
+    # Opening and saving go through one editor, like a user going from file to file
+    editor = EditorWindow()
+    opened = {}
+    for path, kind, cls in picked:
+        t = time.perf_counter()
+        editor.open_file(path)
+        _wait(app, lambda: editor._loader is None)
+        opened.setdefault(f"{kind}.{cls}", []).append(time.perf_counter() - t)
+        out = os.path.splitext(path)[0] + "-saved." + kind
+        t = time.perf_counter()
+        editor._save_to(out)
+        opened.setdefault(f"save.{kind}.{cls}", []).append(time.perf_counter() - t)
+    step("open_file", [s for k, v in opened.items() if not k.startswith("save.") for s in v],
+         by_kind={k: summarize(v) for k, v in sorted(opened.items()) if not k.startswith("save.")})
+    step("_save_to", [s for k, v in opened.items() if k.startswith("save.") for s in v],
+         by_kind={k[5:]: summarize(v) for k, v in sorted(opened.items()) if k.startswith("save.")})
+
+    # export_pdf asks for a file name; answer it without a dialog
+    export_dir = tempfile.mkdtemp(prefix="pdf-", dir=os.path.dirname(docs_dir))
+    names = iter(range(1 << 30))
+    editor_module.QFileDialog.getSaveFileName = staticmethod(
+        lambda *a, **k: (os.path.join(export_dir, f"{next(names)}.pdf"), "PDF (*.pdf)"))
+    html_docs = sorted((d for d in picked if d[1] == "html"), key=lambda d: os.path.getsize(d[0]))
+    chosen = html_docs[::max(1, len(html_docs) // max(1, exports))][:exports]
+    samples = []
+    for path, _, _ in chosen:
+        editor.open_file(path)
+        _wait(app, lambda: editor._loader is None)
+        t = time.perf_counter()
+        editor.export_pdf()
+        _wait(app, lambda: editor._export is None, timeout=600)
+        samples.append(time.perf_counter() - t)
+    step("export_pdf", samples, pdf_mb=round(sum(os.path.getsize(os.path.join(export_dir, f))
+                                                  for f in os.listdir(export_dir)) / 1e6, 2))
+    editor.close()
+    editor.deleteLater()
+
+    # The home window on a library of n documents: refresh, then refresh with a search
+    t = time.perf_counter()
+    search_index().reindex_library()
+    search_index().wait()
+    indexed = time.perf_counter() - t
+    t = time.perf_counter()
+    home = HomeWindow()
+    home.show()
+    created = time.perf_counter() - t
+    samples = []
+    for _ in range(10):
+        t = time.perf_counter()
+        home.refresh()
+        app.processEvents()
+        samples.append(time.perf_counter() - t)
+    step("HomeWindow.refresh", samples, create_ms=round(created * 1000, 3), rows=home.model.rowCount())
+
+    home._search.blockSignals(True)
+    home._search.setText("budget")
+    samples = []
+    for _ in range(10):
+        t = time.perf_counter()
+        home.refresh()
+        app.processEvents()
+        samples.append(time.perf_counter() - t)
+    step("HomeWindow.refresh.search", samples, index_library_s=round(indexed, 3),
+         hits=home.model.rowCount())
+
+    results["rss_peak_mb"] = peak_rss_mb()
+    home.close()
+    return results
+
+
+# -- driver ------------------------------------------------------------------
+
+def _git(*args) -> str:
+    try:
+        return subprocess.run(["git", *args], cwd=ROOT, capture_output=True, text=True,
+                              timeout=30).stdout.strip()
+    except (OSError, subprocess.SubprocessError):
+        return ""
+
+
+def _environment() -> dict:
+    import PySide6
+    return {
+        "commit": _git("rev-parse", "--short", "HEAD"),
+        "dirty": bool(_git("status", "--porcelain", "--untracked-files=no")),
+        "python": platform.python_version(),
+        "pyside6": PySide6.__version__,
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+    }
+
+
+def _run_child(n: int, args) -> dict:
+    home = tempfile.mkdtemp(prefix=f"winpages-bench-{n}-")
+    env = dict(os.environ, HOME=home, USERPROFILE=home, QT_QPA_PLATFORM="offscreen")
+    cmd = [sys.executable, os.path.abspath(__file__), "--child", str(n),
+           "--sample", str(args.sample), "--exports", str(args.exports)]
+    try:
+        proc = subprocess.run(cmd, env=env, capture_output=True, text=True)
+    finally:
+        if not args.keep:
+            shutil.rmtree(home, ignore_errors=True)
+    if proc.returncode != 0:
+        sys.stderr.write(proc.stderr)
+        raise SystemExit(f"benchmark for {n} documents failed ({proc.returncode})")
+    # The last line is the result; Qt may print warnings before it
+    return json.loads(proc.stdout.strip().splitlines()[-1])
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="WinPages hot path benchmarks")
+    parser.add_argument("--sizes", default=",".join(map(str, DEFAULT_SIZES)),
+                        help="comma-separated library sizes (default: %(default)s)")
+    parser.add_argument("--sample", type=int, default=40,
+                        help="documents opened, saved and rendered cold per size (default: %(default)s)")
+    parser.add_argument("--exports", type=int, default=3, help="PDF exports per size (default: %(default)s)")
+    parser.add_argument("-o", "--output", help="result file (default: benchmarks/results/<time>-<commit>.json)")
+    parser.add_argument("--keep", action="store_true", help="keep the generated libraries")
+    parser.add_argument("--child", type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.child is not None:
+        sys.path.insert(0, ROOT)
+        print(json.dumps(run_size(args.child, args.sample, args.exports)))
+        return 0
+
+    env = _environment()
+    report = {"started": datetime.now(timezone.utc).isoformat(timespec="seconds"), **env, "sizes": {}}
+    for n in (int(s) for s in args.sizes.split(",") if s.strip()):
+        t = time.perf_counter()
+        report["sizes"][str(n)] = res = _run_child(n, args)
+        print(f"{n:>6} documents: {time.perf_counter() - t:6.1f}s, peak RSS {res['rss_peak_mb']} MB", file=sys.stderr)
+        for name, s in res["steps"].items():
+            print(f"         {name:<34} median {s.get('median_ms', 0):9.2f} ms  p95 {s.get('p95_ms', 0):9.2f} ms",
+                  file=sys.stderr)
+
+    out = args.output
+    if not out:
+        os.makedirs(RESULTS_DIR, exist_ok=True)
+        stamp = datetime.now().strftime("%Y%m%d-%H%M%S")
+        out = os.path.join(RESULTS_DIR, f"{stamp}-{env['commit'] or 'nogit'}.json")
+    with open(out, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+        f.write("\n")
+    print(out)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,209 @@
+"""Headless batch tools: convert documents, rebuild thumbnails, import folders.
+
+    python cli.py convert --to pdf -o out/ docs/
+    python cli.py thumbs
+    python cli.py import ~/Notes --recursive
+
+Work is spread over a process pool; every worker runs its own offscreen
+QGuiApplication. The recents list, thumbnail index and search index are
+only ever written by the parent process.
+"""
+import argparse
+import multiprocessing
+import os
+import shutil
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Callable, Iterable, List, Optional, Tuple
+
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+
+from utils.doc_io import DOCUMENT_EXTS, EXPORT_FORMATS, load_document, export_document
+from utils import trace
+
+_app = None
+
+
+def _init_worker():
+    global _app
+    from PySide6.QtGui import QGuiApplication
+    _app = QGuiApplication.instance() or QGuiApplication(["winpages-cli"])
+
+
+def _convert_one(job: Tuple[str, str]) -> Tuple[str, Optional[str]]:
+    src, out = job
+    try:
+        export_document(load_document(src), out)
+        return out, None
+    except Exception as e:
+        return out, str(e)
+
+
+def _thumb_one(path: str) -> Tuple[str, Optional[str]]:
+    from utils.thumbnails import render_thumbnail_for_file
+    return path, render_thumbnail_for_file(path)
+
+
+def _import_one(job: Tuple[str, str]) -> Tuple[str, Optional[str], Optional[str]]:
+    src, dest = job
+    try:
+        shutil.copy2(src, dest)
+    except OSError as e:
+        return dest, None, str(e)
+    return dest, _thumb_one(dest)[1], None
+
+
+def _run(fn: Callable, items: List, jobs: int) -> Iterable:
+    """fn over items in order, on `jobs` worker processes (in-process for 1)."""
+    if jobs <= 1 or len(items) <= 1:
+        _init_worker()
+        for item in items:
+            yield fn(item)
+        return
+    # spawn everywhere: same behaviour as on Windows, and no forked Qt state
+    ctx = multiprocessing.get_context("spawn")
+    chunk = max(1, min(64, len(items) // (jobs * 8)))
+    with ProcessPoolExecutor(max_workers=jobs, mp_context=ctx, initializer=_init_worker) as pool:
+        yield from pool.map(fn, items, chunksize=chunk)
+
+
+def _collect(paths: List[str], recursive: bool = True) -> List[str]:
+    out = []
+    for p in paths:
+        if os.path.isdir(p):
+            for root, dirs, files in os.walk(p):
+                dirs.sort()
+                for name in sorted(files):
+                    if os.path.splitext(name)[1].lower() in DOCUMENT_EXTS:
+                        out.append(os.path.join(root, name))
+                if not recursive:
+                    break
+        elif os.path.isfile(p):
+            out.append(p)
+        else:
+            print(f"not found: {p}", file=sys.stderr)
+    return out
+
+
+def cmd_convert(args) -> int:
+    sources = _collect(args.paths)
+    jobs = []
+    targets = set()
+    for src in sources:
+        outdir = args.output or os.path.dirname(src)
+        out = os.path.join(outdir, os.path.splitext(os.path.basename(src))[0] + "." + args.to)
+        key = os.path.normcase(os.path.abspath(out))
+        if key == os.path.normcase(os.path.abspath(src)) or key in targets:
+            print(f"skipped {src}: would overwrite {out}", file=sys.stderr)
+            continue
+        targets.add(key)
+        jobs.append((src, out))
+    if args.output:
+        os.makedirs(args.output, exist_ok=True)
+    failed = 0
+    for out, err in _run(_convert_one, jobs, args.jobs):
+        if err:
+            failed += 1
+            print(f"failed {out}: {err}", file=sys.stderr)
+        elif args.verbose:
+            print(out)
+    print(f"converted {len(jobs) - failed}/{len(jobs)}")
+    return 1 if failed else 0
+
+
+def cmd_thumbs(args) -> int:
+    from utils.document_store import list_recents, app_documents_dir
+    from utils.thumbnails import cached_thumbnail, register_thumbnail, prune_thumbnails, thumbnail_cache_bytes
+    if args.paths:
+        paths = _collect(args.paths)
+    else:
+        paths = [r["path"] for r in list_recents() if os.path.exists(r.get("path", ""))]
+        paths += [p for p in _collect([app_documents_dir()]) if p not in paths]
+    # Load the thumbnail index before workers add PNGs: loading drops files it does not know
+    thumbnail_cache_bytes()
+    todo = paths if args.force else [p for p in paths if not cached_thumbnail(p)]
+    done = 0
+    for path, out in _run(_thumb_one, todo, args.jobs):
+        if out:
+            register_thumbnail(path, out)
+            done += 1
+        else:
+            print(f"failed {path}", file=sys.stderr)
+    if not args.paths:
+        prune_thumbnails(paths)
+    print(f"rendered {done}/{len(todo)} ({len(paths) - len(todo)} up to date), "
+          f"cache {thumbnail_cache_bytes() / 1e6:.1f} MB")
+    return 0 if done == len(todo) else 1
+
+
+def cmd_import(args) -> int:
+    from utils.document_store import unique_path, touch_recents, flush_recents
+    from utils.thumbnails import register_thumbnail, thumbnail_cache_bytes
+    from utils.search_index import index_document, search_index
+    sources = _collect(args.paths, recursive=args.recursive)
+    # Load the thumbnail index before workers add PNGs: loading drops files it does not know
+    thumbnail_cache_bytes()
+    # Destination names are picked here, so parallel copies never race for one
+    taken = set()
+    jobs = []
+    for src in sources:
+        dest = unique_path(os.path.basename(src), taken=taken)
+        taken.add(dest)
+        jobs.append((src, dest))
+    imported = []
+    for dest, thumb, err in _run(_import_one, jobs, args.jobs):
+        if err:
+            print(f"failed {dest}: {err}", file=sys.stderr)
+            continue
+        imported.append(dest)
+        if thumb:
+            register_thumbnail(dest, thumb)
+        index_document(dest)
+        if args.verbose:
+            print(dest)
+    touch_recents(imported)
+    flush_recents()
+    search_index().wait()
+    print(f"imported {len(imported)}/{len(jobs)}")
+    return 0 if len(imported) == len(jobs) else 1
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(prog="winpages", description="WinPages batch tools")
+    parser.add_argument("-j", "--jobs", type=int, default=os.cpu_count() or 1,
+                        help="worker processes (default: CPU count)")
+    parser.add_argument("-v", "--verbose", action="store_true")
+    parser.add_argument("--trace", nargs="?", const="1", metavar="FILE",
+                        help="record a Chrome trace of the work done in this process (all of it with -j 1)")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p = sub.add_parser("convert", help="convert html/htm/rtf/txt documents")
+    p.add_argument("paths", nargs="+", help="files or folders")
+    p.add_argument("--to", choices=EXPORT_FORMATS, required=True)
+    p.add_argument("-o", "--output", help="output folder (default: next to each source)")
+    p.set_defaults(func=cmd_convert)
+
+    p = sub.add_parser("thumbs", help="rebuild the thumbnail cache")
+    p.add_argument("paths", nargs="*", help="files or folders (default: recents and library)")
+    p.add_argument("--force", action="store_true", help="re-render up-to-date thumbnails too")
+    p.set_defaults(func=cmd_thumbs)
+
+    p = sub.add_parser("import", help="copy documents into the library")
+    p.add_argument("paths", nargs="+", help="files or folders")
+    p.add_argument("-r", "--recursive", action="store_true", help="descend into subfolders")
+    p.set_defaults(func=cmd_import)
+
+    args = parser.parse_args(argv)
+    trace_file = trace.trace_path(args.trace)
+    if trace_file:
+        trace.enable(trace_file)
+    t0 = time.perf_counter()
+    rc = args.func(args)
+    if args.verbose:
+        print(f"{time.perf_counter() - t0:.2f}s", file=sys.stderr)
+    return rc
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,13 +1,8 @@
+import argparse
 import sys
 import os
-from PySide6.QtWidgets import QApplication
-from PySide6.QtGui import QIcon, QPixmap
-from PySide6.QtSvg import QSvgRenderer
-from PySide6.QtCore import Qt
 
-from theme import apply_dark_palette
-from ui.home import HomeWindow
-from utils.paths import asset_path
+from utils.startup_profile import StartupProfile
 
 
 def main():
@@ -18,35 +13,102 @@ def main():
             ctypes.windll.shell32.SetCurrentProcessExplicitAppUserModelID("WinPages.Devsoldmecrack")
         except Exception:
             pass
-    app = QApplication(sys.argv)
-    # Set app icon (prefer .ico on Windows taskbar)
-    svg_path = asset_path("assets", "app_icon.svg")
-    ico_path = asset_path("assets", "app_icon.ico")
-    if os.name == 'nt':
-        try:
-            if not os.path.exists(ico_path) and os.path.exists(svg_path):
-                # Render SVG to 256x256 and save as ICO for Windows
-                renderer = QSvgRenderer(svg_path)
-                pm = QPixmap(256, 256)
-                pm.fill(Qt.transparent)
-                from PySide6.QtGui import QPainter
-                p = QPainter(pm)
-                renderer.render(p)
-                p.end()
-                pm.save(ico_path, "ICO")
-            if os.path.exists(ico_path):
-                app.setWindowIcon(QIcon(ico_path))
-            else:
-                app.setWindowIcon(QIcon(svg_path))
-        except Exception:
-            app.setWindowIcon(QIcon(svg_path))
-    else:
-        app.setWindowIcon(QIcon(svg_path))
+    parser = argparse.ArgumentParser(prog="winpages")
+    parser.add_argument("paths", nargs="*", help="documents to open")
+    parser.add_argument("--new-instance", action="store_true",
+                        help="start a separate process instead of handing the documents to a running one")
+    parser.add_argument("--trace", nargs="?", const="1", metavar="FILE",
+                        help="record a Chrome trace of the hot paths (default: ~/.winpages/traces/)")
+    parser.add_argument("--profile-startup", nargs="?", const="", metavar="FILE",
+                        help="time the start up to the populated home screen, print it (and write it as JSON) and quit")
+    opts, qt_args = parser.parse_known_args(sys.argv[1:])
+    profile = StartupProfile() if opts.profile_startup is not None else None
+
+    # Only what a launch that hands its files to the running instance needs;
+    # the GUI is imported once this process knows it is the one to start
+    from utils import trace
+    from utils.single_instance import InstanceServer, forward_to_running_instance
+    trace_file = trace.trace_path(opts.trace)
+    # Traced and profiled launches always get a process of their own
+    single = not opts.new_instance and not trace_file and profile is None
+    if single and forward_to_running_instance(opts.paths):
+        return
+    if trace_file:
+        trace.enable(trace_file)
+
+    from PySide6.QtWidgets import QApplication
+    from PySide6.QtCore import QTimer
+    from theme import apply_dark_palette
+    from ui.home import HomeWindow
+    from utils.icons import app_icon
+    if profile:
+        profile.mark("imports")
+
+    app = QApplication(sys.argv[:1] + qt_args)
+    server = None
+    if single:
+        server = InstanceServer(app)
+        # Another instance may have started since; it gets the files then
+        if not server.listen() and forward_to_running_instance(opts.paths):
+            return
+    if profile:
+        profile.mark("QApplication")
+    # Pre-rasterized at build time (tools/generate_ico.py); no SVG is parsed here
+    app.setWindowIcon(app_icon())
     apply_dark_palette(app)
+    if profile:
+        profile.mark("icon and palette")
     w = HomeWindow()
+    if profile:
+        profile.mark("home window built")
+        _profile_until_populated(app, w, profile, opts.profile_startup)
     w.show()
+    if server is not None and server.is_listening():
+        server.open_requested.connect(w.open_documents)
+    if opts.paths:
+        QTimer.singleShot(0, lambda: w.open_documents(opts.paths))
+    if trace_file:
+        from ui.trace_overlay import TraceOverlay
+        probe = trace.StallProbe(app)
+        overlay = TraceOverlay()
+        overlay.show()
     sys.exit(app.exec())
 
 
+# Longest wait for the first thumbnails while profiling
+PROFILE_THUMBNAIL_TIMEOUT_MS = 10000
+
+
+def _profile_until_populated(app, w, profile: StartupProfile, out_path: str):
+    """Mark the first paint, the populated home screen and the first thumbnails, then report and quit."""
+    from PySide6.QtCore import Qt, QTimer, QElapsedTimer
+
+    root = w.centralWidget()
+    root.painted.connect(lambda: profile.mark("first paint"), Qt.SingleShotConnection)
+
+    def on_populated():
+        profile.mark("home populated")
+        waited = QElapsedTimer()
+        waited.start()
+        poll = QTimer(w)
+        poll.setInterval(10)
+
+        def check():
+            from utils.thumbnails import thumbnail_loader
+            # Rows painted so far have asked for their thumbnails; wait until they are all in
+            if thumbnail_loader().is_idle() or waited.elapsed() > PROFILE_THUMBNAIL_TIMEOUT_MS:
+                poll.stop()
+                app.processEvents()
+                profile.mark("thumbnails shown")
+                profile.write(out_path or None)
+                app.quit()
+
+        poll.timeout.connect(check)
+        # A turn first, so the populated grid is painted and requests its thumbnails
+        QTimer.singleShot(0, poll.start)
+
+    w.populated.connect(on_populated)
+
+
 if __name__ == "__main__":
     main()
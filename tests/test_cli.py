@@ -0,0 +1,40 @@
+import json
+import os
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def _cli(home, *args):
+    env = dict(os.environ, HOME=str(home), USERPROFILE=str(home), QT_QPA_PLATFORM="offscreen")
+    return subprocess.run([sys.executable, os.path.join(ROOT, "cli.py"), *args],
+                          env=env, capture_output=True, text=True, timeout=120)
+
+
+def test_thumbs_force_on_cold_cache(tmp_path):
+    docs = tmp_path / ".winpages" / "documents"
+    docs.mkdir(parents=True)
+    for i in range(4):
+        (docs / f"Doc{i}.html").write_text(f"<h1>Doc {i}</h1><p>text {i}</p>", encoding="utf-8")
+    # An index from an earlier run that knows none of these documents
+    thumbs = tmp_path / ".winpages" / "thumbs"
+    thumbs.mkdir()
+    (thumbs / "index.json").write_text(json.dumps({"version": 1, "entries": []}), encoding="utf-8")
+
+    res = _cli(tmp_path, "-j", "2", "thumbs", "--force")
+
+    assert res.returncode == 0, res.stderr
+    assert "rendered 4/4" in res.stdout
+    index = json.loads((thumbs / "index.json").read_text(encoding="utf-8"))
+    assert len(index["entries"]) == 4
+    pngs = {p.name for p in thumbs.glob("*.png")}
+    assert pngs == {e["file"] for e in index["entries"]}
+
+
+def test_thumbs_on_fresh_home(tmp_path):
+    res = _cli(tmp_path, "thumbs")
+
+    assert res.returncode == 0, res.stderr
+    assert "not found" not in res.stderr
+    assert "rendered 0/0" in res.stdout
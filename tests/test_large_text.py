@@ -0,0 +1,77 @@
+import os
+import sys
+import time
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.large_text import LargeTextDocument  # noqa: E402
+
+
+def _open(path):
+    doc = LargeTextDocument(str(path))
+    deadline = time.monotonic() + 10
+    while not doc.indexed and time.monotonic() < deadline:
+        time.sleep(0.01)
+    return doc
+
+
+def _lines(doc):
+    return [doc.line(i) for i in range(doc.line_count())]
+
+
+def test_insert_delete_and_split_lines(tmp_path):
+    path = tmp_path / "big.txt"
+    path.write_bytes(b"one\r\ntwo\r\nthree\r\n")
+    doc = _open(path)
+
+    doc.insert_lines(1, ["new"])
+    doc.delete_lines(3)
+    doc.set_line(0, "o\nne")
+
+    assert _lines(doc) == ["o", "ne", "new", "two"]
+    doc.save()
+    doc.close()
+    assert path.read_bytes() == b"o\r\nne\r\nnew\r\ntwo\r\n"
+
+
+def test_journal_replays_onto_the_unchanged_file(tmp_path):
+    path = tmp_path / "big.txt"
+    path.write_bytes(b"a\nb\nc")
+    doc = _open(path)
+    doc.replace_lines(1, 2, ["B", "C", "D"])
+    journal = doc.journal()
+    doc.close()
+
+    again = _open(path)
+    again.apply_journal(journal)
+    assert _lines(again) == ["a", "B", "C", "D"]
+    assert again.modified
+    again.close()
+
+    path.write_bytes(b"changed\n")
+    changed = _open(path)
+    with pytest.raises(ValueError):
+        changed.apply_journal(journal)
+    changed.close()
+
+
+def test_failed_save_keeps_the_document_readable(tmp_path, monkeypatch):
+    path = tmp_path / "big.txt"
+    path.write_bytes(b"a\nb\nc\n")
+    doc = _open(path)
+    doc.set_line(1, "B")
+
+    def fail(src, dst):
+        raise PermissionError("locked")
+    monkeypatch.setattr(os, "replace", fail)
+    with pytest.raises(PermissionError):
+        doc.save()
+    monkeypatch.undo()
+
+    assert _lines(doc) == ["a", "B", "c"]
+    assert [p.name for p in tmp_path.iterdir()] == ["big.txt"]
+    doc.save()
+    doc.close()
+    assert path.read_bytes() == b"a\nB\nc\n"
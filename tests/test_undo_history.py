@@ -0,0 +1,55 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+
+from PySide6.QtWidgets import QApplication, QTextEdit  # noqa: E402
+
+import utils.undo_history as undo_history  # noqa: E402
+from utils.undo_history import CheckpointStore, UndoHistory  # noqa: E402
+
+
+def test_full_spill_file_reuses_released_space(tmp_path, monkeypatch):
+    monkeypatch.setattr(undo_history, "UNDO_DIR", str(tmp_path))
+    store = CheckpointStore(memory=1, spill=True, spill_max=40_000)
+    kept = []
+    for i in range(200):
+        # Incompressible, so every checkpoint takes about 2 KB of the file
+        cp = store.add(os.urandom(1000).hex(), 0, i)
+        if i % 2:
+            store.release(cp)
+        else:
+            kept.append((cp, i))
+
+    # Half of the 400 KB written was released; the rest no longer fits in
+    # 40 KB, so the oldest went, but recent history is all still there
+    assert os.path.getsize(store._path) <= 40_000
+    readable = [i for cp, i in kept if cp.available()]
+    assert readable == list(range(readable[0], 200, 2))
+    assert len(readable) >= 10
+    for cp, _ in kept:
+        if cp.available():
+            assert len(store.read(cp)) == 2000
+    store.close()
+
+
+def test_loaded_state_is_checkpointed_at_the_first_edit(tmp_path, monkeypatch):
+    monkeypatch.setattr(undo_history, "UNDO_DIR", str(tmp_path))
+    app = QApplication.instance() or QApplication([])
+    view = QTextEdit()
+    view.setPlainText("loaded")
+    history = UndoHistory(view, store=CheckpointStore(spill=False))
+    history.reset()
+    assert history.store.bytes_in_memory() == 0
+
+    view.textCursor().insertText("typed ")
+    app.processEvents()
+    assert view.toPlainText() == "typed loaded"
+    assert view.document().availableUndoSteps() == 1
+
+    history.compact()
+    while history.can_undo():
+        history.undo()
+    assert view.toPlainText() == "loaded"
+    history.close()
@@ -1,25 +1,120 @@
+"""Build step for the app's raster assets.
+
+    python tools/generate_ico.py
+
+Renders every SVG once, at build time, so the app never parses SVG:
+- assets/app_icon.ico with the app icon at the usual Windows sizes;
+- assets/icons.rcc, a binary Qt resource bundle with every toolbar icon
+  and the app icon as PNGs at the sizes and screen scales in use.
+
+utils/icons.py memory-maps the bundle. Run this again after changing an
+SVG in assets/.
+"""
 import os
-from PySide6.QtGui import QPixmap
+import shutil
+import struct
+import subprocess
+import sys
+import tempfile
+
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+
+from PySide6.QtGui import QGuiApplication, QImage, QPainter
 from PySide6.QtSvg import QSvgRenderer
-from PySide6.QtGui import QPainter
-from PySide6.QtCore import Qt
+from PySide6.QtCore import QBuffer, QIODevice, Qt
+
+BASE = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BASE)
+
+from utils.icons import APP_ICON_SIZES, ICON_BUNDLE_NAME, ICON_SIZES
 
-BASE = os.path.dirname(os.path.dirname(__file__))
 SVG = os.path.join(BASE, 'assets', 'app_icon.svg')
 ICO = os.path.join(BASE, 'assets', 'app_icon.ico')
+ICONS_DIR = os.path.join(BASE, 'assets', 'icons')
+BUNDLE = os.path.join(BASE, 'assets', ICON_BUNDLE_NAME)
+ICO_SIZES = (16, 24, 32, 48, 64, 128, 256)
+
+
+def render(svg_path: str, px: int) -> QImage:
+    img = QImage(px, px, QImage.Format_ARGB32_Premultiplied)
+    img.fill(Qt.transparent)
+    r = QSvgRenderer(svg_path)
+    p = QPainter(img)
+    p.setRenderHint(QPainter.Antialiasing)
+    r.render(p)
+    p.end()
+    return img
+
+
+def png_bytes(img: QImage) -> bytes:
+    buf = QBuffer()
+    buf.open(QIODevice.WriteOnly)
+    img.save(buf, "PNG")
+    return bytes(buf.data())
+
+
+def write_ico(path: str, images):
+    """An .ico holding one PNG-compressed image per size (Windows Vista and later)."""
+    pngs = [png_bytes(img) for img in images]
+    offset = 6 + 16 * len(pngs)
+    entries = b""
+    for img, data in zip(images, pngs):
+        side = img.width() if img.width() < 256 else 0
+        entries += struct.pack("<BBBBHHII", side, side, 0, 0, 1, 32, len(data), offset)
+        offset += len(data)
+    with open(path, "wb") as f:
+        f.write(struct.pack("<HHH", 0, 1, len(pngs)) + entries + b"".join(pngs))
+
+
+def rcc_command():
+    tool = shutil.which("pyside6-rcc")
+    if tool:
+        return [tool]
+    import PySide6
+    root = os.path.dirname(PySide6.__file__)
+    for candidate in (os.path.join(root, "rcc.exe"), os.path.join(root, "rcc"),
+                      os.path.join(root, "Qt", "libexec", "rcc")):
+        if os.path.exists(candidate):
+            return [candidate]
+    raise SystemExit("rcc not found: install PySide6 (it ships pyside6-rcc)")
+
+
+def build_bundle(out_path: str) -> int:
+    """Write the icon bundle to `out_path`; returns the number of pixmaps in it."""
+    files = []
+    with tempfile.TemporaryDirectory() as tmp:
+        def add(svg_path: str, folder: str, sizes):
+            os.makedirs(os.path.join(tmp, folder), exist_ok=True)
+            for px in sorted(set(sizes)):
+                name = f"{folder}/{px}.png"
+                render(svg_path, px).save(os.path.join(tmp, name), "PNG")
+                files.append(name)
+
+        for fn in sorted(os.listdir(ICONS_DIR)):
+            if fn.endswith(".svg"):
+                add(os.path.join(ICONS_DIR, fn), f"icons/{fn[:-4]}", ICON_SIZES)
+        add(SVG, "app", APP_ICON_SIZES)
+        qrc = os.path.join(tmp, "assets.qrc")
+        with open(qrc, "w", encoding="utf-8") as f:
+            f.write('<RCC><qresource prefix="/">\n')
+            f.writelines(f"  <file>{name}</file>\n" for name in files)
+            f.write("</qresource></RCC>\n")
+        # PNGs are compressed already; stored as they are, they are served straight from the mapping
+        subprocess.run(rcc_command() + ["--binary", "--no-compress", "-o", os.path.abspath(out_path), qrc],
+                       check=True, cwd=tmp)
+    return len(files)
+
 
 def main():
     if not os.path.exists(SVG):
         print('SVG not found:', SVG)
         return
-    pm = QPixmap(256, 256)
-    pm.fill(Qt.transparent)
-    r = QSvgRenderer(SVG)
-    p = QPainter(pm)
-    r.render(p)
-    p.end()
-    pm.save(ICO, 'ICO')
+    app = QGuiApplication.instance() or QGuiApplication(sys.argv[:1])
+    write_ico(ICO, [render(SVG, px) for px in ICO_SIZES])
     print('Saved', ICO)
+    n = build_bundle(BUNDLE)
+    print(f'Saved {BUNDLE} ({n} pixmaps, {os.path.getsize(BUNDLE) // 1024} KB)')
+
 
 if __name__ == '__main__':
     main()
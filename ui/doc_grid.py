@@ -0,0 +1,277 @@
+from collections import Counter, OrderedDict
+from PySide6.QtWidgets import QListView, QStyledItemDelegate, QStyle, QAbstractItemView, QFrame
+from PySide6.QtCore import Qt, QSize, QRect, QRectF, QModelIndex, QAbstractListModel
+from PySide6.QtGui import QPainter, QPainterPath, QPixmap, QColor, QFont
+
+from theme import DARK_CARD, TEXT_PRIMARY
+from utils.trace import traced
+
+PathRole = Qt.UserRole + 1
+MetaRole = Qt.UserRole + 2
+ThumbnailRole = Qt.UserRole + 3
+
+CARD_SIZE = QSize(210, 260)
+PREVIEW_SIZE = QSize(180, 150)
+# Scaled previews kept in memory; rows beyond this re-read the PNG when scrolled back into view
+PIXMAP_CACHE_LIMIT = 200
+
+
+class DocumentListModel(QAbstractListModel):
+    """Library documents or search results for the home grid.
+
+    Thumbnails are requested from the shared ThumbnailLoader only when the
+    view asks for ThumbnailRole, i.e. when a row is painted; the thumbnail
+    code is not even loaded before that.
+    """
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self._items = []
+        self._rows = {}
+        self._pixmaps: "OrderedDict[str, QPixmap]" = OrderedDict()
+        self._requested = set()
+        # Row operations done by set_documents: the last call and running totals
+        self.last_diff = Counter()
+        self.counters = Counter()
+        self._loader = None
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self._items)
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid() or index.row() >= len(self._items):
+            return None
+        r = self._items[index.row()]
+        if role == Qt.DisplayRole:
+            return r.get("name", "")
+        if role == PathRole:
+            return r.get("path")
+        if role == MetaRole:
+            return f"{r.get('ts','')} · {int(r.get('size',0)/1024)} KB"
+        if role == ThumbnailRole:
+            return self._thumbnail(r.get("path"), index.row())
+        return None
+
+    def item(self, row: int) -> dict:
+        return self._items[row]
+
+    @traced("DocumentListModel.set_documents")
+    def set_documents(self, items):
+        """Turn the current rows into `items` with the fewest row operations.
+
+        Rows are matched by path: vanished ones are removed, moved ones moved,
+        new ones inserted and changed ones updated, so the view keeps its
+        scroll position and unchanged rows keep their pixmaps.
+        """
+        new = []
+        seen = set()
+        for r in items:
+            path = r.get("path")
+            if path and path not in seen:
+                seen.add(path)
+                new.append(r)
+        diff = Counter()
+        cur = self._items
+        root = QModelIndex()
+
+        # 1. removals, bottom-up in contiguous runs
+        removed = []
+        row = len(cur) - 1
+        while row >= 0:
+            if cur[row].get("path") in seen:
+                row -= 1
+                continue
+            end = row
+            while row >= 0 and cur[row].get("path") not in seen:
+                row -= 1
+            self.beginRemoveRows(root, row + 1, end)
+            for r in cur[row + 1:end + 1]:
+                self._forget(r.get("path"))
+                removed.append(r.get("path"))
+            del cur[row + 1:end + 1]
+            self.endRemoveRows()
+            diff["removed"] += end - row
+
+        # 2. walk the target order, moving or inserting rows into place.
+        # Rows not placed yet keep their order after cur[:i], so a row's
+        # current index is i plus the unplaced rows before it in the old order
+        old_rows = {r.get("path"): k for k, r in enumerate(cur)}
+        placed = _Counts(len(cur))
+        i = 0
+        while i < len(new):
+            path = new[i].get("path")
+            if i < len(cur) and cur[i].get("path") == path:
+                placed.add(old_rows[path])
+                if cur[i] is not new[i] and self._changed(cur[i], new[i]):
+                    cur[i] = new[i]
+                    self._pixmaps.pop(path, None)
+                    self._requested.discard(path)
+                    idx = self.index(i)
+                    self.dataChanged.emit(idx, idx)
+                    diff["updated"] += 1
+                i += 1
+            elif path in old_rows:
+                k = old_rows[path]
+                # Counted as placed when the next turn finds it at i
+                j = i + k - placed.below(k)
+                self.beginMoveRows(root, j, j, root, i)
+                cur.insert(i, cur.pop(j))
+                self.endMoveRows()
+                diff["moved"] += 1
+            else:
+                end = i
+                while end < len(new) and new[end].get("path") not in old_rows:
+                    end += 1
+                self.beginInsertRows(root, i, end - 1)
+                cur[i:i] = new[i:end]
+                self.endInsertRows()
+                diff["inserted"] += end - i
+                i = end
+        self._rows = {r.get("path"): i for i, r in enumerate(cur)}
+        if removed and self._loader is not None:
+            # Only this grid's renders for rows that are gone: editors queue theirs on the same loader
+            self._loader.discard(removed)
+        self.last_diff = diff
+        self.counters.update(diff)
+        self.counters["refreshes"] += 1
+
+    @staticmethod
+    def _changed(old: dict, new: dict) -> bool:
+        return any(old.get(k) != new.get(k) for k in ("name", "size", "ts"))
+
+    def _forget(self, path):
+        self._pixmaps.pop(path, None)
+        self._requested.discard(path)
+
+    def invalidate_thumbnail(self, path: str):
+        self._pixmaps.pop(path, None)
+        self._requested.discard(path)
+        row = self._rows.get(path)
+        if row is not None:
+            idx = self.index(row)
+            self.dataChanged.emit(idx, idx, [ThumbnailRole])
+
+    def _thumbnail(self, path, row):
+        if not path:
+            return None
+        pm = self._pixmaps.get(path)
+        if pm is not None:
+            self._pixmaps.move_to_end(path)
+            return pm
+        if path not in self._requested:
+            self._requested.add(path)
+            if self._loader is None:
+                from utils.thumbnails import thumbnail_loader
+                self._loader = thumbnail_loader()
+                self._loader.thumbnail_ready.connect(self._on_thumbnail_ready)
+            # Earlier rows first among those painted in the same pass
+            self._loader.request(path, -row)
+        return None
+
+    def _on_thumbnail_ready(self, path: str, thumb: str):
+        row = self._rows.get(path)
+        if row is None:
+            return
+        pm = QPixmap(thumb)
+        if pm.isNull():
+            return
+        self._pixmaps[path] = pm.scaled(PREVIEW_SIZE, Qt.KeepAspectRatio, Qt.SmoothTransformation)
+        while len(self._pixmaps) > PIXMAP_CACHE_LIMIT:
+            evicted, _ = self._pixmaps.popitem(last=False)
+            self._requested.discard(evicted)
+        idx = self.index(row)
+        self.dataChanged.emit(idx, idx, [ThumbnailRole])
+
+
+class _Counts:
+    """Marked positions among 0..n-1; how many lie below a position, in O(log n)."""
+
+    def __init__(self, n: int):
+        self._tree = [0] * (n + 1)
+
+    def add(self, k: int):
+        k += 1
+        while k < len(self._tree):
+            self._tree[k] += 1
+            k += k & -k
+
+    def below(self, k: int) -> int:
+        n = 0
+        while k > 0:
+            n += self._tree[k]
+            k -= k & -k
+        return n
+
+
+class DocumentCardDelegate(QStyledItemDelegate):
+    """Paints a document card directly, no per-item widgets."""
+
+    def sizeHint(self, option, index):
+        return CARD_SIZE
+
+    @traced("DocumentCardDelegate.paint")
+    def paint(self, p: QPainter, option, index):
+        p.save()
+        p.setRenderHint(QPainter.Antialiasing)
+        card = QRect(option.rect.topLeft(), CARD_SIZE)
+        path = QPainterPath()
+        path.addRoundedRect(QRectF(card), 16, 16)
+        bg = QColor(DARK_CARD)
+        if option.state & QStyle.State_MouseOver:
+            bg = bg.lighter(125)
+        p.fillPath(path, bg)
+
+        inner = card.adjusted(12, 12, -12, -12)
+        preview = QRect(inner.left(), inner.top(), inner.width(), 160)
+        pm = index.data(ThumbnailRole)
+        if isinstance(pm, QPixmap) and not pm.isNull():
+            x = preview.left() + (preview.width() - pm.width()) // 2
+            y = preview.top() + (preview.height() - pm.height()) // 2
+            p.drawPixmap(x, y, pm)
+        else:
+            f = QFont(option.font)
+            f.setPointSize(28)
+            p.setFont(f)
+            p.setPen(TEXT_PRIMARY)
+            p.drawText(preview, Qt.AlignCenter, "📝")
+
+        text_top = preview.bottom() + 8
+        name_font = QFont(option.font)
+        name_font.setWeight(QFont.DemiBold)
+        p.setFont(name_font)
+        p.setPen(QColor(255, 255, 255))
+        fm = p.fontMetrics()
+        name_rect = QRect(inner.left(), text_top, inner.width(), fm.height())
+        p.drawText(name_rect, Qt.AlignLeft | Qt.AlignVCenter,
+                   fm.elidedText(index.data(Qt.DisplayRole) or "", Qt.ElideRight, inner.width()))
+
+        p.setFont(option.font)
+        p.setPen(QColor(200, 200, 200))
+        fm = p.fontMetrics()
+        meta_rect = QRect(inner.left(), name_rect.bottom() + 8, inner.width(), fm.height())
+        p.drawText(meta_rect, Qt.AlignLeft | Qt.AlignVCenter,
+                   fm.elidedText(index.data(MetaRole) or "", Qt.ElideRight, inner.width()))
+        p.restore()
+
+
+class DocumentGridView(QListView):
+    """Icon-mode list that only lays out and paints the rows in view."""
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.setViewMode(QListView.IconMode)
+        self.setMovement(QListView.Static)
+        self.setResizeMode(QListView.Adjust)
+        self.setLayoutMode(QListView.Batched)
+        self.setBatchSize(200)
+        self.setUniformItemSizes(True)
+        self.setGridSize(CARD_SIZE + QSize(24, 18))
+        self.setSelectionMode(QAbstractItemView.NoSelection)
+        self.setEditTriggers(QAbstractItemView.NoEditTriggers)
+        self.setVerticalScrollMode(QAbstractItemView.ScrollPerPixel)
+        self.verticalScrollBar().setSingleStep(24)
+        self.setFrameShape(QFrame.NoFrame)
+        self.setMouseTracking(True)
+        self.setContextMenuPolicy(Qt.CustomContextMenu)
+        self.setStyleSheet("QListView { background: transparent; }")
+        self.setItemDelegate(DocumentCardDelegate(self))
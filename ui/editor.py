@@ -1,12 +1,31 @@
-from PySide6.QtWidgets import QMainWindow, QTextEdit, QFileDialog, QToolBar, QColorDialog, QFontComboBox, QComboBox, QMessageBox
-from PySide6.QtGui import QIcon, QTextCharFormat, QFont, QTextListFormat, QKeySequence, QAction, QTextCursor
-from PySide6.QtCore import Qt, QFileInfo, QSize, Signal
+from PySide6.QtWidgets import QMainWindow, QFileDialog, QToolBar, QColorDialog, QFontComboBox, QComboBox, QMessageBox, QProgressBar, QPushButton, QDockWidget, QLabel
+from PySide6.QtGui import QTextCharFormat, QFont, QTextListFormat, QKeySequence, QAction, QTextCursor
+from PySide6.QtCore import Qt, QFileInfo, QSize, QTimer, Signal
 import os
+import uuid
 
 from utils.document_store import touch_recent, unique_path
-from utils.thumbnails import ensure_thumbnail_for_file, ensure_thumbnail_for_content, thumb_path
+from utils.library import library_catalog
+from utils.history import history_writer, load_revision
+from utils.thumbnails import update_thumbnail_for_content, thumbnail_loader
+from utils.search_index import index_document
+from utils.autosave import AUTOSAVE_IDLE_MS, autosave_writer, read_large_text_recovery, read_recovery
+from utils.progressive import PROGRESSIVE_THRESHOLD, ProgressiveLoader
+from utils.large_text import LARGE_TEXT_THRESHOLD, LargeTextDocument
+from utils.pdf_export import PdfExport, REUSE_LAYOUT_MAX_PAGES
+from utils.doc_io import document_kind, load_document, save_document
+from utils.wpg import is_wpg_path, load_wpg, write_wpg
+from utils.images import ImageDocument
+from ui.large_text import LargeTextView
+from ui.history import HistoryDialog
+from ui.page_view import PageView, PageStrip
 from theme import EDITOR_TOOLBAR_QSS
-from utils.paths import asset_path
+from utils.icons import icon
+from utils.trace import traced
+from utils.undo_history import UndoHistory
+
+# Rough memory per character of a rich-text document: text, formats and layout
+BYTES_PER_CHAR = 48
 
 
 class EditorWindow(QMainWindow):
@@ -16,12 +35,50 @@ class EditorWindow(QMainWindow):
         self.setWindowTitle("WinPages – Editor")
         self.resize(1100, 800)
 
-        self.text = QTextEdit()
+        self.text = PageView()
         self.text.setAcceptRichText(True)
+        self.text.set_page_mode(True)
         self.setCentralWidget(self.text)
 
+        self._pagesDock = QDockWidget("Pages", self)
+        self._pagesDock.setObjectName("pages")
+        self._pagesDock.setFeatures(QDockWidget.DockWidgetClosable)
+        self._pagesDock.setWidget(PageStrip(self.text))
+        self._pagesDock.setMinimumWidth(170)
+        self.addDockWidget(Qt.LeftDockWidgetArea, self._pagesDock)
+        self._pageLabel = QLabel()
+        self.statusBar().addPermanentWidget(self._pageLabel)
+        self.text.pageCountChanged.connect(self._show_page_number)
+        self.text.currentPageChanged.connect(self._show_page_number)
+
         self._path = None
         self._build_toolbar()
+
+        # Undo capped by memory, going on past the document's own stack from checkpoints
+        self._undo = UndoHistory(self.text, parent=self)
+        self.text.undo_history = self._undo
+        self._undo.reset()
+
+        # Autosave: journal a snapshot once typing has been idle for a while
+        self._autosave_id = uuid.uuid4().hex
+        self._autosaved_revision = -1
+        self._journaled = False
+        self._autosaveTimer = QTimer(self)
+        self._autosaveTimer.setSingleShot(True)
+        self._autosaveTimer.setInterval(AUTOSAVE_IDLE_MS)
+        self._autosaveTimer.timeout.connect(self._autosave)
+        self.text.document().contentsChanged.connect(self._autosaveTimer.start)
+
+        self._loader = None
+        self._loadBar = None
+        self._export = None
+        self._exportBar = None
+        # Memory-mapped viewer that replaces self.text for huge .txt files
+        self._large = None
+        # (spill file, modified, cursor position, scroll) while unloaded to disk
+        self._unloaded = None
+        self._show_page_number()
+
         if path:
             self.open_file(path)
 
@@ -32,16 +89,16 @@ class EditorWindow(QMainWindow):
         tb.setStyleSheet(EDITOR_TOOLBAR_QSS)
         self.addToolBar(tb)
 
-        act_new = QAction(QIcon(self._icon_path("new.svg")), "New", self)
+        act_new = QAction(icon("new"), "New", self)
         act_new.triggered.connect(self.new_document)
         tb.addAction(act_new)
 
-        act_open = QAction(QIcon(self._icon_path("open.svg")), "Open", self)
+        act_open = QAction(icon("open"), "Open", self)
         act_open.setShortcut(QKeySequence.Open)
         act_open.triggered.connect(self.open_dialog)
         tb.addAction(act_open)
 
-        act_save = QAction(QIcon(self._icon_path("save.svg")), "Save", self)
+        act_save = QAction(icon("save"), "Save", self)
         act_save.setShortcut(QKeySequence.Save)
         act_save.triggered.connect(self.save)
         tb.addAction(act_save)
@@ -60,19 +117,19 @@ class EditorWindow(QMainWindow):
         self.font_size.setCurrentIndex(2)
         self._apply_font_size()
 
-        act_bold = QAction(QIcon(self._icon_path("bold.svg")), "Bold", self)
+        act_bold = QAction(icon("bold"), "Bold", self)
         act_bold.setShortcut(QKeySequence.Bold)
         act_bold.setCheckable(True)
         act_bold.triggered.connect(lambda: self._toggle_weight(QFont.Bold))
         tb.addAction(act_bold)
 
-        act_italic = QAction(QIcon(self._icon_path("italic.svg")), "Italic", self)
+        act_italic = QAction(icon("italic"), "Italic", self)
         act_italic.setShortcut(QKeySequence.Italic)
         act_italic.setCheckable(True)
         act_italic.triggered.connect(self._toggle_italic)
         tb.addAction(act_italic)
 
-        act_underline = QAction(QIcon(self._icon_path("underline.svg")), "Underline", self)
+        act_underline = QAction(icon("underline"), "Underline", self)
         act_underline.setShortcut(QKeySequence.Underline)
         act_underline.setCheckable(True)
         act_underline.triggered.connect(self._toggle_underline)
@@ -80,42 +137,68 @@ class EditorWindow(QMainWindow):
 
         tb.addSeparator()
 
-        act_bullets = QAction(QIcon(self._icon_path("bullet.svg")), "Bulleted List", self)
+        act_bullets = QAction(icon("bullet"), "Bulleted List", self)
         act_bullets.triggered.connect(self._toggle_bullets)
         tb.addAction(act_bullets)
 
-        act_num = QAction(QIcon(self._icon_path("number.svg")), "Numbered List", self)
+        act_num = QAction(icon("number"), "Numbered List", self)
         act_num.triggered.connect(self._toggle_numbers)
         tb.addAction(act_num)
 
         tb.addSeparator()
 
-        act_color = QAction(QIcon(self._icon_path("color.svg")), "Color", self)
+        act_color = QAction(icon("color"), "Color", self)
         act_color.triggered.connect(self._choose_color)
         tb.addAction(act_color)
 
-        act_left = QAction(QIcon(self._icon_path("align-left.svg")), "Left", self)
+        act_left = QAction(icon("align-left"), "Left", self)
         act_left.triggered.connect(lambda: self._set_align(Qt.AlignLeft))
         tb.addAction(act_left)
 
-        act_center = QAction(QIcon(self._icon_path("align-center.svg")), "Center", self)
+        act_center = QAction(icon("align-center"), "Center", self)
         act_center.triggered.connect(lambda: self._set_align(Qt.AlignHCenter))
         tb.addAction(act_center)
 
-        act_right = QAction(QIcon(self._icon_path("align-right.svg")), "Right", self)
+        act_right = QAction(icon("align-right"), "Right", self)
         act_right.triggered.connect(lambda: self._set_align(Qt.AlignRight))
         tb.addAction(act_right)
 
         tb.addSeparator()
 
-        act_export = QAction(QIcon(self._icon_path("pdf.svg")), "Export PDF", self)
+        act_export = QAction(icon("pdf"), "Export PDF", self)
         act_export.triggered.connect(self.export_pdf)
         tb.addAction(act_export)
-
-    def _icon_path(self, name: str) -> str:
-        return asset_path("assets", "icons", name)
+        self._act_export = act_export
+
+        act_history = QAction(icon("history"), "History", self)
+        act_history.triggered.connect(self.show_history)
+        tb.addAction(act_history)
+
+        act_pages = QAction(icon("pages"), "Page View", self)
+        act_pages.setCheckable(True)
+        act_pages.setChecked(True)
+        act_pages.toggled.connect(self.set_page_view)
+        tb.addAction(act_pages)
+        self._act_pages = act_pages
+
+        # Everything past New/Open/Save needs a rich-text document
+        self._rich_actions = tb.actions()[3:]
+
+    def set_page_view(self, on: bool):
+        self.text.set_page_mode(on)
+        self._act_pages.setChecked(on)
+        self._pagesDock.setVisible(on and self._large is None)
+        self._show_page_number()
+
+    def _show_page_number(self, *args):
+        if self.text.page_mode() and self._large is None and self._unloaded is None:
+            self._pageLabel.setText(f"Page {self.text.current_page() + 1} of {self.text.page_count()}")
+            self._pageLabel.show()
+        else:
+            self._pageLabel.hide()
 
     def load_from_template(self, path: str):
+        self._leave_large_text()
         try:
             with open(path, "r", encoding="utf-8", errors="ignore") as f:
                 data = f.read()
@@ -124,12 +207,103 @@ class EditorWindow(QMainWindow):
                 self.text.setHtml(data)
             else:
                 self.text.setPlainText(data)
+            self._undo.reset()
             # Do not bind to template file path
             self._path = None
+            self.text.document().setModified(False)
             self.setWindowTitle("Untitled – WinPages")
         except Exception as e:
             QMessageBox.critical(self, "Error", str(e))
 
+    def _autosave(self):
+        if self._large is not None:
+            doc = self._large.doc
+            if not doc.modified or doc.revision == self._autosaved_revision:
+                return
+            self._autosaved_revision = doc.revision
+            self._journaled = True
+            autosave_writer().snapshot_large_text(self._autosave_id, doc, self._path, self.windowTitle())
+            return
+        doc = self.text.document()
+        if not doc.isModified() or doc.revision() == self._autosaved_revision:
+            return
+        self._autosaved_revision = doc.revision()
+        self._journaled = True
+        autosave_writer().snapshot(self._autosave_id, doc, self._path, self.windowTitle())
+
+    def _mark_clean(self):
+        self.text.document().setModified(False)
+        self._autosaveTimer.stop()
+        self._autosaved_revision = -1
+        if self._journaled:
+            autosave_writer().discard(self._autosave_id)
+            self._journaled = False
+
+    def restore_from_recovery(self, meta: dict) -> bool:
+        """Load a journal entry left by a crashed session and keep journaling into it."""
+        if not autosave_writer().claim(meta["id"]):
+            # Another instance has just taken it over
+            return False
+        large = meta.get("kind") == "large_text"
+        try:
+            if large:
+                # The journal holds only the edits; they go back onto the file
+                self._path = meta["path"]
+                self._open_large_text(self._path)
+                self._large.doc.apply_journal(read_large_text_recovery(meta))
+                self._large.set_document(self._large.doc)
+            else:
+                self._leave_large_text()
+                self.text.setHtml(read_recovery(meta))
+        except Exception as e:
+            autosave_writer().release(meta["id"])
+            QMessageBox.critical(self, "Error", str(e))
+            return False
+        if not large:
+            self._undo.reset()
+            self._path = meta.get("path")
+            self.text.document().setModified(True)
+        self._autosave_id = meta["id"]
+        self._journaled = True
+        name = os.path.basename(self._path) if self._path else "Untitled"
+        self.setWindowTitle(f"{name} (recovered) – WinPages")
+        return True
+
+    def closeEvent(self, e):
+        if self.is_modified():
+            btn = QMessageBox.question(
+                self, "Unsaved changes", "Save changes before closing?",
+                QMessageBox.Save | QMessageBox.Discard | QMessageBox.Cancel,
+            )
+            if btn == QMessageBox.Cancel:
+                e.ignore()
+                return
+            if btn == QMessageBox.Save and not self.save():
+                e.ignore()
+                return
+        # Only once the window really closes: a cancelled close keeps the load and export going
+        self._cancel_loading()
+        if self._export is not None:
+            self._export.cancel()
+        self._mark_clean()
+        self._undo.close()
+        if self._unloaded is not None:
+            _remove_file(self._unloaded[0])
+            self._unloaded = None
+        if self._large is not None:
+            self._large.doc.close()
+        super().closeEvent(e)
+
+    def is_modified(self) -> bool:
+        if self._unloaded is not None:
+            return self._unloaded[1]
+        if self._large is not None:
+            return self._large.doc.modified
+        if self._loader is not None:
+            # Read-only while loading: what is there so far is the file's, not edits
+            return False
+        return self.text.document().isModified()
+
     def _merge_format_on_selection(self, fmt: QTextCharFormat):
         cursor = self.text.textCursor()
         if not cursor.hasSelection():
@@ -187,36 +361,242 @@ class EditorWindow(QMainWindow):
             fmt.setForeground(c)
             self._merge_format_on_selection(fmt)
 
+    def path(self) -> str | None:
+        """File the editor saves to; None for a new document."""
+        return self._path
+
+    def memory_estimate(self) -> int:
+        """Rough bytes held by the document: text, layout, undo history and embedded images."""
+        if self._unloaded is not None or self._large is not None:
+            return 0
+        doc = self.text.document()
+        est = doc.characterCount() * BYTES_PER_CHAR + self._undo.bytes_in_memory()
+        if isinstance(doc, ImageDocument):
+            est += doc.encoded_bytes()
+        return est
+
+    def is_unloaded(self) -> bool:
+        return self._unloaded is not None
+
+    def can_unload(self) -> bool:
+        """Not in front, and not loading, exporting or showing a memory-mapped text file."""
+        return (self._unloaded is None and self._large is None and self._loader is None
+                and self._export is None and not self.isActiveWindow())
+
+    @traced("EditorWindow.unload")
+    def unload(self, spill_path: str) -> bool:
+        """Write the document to `spill_path` and free it until restore().
+
+        The window shows a placeholder meanwhile. Text, formatting, images
+        and the modified state come back; the undo history waits on disk.
+        """
+        if not self.can_unload():
+            return False
+        doc = self.text.document()
+        if self._autosaveTimer.isActive():
+            # The journal is brought up to date first, as the clear below is no edit
+            self._autosaveTimer.stop()
+            self._autosave()
+        try:
+            write_wpg(spill_path, doc)
+        except Exception:
+            _remove_file(spill_path)
+            return False
+        self._unloaded = (spill_path, doc.isModified(), self.text.textCursor().position(),
+                          self.text.verticalScrollBar().value())
+        self._undo.suspend()
+        doc.clear()
+        self._autosaveTimer.stop()
+        placeholder = QLabel("Unloaded to save memory. Click to show the document again.")
+        placeholder.setAlignment(Qt.AlignCenter)
+        placeholder.setEnabled(False)
+        # takeCentralWidget() keeps the rich-text editor for restore()
+        self.takeCentralWidget()
+        self.setCentralWidget(placeholder)
+        for a in self._rich_actions:
+            a.setEnabled(False)
+        self._pagesDock.hide()
+        self._show_page_number()
+        return True
+
+    @traced("EditorWindow.restore")
+    def restore(self):
+        """Load the document back after unload(); nothing to do otherwise."""
+        if self._unloaded is None:
+            return
+        spill_path, modified, position, scroll = self._unloaded
+        self._unloaded = None
+        placeholder = self.takeCentralWidget()
+        self.setCentralWidget(self.text)
+        placeholder.deleteLater()
+        for a in self._rich_actions:
+            a.setEnabled(True)
+        self._pagesDock.setVisible(self.text.page_mode())
+        doc = self.text.document()
+        try:
+            load_wpg(spill_path, doc)
+        except Exception as e:
+            QMessageBox.critical(self, "Error", f"Could not reload the document from {spill_path}:\n{e}")
+            return
+        _remove_file(spill_path)
+        self._undo.resume()
+        doc.setModified(modified)
+        self._autosaveTimer.stop()
+        cursor = self.text.textCursor()
+        cursor.setPosition(min(position, doc.characterCount() - 1))
+        self.text.setTextCursor(cursor)
+        self.text.verticalScrollBar().setValue(scroll)
+        self._show_page_number()
+
     def new_document(self):
+        self._leave_large_text()
         self.text.clear()
+        self._undo.reset()
         self._path = None
+        self._mark_clean()
         self.setWindowTitle("Untitled – WinPages")
 
     def open_dialog(self):
-        fn, _ = QFileDialog.getOpenFileName(self, "Open Document", os.path.expanduser("~"), "Documents (*.html *.htm *.rtf *.txt);;All Files (*.*)")
-        if fn:
+        fn, _ = QFileDialog.getOpenFileName(self, "Open Document", os.path.expanduser("~"), "Documents (*.wpg *.html *.htm *.rtf *.txt);;All Files (*.*)")
+        if not fn:
+            return
+        from ui.editor_manager import editor_manager
+        # A file open in another window is shown there rather than loaded twice
+        other = editor_manager().find(fn)
+        if other is not None and other is not self:
+            editor_manager().activate(other)
+        else:
             self.open_file(fn)
 
+    @traced("EditorWindow.open_file")
     def open_file(self, path: str):
+        self._cancel_loading()
         self._path = path
         ext = QFileInfo(path).suffix().lower()
         try:
-            with open(path, "r", encoding="utf-8", errors="ignore") as f:
-                data = f.read()
-            if ext in ("html", "htm"):
-                self.text.setHtml(data)
-            else:
-                self.text.setPlainText(data)
+            size = os.path.getsize(path)
+            if ext == "txt" and size > LARGE_TEXT_THRESHOLD:
+                self._open_large_text(path)
+                return
+            self._leave_large_text()
+            kind = document_kind(path)
+            if size > PROGRESSIVE_THRESHOLD and kind != "wpg":
+                self._open_progressive(path, kind)
+                return
+            load_document(path, self.text.document())
+            self._undo.reset()
+            self._mark_clean()
             self.setWindowTitle(f"{os.path.basename(path)} – WinPages")
             touch_recent(path)
-            ensure_thumbnail_for_file(path)
+            thumbnail_loader().request(path)
         except Exception as e:
             QMessageBox.critical(self, "Error", str(e))
 
+    def _open_large_text(self, path: str):
+        doc = LargeTextDocument(path)
+        if self._large is None:
+            self._large = LargeTextView(doc)
+            self._large.modificationChanged.connect(self._on_large_modified)
+            self._large.changed.connect(self._autosaveTimer.start)
+            # takeCentralWidget() keeps the rich-text editor alive for later documents
+            self.takeCentralWidget()
+            self.setCentralWidget(self._large)
+            for a in self._rich_actions:
+                a.setEnabled(False)
+            self._pagesDock.hide()
+            self._show_page_number()
+        else:
+            self._large.doc.close()
+            self._large.set_document(doc)
+        self._mark_clean()
+        self.setWindowTitle(f"{os.path.basename(path)} – WinPages")
+        touch_recent(path)
+        thumbnail_loader().request(path)
+
+    def _leave_large_text(self):
+        if self._large is None:
+            return
+        self._large.doc.close()
+        self.takeCentralWidget()
+        self._large.deleteLater()
+        self._large = None
+        self.setCentralWidget(self.text)
+        for a in self._rich_actions:
+            a.setEnabled(True)
+        self._pagesDock.setVisible(self.text.page_mode())
+        self._show_page_number()
+
+    def _on_large_modified(self, modified: bool):
+        name = os.path.basename(self._path) if self._path else "Untitled"
+        self.setWindowTitle(f"{name}{' •' if modified else ''} – WinPages")
+
+    def _open_progressive(self, path: str, kind: str):
+        name = os.path.basename(path)
+        self.setWindowTitle(f"{name} (loading…) – WinPages")
+        self.text.setReadOnly(True)
+        loader = ProgressiveLoader(self.text.document(), path, kind, parent=self)
+        self._loader = loader
+
+        bar = QProgressBar()
+        bar.setMaximumWidth(240)
+        bar.setRange(0, 0)
+        cancel = QPushButton("Cancel")
+        cancel.setFlat(True)
+        cancel.clicked.connect(self._cancel_loading)
+        self.statusBar().addPermanentWidget(bar)
+        self.statusBar().addPermanentWidget(cancel)
+        self._loadBar = (bar, cancel)
+
+        def on_progress(done, total):
+            if total:
+                bar.setRange(0, 1000)
+                bar.setValue(int(done * 1000 / total))
+
+        def on_finished():
+            self._end_loading()
+            self._undo.reset()
+            self._mark_clean()
+            self.setWindowTitle(f"{name} – WinPages")
+
+        def on_cancelled():
+            self._end_loading()
+            self._undo.reset()
+            # Keep what was loaded but never save a truncated copy over the original
+            self._path = None
+            self._mark_clean()
+            self.setWindowTitle(f"{name} (partial) – WinPages")
+
+        def on_failed(msg):
+            self._end_loading()
+            QMessageBox.critical(self, "Error", msg)
+
+        loader.progress.connect(on_progress)
+        loader.finished.connect(on_finished)
+        loader.cancelled.connect(on_cancelled)
+        loader.failed.connect(on_failed)
+        # Recents and thumbnail do not wait for the document to be loaded
+        touch_recent(path)
+        thumbnail_loader().request(path)
+        loader.start()
+
+    def _cancel_loading(self):
+        if self._loader is not None and self._loader.is_active():
+            self._loader.cancel()
+
+    def _end_loading(self):
+        self.text.setReadOnly(self._export is not None and self._export.reuses_layout())
+        if self._loadBar:
+            for w in self._loadBar:
+                self.statusBar().removeWidget(w)
+                w.deleteLater()
+            self._loadBar = None
+        self.statusBar().clearMessage()
+        self._loader = None
+
     def save(self):
         if not self._path:
             # Auto-save new docs into app documents folder with a unique name
-            suggested = unique_path("Document.html")
+            suggested = unique_path("Document.wpg")
             self._path = suggested
             ok = self._save_to(self._path)
             if ok:
@@ -228,7 +608,7 @@ class EditorWindow(QMainWindow):
         return ok
 
     def save_as(self):
-        fn, _ = QFileDialog.getSaveFileName(self, "Save As", self._path or os.path.expanduser("~"), "HTML (*.html);;RTF (*.rtf);;Text (*.txt)")
+        fn, _ = QFileDialog.getSaveFileName(self, "Save As", self._path or os.path.expanduser("~"), "WinPages Document (*.wpg);;HTML (*.html);;RTF (*.rtf);;Text (*.txt)")
         if fn:
             self._path = fn
             ok = self._save_to(fn)
@@ -236,38 +616,128 @@ class EditorWindow(QMainWindow):
                 self.document_saved.emit(fn)
             return ok
 
+    @traced("EditorWindow._save_to")
     def _save_to(self, path: str):
-        ext = QFileInfo(path).suffix().lower()
+        self.restore()
+        if self._large is not None:
+            return self._save_large_text(path)
         try:
-            if ext == "html":
-                data = self.text.toHtml()
-            elif ext == "rtf":
-                data = self.text.toHtml()
+            data, is_html, snapshot = save_document(self.text.document(), path)
+            library_catalog().note(path)
+            history_writer().record(path, self.text.document(), snapshot)
+            ext = QFileInfo(path).suffix().lower()
+            self._mark_clean()
+            self.setWindowTitle(f"{os.path.basename(path)} – WinPages")
+            touch_recent(path)
+            if is_wpg_path(path) or ext == "rtf":
+                # The container already holds a rendered preview; RTF is re-read for formatting
+                thumbnail_loader().request(path)
             else:
-                data = self.text.toPlainText()
-            with open(path, "w", encoding="utf-8") as f:
-                f.write(data)
+                update_thumbnail_for_content(path, data, is_html)
+            index_document(path, data, is_html)
+            return True
+        except Exception as e:
+            QMessageBox.critical(self, "Error", str(e))
+            return False
+
+    def _save_large_text(self, path: str):
+        try:
+            self._large.doc.save(path)
+            library_catalog().note(path)
+            self._large.set_document(self._large.doc)
+            self._mark_clean()
             self.setWindowTitle(f"{os.path.basename(path)} – WinPages")
             touch_recent(path)
-            is_html = ext in ("html", "htm", "rtf")
-            ensure_thumbnail_for_content(data, is_html, thumb_path(path))
+            thumbnail_loader().request(path)
             return True
         except Exception as e:
             QMessageBox.critical(self, "Error", str(e))
             return False
 
-    def export_pdf(self):
-        fn, _ = QFileDialog.getSaveFileName(self, "Export as PDF", os.path.expanduser("~"), "PDF (*.pdf)")
-        if not fn:
+    def show_history(self):
+        if not self._path:
+            QMessageBox.information(self, "History", "Versions are kept from the first save on.")
+            return
+        dlg = HistoryDialog(self._path, self)
+        if dlg.exec() != HistoryDialog.Accepted or dlg.selected_revision() is None:
             return
         try:
-            from PySide6.QtGui import QPageLayout, QPageSize, QTextDocument
-            from PySide6.QtPrintSupport import QPrinter
-            printer = QPrinter(QPrinter.HighResolution)
-            printer.setOutputFormat(QPrinter.PdfFormat)
-            printer.setOutputFileName(fn)
-            printer.setPageSize(QPrinter.A4)
-            doc = self.text.document()
-            doc.print_(printer)
+            # Undo brings back what was there before the revision
+            with self._undo.replacing():
+                load_revision(self._path, dlg.selected_revision(), self.text.document())
         except Exception as e:
             QMessageBox.critical(self, "Error", str(e))
+            return
+        # Restoring is an edit: the file changes only once it is saved
+        self.text.document().setModified(True)
+        self.setWindowTitle(f"{os.path.basename(self._path)} (restored) – WinPages")
+
+    def export_pdf(self):
+        if self._export is not None:
+            return
+        self.restore()
+        fn, _ = QFileDialog.getSaveFileName(self, "Export as PDF", os.path.expanduser("~"), "PDF (*.pdf)")
+        if not fn:
+            return
+        # A short paginated document is printed from the page view's layout
+        # while it is held still for a moment; otherwise a worker prints a
+        # snapshot and editing goes on
+        doc = self.text.document()
+        reuse = (self.text.page_mode() and self._loader is None
+                 and doc.pageCount() <= REUSE_LAYOUT_MAX_PAGES)
+        export = PdfExport(doc, fn, parent=self, reuse_layout=reuse)
+        self._export = export
+        self._act_export.setEnabled(False)
+        if reuse:
+            self.text.setReadOnly(True)
+
+        bar = QProgressBar()
+        bar.setMaximumWidth(240)
+        bar.setRange(0, 0)
+        bar.setFormat("PDF %v/%m")
+        cancel = QPushButton("Cancel")
+        cancel.setFlat(True)
+        cancel.clicked.connect(export.cancel)
+        self.statusBar().addPermanentWidget(bar)
+        self.statusBar().addPermanentWidget(cancel)
+        self._exportBar = (bar, cancel)
+
+        def on_progress(page, pages):
+            bar.setRange(0, pages)
+            bar.setValue(page)
+
+        def on_finished(path):
+            self._end_export()
+            self.statusBar().showMessage(f"Exported {os.path.basename(path)}", 4000)
+
+        def on_cancelled():
+            self._end_export()
+            self.statusBar().showMessage("PDF export cancelled", 4000)
+
+        def on_failed(msg):
+            self._end_export()
+            QMessageBox.critical(self, "Error", msg)
+
+        export.progress.connect(on_progress)
+        export.finished.connect(on_finished)
+        export.cancelled.connect(on_cancelled)
+        export.failed.connect(on_failed)
+        export.start()
+
+    def _end_export(self):
+        if self._exportBar:
+            for w in self._exportBar:
+                self.statusBar().removeWidget(w)
+                w.deleteLater()
+            self._exportBar = None
+        self._act_export.setEnabled(self._large is None)
+        if self._export.reuses_layout() and self._loader is None:
+            self.text.setReadOnly(False)
+        self._export = None
+
+
+def _remove_file(path: str):
+    try:
+        os.remove(path)
+    except OSError:
+        pass
@@ -0,0 +1,201 @@
+"""Editor windows of the process: one per file, freed on close, within a memory budget.
+
+    editor_manager().open(path, parent=home)
+
+A file that is already open brings its window to the front instead of
+loading a second copy. Windows are deleted when they close, so their
+document, undo stack and images go with them. When the open documents
+together are estimated above the budget, windows that have been in the
+background for a while are unloaded to a spill file, least recently
+used first, and load again as soon as they are activated. Each process
+holds a lock file for its spill files, so that only files left behind by
+an instance that is no longer running are ever removed.
+"""
+import os
+import time
+from typing import Dict, List, Optional
+from PySide6.QtCore import QEvent, QLockFile, QObject, QTimer, Qt, Signal
+
+from utils.document_store import APP_DIR, ensure_app_dirs
+
+# Memory the open documents may take before background ones are unloaded,
+# override with WINPAGES_EDITOR_MEMORY_MB
+EDITOR_MEMORY_BUDGET = int(os.environ.get("WINPAGES_EDITOR_MEMORY_MB", "256")) * 1024 * 1024
+# A window is unloaded only after being in the background this long
+UNLOAD_IDLE_S = 120
+# How often the budget is checked besides when a window opens
+BUDGET_CHECK_MS = 15000
+SPILL_DIR = os.path.join(APP_DIR, "spill")
+
+
+class EditorManager(QObject):
+    """Tracks the editor windows; see the module docstring.
+
+    `document_saved(path)` is emitted for a save in any of them.
+    """
+    document_saved = Signal(str)
+
+    def __init__(self, budget: int = EDITOR_MEMORY_BUDGET, idle_s: float = UNLOAD_IDLE_S, parent=None):
+        super().__init__(parent)
+        self.budget = budget
+        self.idle_s = idle_s
+        self._editors: List = []
+        self._last_active: Dict[object, float] = {}
+        # Held while this process has spill files; named by the session they start with
+        self._spill_lock: Optional[QLockFile] = None
+        self._session = ""
+        self._timer = QTimer(self)
+        self._timer.setInterval(BUDGET_CHECK_MS)
+        self._timer.timeout.connect(self.enforce_budget)
+
+    def editors(self) -> List:
+        return list(self._editors)
+
+    def find(self, path: str):
+        """The editor that has `path` open, if any."""
+        key = _path_key(path)
+        for w in self._editors:
+            p = w.path()
+            if p and _path_key(p) == key:
+                return w
+        return None
+
+    def create(self, path: Optional[str] = None, parent=None):
+        """A new editor window (not shown yet), loading `path` if given."""
+        from ui.editor import EditorWindow
+        w = EditorWindow(path=path, parent=parent)
+        w.setAttribute(Qt.WA_DeleteOnClose)
+        w.installEventFilter(self)
+        w.document_saved.connect(self.document_saved)
+        w.destroyed.connect(lambda *_, w=w: self._forget(w))
+        self._editors.append(w)
+        self._last_active[w] = time.monotonic()
+        if not self._timer.isActive():
+            self._timer.start()
+        # Opening a document is when the budget is most likely exceeded
+        QTimer.singleShot(0, self.enforce_budget)
+        return w
+
+    def open(self, path: Optional[str] = None, parent=None):
+        """Show the editor of `path`, opening it unless it already is; a new document without a path."""
+        if path:
+            w = self.find(path)
+            if w is not None:
+                self.activate(w)
+                return w
+        w = self.create(path, parent)
+        w.show()
+        return w
+
+    def activate(self, w):
+        w.restore()
+        if w.isMinimized():
+            w.showNormal()
+        w.show()
+        w.raise_()
+        w.activateWindow()
+
+    def bytes_used(self) -> int:
+        return sum(w.memory_estimate() for w in self._editors)
+
+    def enforce_budget(self) -> int:
+        """Unload idle background documents until the estimate fits the budget; returns how many."""
+        used = self.bytes_used()
+        if used <= self.budget:
+            return 0
+        now = time.monotonic()
+        idle = [w for w in self._editors if now - self._last_active.get(w, now) >= self.idle_s]
+        idle.sort(key=lambda w: self._last_active.get(w, now))
+        unloaded = 0
+        for w in idle:
+            if used <= self.budget:
+                break
+            if not w.can_unload():
+                continue
+            est = w.memory_estimate()
+            if w.unload(self._spill_path(w)):
+                used -= est
+                unloaded += 1
+        return unloaded
+
+    def eventFilter(self, obj, e):
+        if e.type() == QEvent.WindowActivate and obj in self._last_active:
+            self._last_active[obj] = time.monotonic()
+            obj.restore()
+        elif e.type() == QEvent.WindowDeactivate and obj in self._last_active:
+            # Idle time counts from when the window went to the background
+            self._last_active[obj] = time.monotonic()
+        return False
+
+    def _forget(self, w):
+        self._last_active.pop(w, None)
+        if w in self._editors:
+            self._editors.remove(w)
+        if not self._editors:
+            self._timer.stop()
+
+    def _spill_path(self, w) -> str:
+        if self._spill_lock is None:
+            ensure_app_dirs()
+            os.makedirs(SPILL_DIR, exist_ok=True)
+            _prune_spill_dir()
+            self._session = f"{os.getpid()}-{time.time_ns():x}"
+            self._spill_lock = _spill_lock(self._session)
+            self._spill_lock.tryLock(0)
+        return os.path.join(SPILL_DIR, f"{self._session}-{id(w):x}-{time.time_ns():x}.wpg")
+
+
+def _path_key(path: str) -> str:
+    return os.path.normcase(os.path.abspath(path))
+
+
+def _spill_lock(session: str) -> QLockFile:
+    lock = QLockFile(os.path.join(SPILL_DIR, session + ".lock"))
+    # Stale only when the owning process is gone, however long it has run
+    lock.setStaleLockTime(0)
+    return lock
+
+
+def _session_gone(session: str) -> bool:
+    # Taking a stale lock and letting go of it also removes the lock file
+    lock = _spill_lock(session)
+    if not lock.tryLock(0):
+        return False
+    lock.unlock()
+    return True
+
+
+def _prune_spill_dir():
+    """Remove spill files of sessions that are no longer running.
+
+    Another running instance may have a document unloaded for days; its
+    files stay, as nothing else holds that document any more.
+    """
+    try:
+        names = os.listdir(SPILL_DIR)
+    except OSError:
+        return
+    gone: Dict[str, bool] = {}
+    for name in names:
+        if not name.endswith(".wpg"):
+            continue
+        # "<pid>-<start>-<window>-<time>.wpg"; files from before sessions had
+        # locks have no such lock and count as left behind
+        session = "-".join(name.split("-")[:2])
+        if session not in gone:
+            gone[session] = _session_gone(session)
+        if gone[session]:
+            try:
+                os.remove(os.path.join(SPILL_DIR, name))
+            except OSError:
+                pass
+
+
+_manager: Optional[EditorManager] = None
+
+
+def editor_manager() -> EditorManager:
+    global _manager
+    if _manager is None:
+        _manager = EditorManager()
+    return _manager
@@ -0,0 +1,76 @@
+import os
+from datetime import datetime
+from PySide6.QtWidgets import QDialog, QVBoxLayout, QHBoxLayout, QListWidget, QListWidgetItem, QPushButton, QTextEdit, QLabel, QSplitter
+from PySide6.QtCore import Qt
+
+from utils.history import history_writer, list_revisions, load_revision
+from utils.images import ImageDocument
+
+
+class HistoryDialog(QDialog):
+    """Saved versions of a document, newest first, with a read-only preview."""
+
+    def __init__(self, path: str, parent=None):
+        super().__init__(parent)
+        self.setWindowTitle(f"History – {os.path.basename(path)}")
+        self.resize(900, 600)
+        self._path = path
+        v = QVBoxLayout(self)
+
+        split = QSplitter(Qt.Horizontal)
+        self.list = QListWidget()
+        self.list.currentItemChanged.connect(self._show)
+        split.addWidget(self.list)
+        self.preview = QTextEdit()
+        self.preview.setDocument(ImageDocument(self.preview))
+        self.preview.setReadOnly(True)
+        split.addWidget(self.preview)
+        split.setSizes([260, 640])
+        v.addWidget(split, 1)
+
+        btns = QHBoxLayout()
+        self.info = QLabel()
+        btns.addWidget(self.info)
+        btns.addStretch(1)
+        self.restore = QPushButton("Restore")
+        self.restore.setEnabled(False)
+        self.restore.clicked.connect(self.accept)
+        close = QPushButton("Close")
+        close.clicked.connect(self.reject)
+        btns.addWidget(close)
+        btns.addWidget(self.restore)
+        v.addLayout(btns)
+
+        # Saves still being recorded show up too
+        history_writer().wait()
+        self._load()
+
+    def _load(self):
+        revisions = list_revisions(self._path)
+        for rev in revisions:
+            try:
+                when = datetime.fromisoformat(rev["ts"]).strftime("%Y-%m-%d %H:%M:%S")
+            except (KeyError, ValueError):
+                when = rev.get("ts", "?")
+            item = QListWidgetItem(f"{when}  ·  {max(1, rev.get('size', 0) // 1024)} KB")
+            item.setData(Qt.UserRole, rev)
+            self.list.addItem(item)
+        self.info.setText(f"{len(revisions)} saved versions" if revisions else "No saved versions yet")
+        if revisions:
+            self.list.setCurrentRow(0)
+
+    def _show(self, item, _previous=None):
+        rev = item.data(Qt.UserRole) if item else None
+        self.restore.setEnabled(rev is not None)
+        if rev is None:
+            self.preview.clear()
+            return
+        try:
+            load_revision(self._path, rev, self.preview.document())
+        except Exception as e:
+            self.preview.setPlainText(f"Cannot read this version: {e}")
+            self.restore.setEnabled(False)
+
+    def selected_revision(self) -> dict | None:
+        item = self.list.currentItem()
+        return item.data(Qt.UserRole) if item else None
@@ -1,24 +1,41 @@
-from PySide6.QtWidgets import QMainWindow, QWidget, QVBoxLayout, QHBoxLayout, QLabel, QPushButton, QFrame, QScrollArea, QGridLayout, QLineEdit, QGraphicsDropShadowEffect, QFileDialog, QDialog, QMenu, QInputDialog
-from PySide6.QtCore import Qt, QSize, QUrl, QTimer
-from PySide6.QtGui import QPainter, QFont, QPixmap, QColor, QDesktopServices
+from PySide6.QtWidgets import QMainWindow, QWidget, QVBoxLayout, QHBoxLayout, QLabel, QPushButton, QFrame, QLineEdit, QGraphicsDropShadowEffect, QFileDialog, QDialog, QMenu, QInputDialog, QMessageBox, QProgressBar
+from PySide6.QtCore import Qt, QUrl, QTimer, Signal
+from PySide6.QtGui import QPainter, QFont, QColor, QDesktopServices
 import os
 import subprocess
+from datetime import datetime
 
-from ui.editor import EditorWindow
-from utils.document_store import list_recents, import_file, touch_recent, remove_recent
+from utils.document_store import DOCS_DIR, list_recents, touch_recent, remove_recent
 from theme import PRIMARY_BUTTON_QSS, CARD_QSS, SHEET_QSS, SEARCH_QSS, MENU_QSS
-from ui.templates import TemplatePicker
-from utils.thumbnails import ensure_thumbnail_for_file, thumb_path
+from ui.doc_grid import DocumentListModel, DocumentGridView, PathRole
+from ui.editor_manager import editor_manager
+from utils.trace import traced
+
+# The editor, templates, thumbnails, library catalog and search index are
+# imported where they are first used, so the window is up before they load
 
 
 class GradientWidget(QWidget):
+    painted = Signal()
+
     def paintEvent(self, e):
         from theme import gradient_background
         p = QPainter(self)
         p.fillRect(self.rect(), gradient_background(self))
+        p.end()
+        self.painted.emit()
 
 
 class HomeWindow(QMainWindow):
+    """Start screen: hero card, search and the library, recent documents first.
+
+    The window is painted empty first; recents, the library catalog, the
+    search index and crash recovery are set up right after that first
+    paint (or on the first refresh(), whichever comes first).
+    """
+    # Recents are shown and the catalog is watching
+    populated = Signal()
+
     def __init__(self):
         super().__init__()
         self.setWindowTitle("WinPages")
@@ -26,6 +43,7 @@ class HomeWindow(QMainWindow):
         self.setAcceptDrops(True)
 
         root = GradientWidget()
+        root.painted.connect(self._on_first_paint, Qt.SingleShotConnection)
         self.setCentralWidget(root)
         v = QVBoxLayout(root)
         v.setContentsMargins(32, 24, 32, 24)
@@ -96,118 +114,261 @@ class HomeWindow(QMainWindow):
         top.addWidget(import_btn)
         sv.addLayout(top)
 
-        scroll = QScrollArea()
-        scroll.setWidgetResizable(True)
-        container = QWidget()
-        self.grid = QGridLayout(container)
-        self.grid.setHorizontalSpacing(24)
-        self.grid.setVerticalSpacing(18)
-        scroll.setWidget(container)
-        sv.addWidget(scroll)
+        self.model = DocumentListModel(self)
+        self.grid = DocumentGridView()
+        self.grid.setModel(self.model)
+        self.grid.clicked.connect(lambda idx: self.open_path(idx.data(PathRole)))
+        self.grid.customContextMenuRequested.connect(self._card_context_menu)
+        sv.addWidget(self.grid)
 
         v.addWidget(sheet, 1)
 
         self._search = search
+        self._importer = None
+        self._importBar = None
+        # Several editors saving at once cause a single refresh
+        self._refreshTimer = QTimer(self)
+        self._refreshTimer.setSingleShot(True)
+        self._refreshTimer.setInterval(100)
+        self._refreshTimer.timeout.connect(self.refresh)
+        self._catalog = None
+        # Grid rows of library documents by path, with the (size, mtime) they were made for
+        self._library_rows = {}
+        self._shown = frozenset()
+        editor_manager().document_saved.connect(self._schedule_refresh)
+
+    def _on_first_paint(self):
+        # Queued, so the painted frame reaches the screen before the work starts
+        QTimer.singleShot(0, self._populate)
+
+    def _populate(self):
+        if self._catalog is not None:
+            return
+        from utils.library import library_catalog
+        from utils.search_index import search_index
+        # Documents changed, added or deleted outside the app update their cards
+        self._catalog = library_catalog()
+        self._catalog.watch()
+        self._catalog.added.connect(self._schedule_refresh)
+        self._catalog.changed.connect(self._on_document_changed)
+        self._catalog.removed.connect(self._on_document_removed)
         self.refresh()
+        # Catch up on documents changed outside the app; runs on the index thread
+        search_index().reindex_library(r.get("path") for r in list_recents())
+        self.populated.emit()
+        QTimer.singleShot(0, self._offer_recovery)
+
+    def is_populated(self) -> bool:
+        return self._catalog is not None
+
+    def _offer_recovery(self):
+        from utils.autosave import pending_recoveries, discard_recovery
+        entries = pending_recoveries()
+        if not entries:
+            return
+        names = "\n".join(os.path.basename(m["path"]) if m.get("path") else "Untitled" for m in entries)
+        btn = QMessageBox.question(
+            self, "Recover documents",
+            f"WinPages did not shut down cleanly. Restore unsaved work?\n\n{names}",
+            QMessageBox.Yes | QMessageBox.No,
+        )
+        for meta in entries:
+            if btn == QMessageBox.Yes:
+                w = editor_manager().create(parent=self)
+                if w.restore_from_recovery(meta):
+                    w.show()
+                else:
+                    w.close()
+            else:
+                discard_recovery(meta)
 
     def import_files(self):
-        files, _ = QFileDialog.getOpenFileNames(self, "Import files", str(os.path.expanduser("~")), "Documents (*.html *.htm *.rtf *.txt);;All Files (*.*)")
-        changed = False
-        for f in files:
-            try:
-                dest = import_file(f)
-                ensure_thumbnail_for_file(dest)
-                changed = True
-            except Exception:
-                pass
-        if changed:
-            self.refresh()
+        files, _ = QFileDialog.getOpenFileNames(self, "Import files", str(os.path.expanduser("~")), "Documents (*.wpg *.html *.htm *.rtf *.txt);;All Files (*.*)")
+        if files:
+            self.import_paths(files)
+
+    def import_paths(self, paths):
+        """Import files and folders in the background; drops during an import join it."""
+        if self._importer is None:
+            from utils.importer import Importer
+            importer = Importer(self)
+            importer.progress.connect(self._on_import_progress)
+            importer.finished.connect(self._on_import_finished)
+            self._importer = importer
+
+            bar = QProgressBar()
+            bar.setMaximumWidth(240)
+            bar.setFormat("Importing %v/%m")
+            cancel = QPushButton("Cancel")
+            cancel.setFlat(True)
+            cancel.clicked.connect(importer.cancel)
+            self.statusBar().addPermanentWidget(bar)
+            self.statusBar().addPermanentWidget(cancel)
+            self._importBar = (bar, cancel)
+        if not self._importer.add(paths) and not self._importer.is_active():
+            self._end_import()
+
+    def _on_import_progress(self, done, total):
+        if self._importBar:
+            bar = self._importBar[0]
+            bar.setRange(0, total)
+            bar.setValue(done)
+
+    def _on_import_finished(self, imported, duplicates, failed):
+        self._end_import()
+        parts = [f"Imported {len(imported)}"]
+        if duplicates:
+            parts.append(f"{len(duplicates)} already in the library")
+        if failed:
+            parts.append(f"{len(failed)} failed")
+        self.statusBar().showMessage(", ".join(parts), 6000)
+        self.refresh()
+
+    def _end_import(self):
+        if self._importBar:
+            for w in self._importBar:
+                self.statusBar().removeWidget(w)
+                w.deleteLater()
+            self._importBar = None
+        if self._importer is not None:
+            self._importer.deleteLater()
+            self._importer = None
 
     def open_editor(self):
-        w = EditorWindow(parent=self)
-        w.document_saved.connect(lambda _: self.refresh())
-        w.show()
+        editor_manager().open(parent=self)
 
     def open_templates(self):
+        from ui.templates import TemplatePicker
         dlg = TemplatePicker(self)
         if dlg.exec() == QDialog.Accepted:
             path = dlg.selected_path()
             if path:
-                w = EditorWindow(parent=self)
-                w.document_saved.connect(lambda _: self.refresh())
+                w = editor_manager().create(parent=self)
                 w.load_from_template(path)
                 w.show()
 
+    def _schedule_refresh(self, *_):
+        self._refreshTimer.start()
+
+    @traced("HomeWindow.refresh")
     def refresh(self):
-        rec = [r for r in list_recents() if self._search.text().lower() in r.get("name", "").lower()]
-        while self.grid.count():
-            item = self.grid.takeAt(0)
-            w = item.widget()
-            if w:
-                w.deleteLater()
-        for i, r in enumerate(rec[:30]):
-            card = self._doc_card(r)
-            self.grid.addWidget(card, i // 4, i % 4)
-
-    def _doc_card(self, r):
-        f = QFrame()
-        f.setStyleSheet(CARD_QSS)
-        f.setFixedSize(QSize(210, 260))
-        v = QVBoxLayout(f)
-        v.setContentsMargins(12, 12, 12, 12)
-        v.setSpacing(8)
-
-        preview = QLabel()
-        preview.setAlignment(Qt.AlignCenter)
-        preview.setFixedHeight(160)
-        # Try load or build thumbnail
-        path = r.get("path")
-        thumb = None
-        if path:
-            thumb = ensure_thumbnail_for_file(path) or (thumb_path(path) if path else None)
-        if thumb and QPixmap(thumb).isNull() is False:
-            pm = QPixmap(thumb).scaled(180, 150, Qt.KeepAspectRatio, Qt.SmoothTransformation)
-            preview.setPixmap(pm)
-        else:
-            preview.setText("📝")
-        v.addWidget(preview)
+        if self._catalog is None:
+            self._populate()
+            return
+        from utils.thumbnails import prune_thumbnails
+        recents = list_recents()
+        self._catalog.track_recents(r.get("path") for r in recents)
+        docs = self._library(recents)
+        shown = frozenset(r["path"] for r in docs)
+        if shown != self._shown:
+            # Thumbnails of documents no longer shown are no longer needed
+            prune_thumbnails(shown)
+            self._shown = shown
+        query = self._search.text().strip()
+        if query:
+            docs = self._present(self._search_results(query, docs))
+        self.model.set_documents(docs)
+
+    def _library(self, recents):
+        # Recent documents first, then the rest of the library folder, newest first
+        docs = self._present(recents)
+        lib_dir = os.path.normcase(os.path.abspath(DOCS_DIR))
+        recent_names = {os.path.normcase(os.path.basename(r["path"])) for r in docs
+                        if os.path.normcase(os.path.dirname(os.path.abspath(r["path"]))) == lib_dir}
+        rows, self._library_rows = self._library_rows, {}
+        for path, size, mtime in self._catalog.documents():
+            name = os.path.basename(path)
+            if os.path.normcase(name) in recent_names:
+                continue
+            row = rows.get(path)
+            if row is None or row[0] != (size, mtime):
+                ts = datetime.fromtimestamp(mtime / 1e9).isoformat(timespec="minutes")
+                row = ((size, mtime), {"path": path, "name": name, "size": size, "ts": ts})
+            self._library_rows[path] = row
+            docs.append(row[1])
+        return docs
+
+    def _present(self, items):
+        # Hide documents deleted outside the app and show their current size
+        out = []
+        for r in items:
+            st = self._catalog.stat(r.get("path") or "")
+            if st is not None:
+                out.append(r if r.get("size") == st[0] else dict(r, size=st[0]))
+        return out
+
+    def _on_document_changed(self, path: str):
+        from utils.search_index import index_document
+        index_document(path)
+        self.model.invalidate_thumbnail(path)
+        self._schedule_refresh()
+
+    def _on_document_removed(self, path: str):
+        from utils.search_index import remove_document
+        from utils.thumbnails import forget_thumbnail
+        forget_thumbnail(path)
+        remove_document(path)
+        self._schedule_refresh()
+
+    def _search_results(self, query: str, docs):
+        # Ranked full-text hits first, then documents whose name merely contains the text
+        from utils.search_index import search_documents
+        rec = search_documents(query)
+        seen = {os.path.normcase(r["path"]) for r in rec}
+        q = query.lower()
+        for r in docs:
+            path = r.get("path")
+            if path and q in r.get("name", "").lower() and os.path.normcase(os.path.abspath(path)) not in seen:
+                rec.append(r)
+        return rec
+
+    def _card_context_menu(self, pos):
+        idx = self.grid.indexAt(pos)
+        if not idx.isValid():
+            return
+        path = idx.data(PathRole)
+        menu = QMenu(self.grid)
+        menu.setStyleSheet(MENU_QSS)
+        act_open = menu.addAction("Open")
+        act_rename = menu.addAction("Rename…")
+        act_reveal = menu.addAction("Reveal in Explorer")
+        chosen = menu.exec(self.grid.viewport().mapToGlobal(pos))
+        if chosen == act_open:
+            self.open_path(path)
+        elif chosen == act_rename:
+            self._rename_document(path)
+        elif chosen == act_reveal:
+            self._reveal_in_explorer(path)
 
-        name = QLabel(r.get("name"))
-        name.setStyleSheet("color: white; font-weight: 600")
-        v.addWidget(name)
+    def open_path(self, path: str):
+        """The editor of `path`, brought to the front if the file is already open."""
+        return editor_manager().open(path, parent=self)
 
-        meta = QLabel(f"{r.get('ts','')} · {int(r.get('size',0)/1024)} KB")
-        meta.setStyleSheet("color: rgb(200,200,200)")
-        v.addWidget(meta)
+    def open_documents(self, paths):
+        """Open files given on the command line or handed over by a later launch.
 
-        def on_mouse_release(e):
-            if e.button() == Qt.LeftButton:
-                self.open_path(r.get("path"))
+        Files already open bring their editor to the front; no files bring the app.
+        """
+        if not paths:
+            self._bring_to_front(self)
+            return
+        missing = []
+        for path in paths:
+            if editor_manager().find(path) is not None or os.path.isfile(path):
+                self._bring_to_front(self.open_path(path))
             else:
-                e.ignore()
-        f.mouseReleaseEvent = on_mouse_release
-        # context menu for rename/reveal
-        f._doc_path = r.get("path")
-        def context_menu(event):
-            menu = QMenu(f)
-            menu.setStyleSheet(MENU_QSS)
-            act_open = menu.addAction("Open")
-            act_rename = menu.addAction("Rename…")
-            act_reveal = menu.addAction("Reveal in Explorer")
-            chosen = menu.exec(event.globalPos())
-            if chosen == act_open:
-                self.open_path(f._doc_path)
-            elif chosen == act_rename:
-                self._rename_document(f._doc_path)
-            elif chosen == act_reveal:
-                self._reveal_in_explorer(f._doc_path)
-        f.contextMenuEvent = context_menu
-        return f
-
-    def open_path(self, path: str):
-        w = EditorWindow(path=path, parent=self)
-        w.document_saved.connect(lambda _: self.refresh())
+                missing.append(path)
+        if missing:
+            self._bring_to_front(self)
+            QMessageBox.warning(self, "Open", "Cannot find:\n\n" + "\n".join(missing))
+
+    @staticmethod
+    def _bring_to_front(w):
+        if w.isMinimized():
+            w.showNormal()
         w.show()
+        w.raise_()
+        w.activateWindow()
 
     def _reveal_in_explorer(self, path: str):
         if os.name == 'nt':
@@ -218,17 +379,11 @@ class HomeWindow(QMainWindow):
         else:
             QDesktopServices.openUrl(QUrl.fromLocalFile(os.path.dirname(path)))
 
-    def _unique_name_in_dir(self, directory: str, base_name: str) -> str:
-        name, ext = os.path.splitext(base_name)
-        candidate = os.path.join(directory, f"{name}{ext}")
-        i = 1
-        while os.path.exists(candidate):
-            candidate = os.path.join(directory, f"{name} {i}{ext}")
-            i += 1
-        return candidate
-
     def _rename_document(self, path: str):
-        if not path or not os.path.exists(path):
+        from utils.history import move_history
+        from utils.search_index import index_document, remove_document
+        from utils.thumbnails import forget_thumbnail
+        if not path or not self._catalog.exists(path):
             return
         base = os.path.basename(path)
         new_name, ok = QInputDialog.getText(self, "Rename", "New name:", text=base)
@@ -237,19 +392,18 @@ class HomeWindow(QMainWindow):
         # Keep extension if user removed it accidentally
         if not os.path.splitext(new_name)[1]:
             new_name += os.path.splitext(base)[1]
-        dest = self._unique_name_in_dir(os.path.dirname(path), new_name)
+        dest = self._catalog.unique_path(os.path.dirname(path), new_name)
         try:
-            old_thumb = thumb_path(path)
             os.replace(path, dest)
-            # Update recents and thumbnail
+            self._catalog.forget(path)
+            self._catalog.note(dest)
+            move_history(path, dest)
+            # Update recents; the new path gets its thumbnail on refresh
             remove_recent(path)
             touch_recent(dest)
-            ensure_thumbnail_for_file(dest)
-            if os.path.exists(old_thumb) and old_thumb != thumb_path(dest):
-                try:
-                    os.remove(old_thumb)
-                except Exception:
-                    pass
+            forget_thumbnail(path)
+            remove_document(path)
+            index_document(dest)
             self.refresh()
         except Exception:
             pass
@@ -264,16 +418,8 @@ class HomeWindow(QMainWindow):
 
     def dropEvent(self, event):
         md = event.mimeData()
-        changed = False
         if md.hasUrls():
-            for url in md.urls():
-                local = url.toLocalFile()
-                if local and os.path.isfile(local):
-                    try:
-                        dest = import_file(local)
-                        ensure_thumbnail_for_file(dest)
-                        changed = True
-                    except Exception:
-                        pass
-        if changed:
-            self.refresh()
+            paths = [url.toLocalFile() for url in md.urls() if url.toLocalFile()]
+            if paths:
+                self.import_paths(paths)
+                event.acceptProposedAction()
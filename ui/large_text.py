@@ -0,0 +1,256 @@
+from PySide6.QtWidgets import QAbstractScrollArea, QLineEdit
+from PySide6.QtCore import Qt, QTimer, QRect, Signal
+from PySide6.QtGui import QPainter, QFontDatabase, QColor
+
+from utils.large_text import LargeTextDocument
+
+GUTTER_PAD = 12
+
+
+class _LineEdit(QLineEdit):
+    """Editor of one line; Backspace at its start and Delete at its end join lines."""
+    joinPrevious = Signal()
+    joinNext = Signal()
+
+    def keyPressEvent(self, e):
+        if e.key() in (Qt.Key_Return, Qt.Key_Enter):
+            super().keyPressEvent(e)
+            # QLineEdit passes Return on, and the view would edit the line again
+            e.accept()
+            return
+        if not self.hasSelectedText():
+            if e.key() == Qt.Key_Backspace and self.cursorPosition() == 0:
+                self.joinPrevious.emit()
+                return
+            if e.key() == Qt.Key_Delete and self.cursorPosition() == len(self.text()):
+                self.joinNext.emit()
+                return
+        super().keyPressEvent(e)
+
+
+class LargeTextView(QAbstractScrollArea):
+    """Virtualized viewer for a LargeTextDocument.
+
+    The vertical scrollbar counts lines, not pixels, and only the lines in
+    the viewport are decoded and painted. Double-click (or Enter) edits the
+    current line in place; Enter while editing splits the line, Backspace
+    and Delete at its ends join it with its neighbour. Ctrl+Enter inserts
+    a line below the current one and Delete removes it.
+
+    `changed` is emitted after every edit.
+    """
+    modificationChanged = Signal(bool)
+    changed = Signal()
+
+    def __init__(self, doc: LargeTextDocument, parent=None):
+        super().__init__(parent)
+        self.doc = doc
+        self.setFont(QFontDatabase.systemFont(QFontDatabase.FixedFont))
+        self.viewport().setCursor(Qt.IBeamCursor)
+        self.setFocusPolicy(Qt.StrongFocus)
+        self._current = 0
+        self._max_width = 0
+        self._editor = None
+        self._line_count = 0
+        # The index grows in the background; pick up new lines until it is done
+        self._indexTimer = QTimer(self)
+        self._indexTimer.setInterval(200)
+        self._indexTimer.timeout.connect(self._sync_line_count)
+        self._indexTimer.start()
+        self._sync_line_count()
+
+    def set_document(self, doc: LargeTextDocument):
+        self._close_editor(commit=False)
+        self.doc = doc
+        self._max_width = 0
+        self._indexTimer.start()
+        self._sync_line_count()
+        self.viewport().update()
+
+    def _line_height(self) -> int:
+        return self.fontMetrics().lineSpacing()
+
+    def _visible_lines(self) -> int:
+        return max(1, self.viewport().height() // self._line_height())
+
+    def _gutter_width(self) -> int:
+        return self.fontMetrics().horizontalAdvance(str(max(1, self._line_count))) + 2 * GUTTER_PAD
+
+    def _sync_line_count(self):
+        n = self.doc.line_count()
+        if n != self._line_count:
+            self._line_count = n
+            self._update_scrollbars()
+            self.viewport().update()
+        if self.doc.indexed:
+            self._indexTimer.stop()
+
+    def _update_scrollbars(self):
+        vis = self._visible_lines()
+        vs = self.verticalScrollBar()
+        vs.setRange(0, max(0, self._line_count - vis))
+        vs.setPageStep(vis)
+        vs.setSingleStep(1)
+        hs = self.horizontalScrollBar()
+        hs.setRange(0, max(0, self._max_width - self.viewport().width() + self._gutter_width()))
+        hs.setPageStep(self.viewport().width())
+
+    def resizeEvent(self, e):
+        super().resizeEvent(e)
+        self._update_scrollbars()
+
+    def scrollContentsBy(self, dx, dy):
+        self._close_editor(commit=True)
+        self.viewport().update()
+
+    def paintEvent(self, e):
+        p = QPainter(self.viewport())
+        pal = self.palette()
+        p.fillRect(self.viewport().rect(), pal.base())
+        fm = self.fontMetrics()
+        lh = self._line_height()
+        gutter = self._gutter_width()
+        first = self.verticalScrollBar().value()
+        last = min(self._line_count, first + self._visible_lines() + 1)
+        xoff = self.horizontalScrollBar().value()
+        p.fillRect(QRect(0, 0, gutter - GUTTER_PAD // 2, self.viewport().height()), pal.alternateBase())
+        widest = self._max_width
+        for row, i in enumerate(range(first, last)):
+            y = row * lh
+            if i == self._current:
+                p.fillRect(QRect(gutter - GUTTER_PAD // 2, y, self.viewport().width(), lh), pal.alternateBase())
+            text = self.doc.line(i)
+            p.setPen(QColor(120, 130, 150))
+            p.drawText(QRect(0, y, gutter - GUTTER_PAD, lh), Qt.AlignRight | Qt.AlignVCenter, str(i + 1))
+            p.setPen(pal.text().color())
+            p.setClipRect(QRect(gutter, 0, self.viewport().width() - gutter, self.viewport().height()))
+            p.drawText(gutter - xoff, y + fm.ascent(), text)
+            p.setClipping(False)
+            widest = max(widest, fm.horizontalAdvance(text))
+        p.end()
+        if widest != self._max_width:
+            self._max_width = widest
+            self._update_scrollbars()
+
+    def _row_to_line(self, y: int) -> int:
+        return self.verticalScrollBar().value() + y // self._line_height()
+
+    def mousePressEvent(self, e):
+        line = self._row_to_line(int(e.position().y()))
+        if line < self._line_count:
+            self._close_editor(commit=True)
+            self._current = line
+            self.viewport().update()
+
+    def mouseDoubleClickEvent(self, e):
+        line = self._row_to_line(int(e.position().y()))
+        if line < self._line_count:
+            self._current = line
+            self._edit_line(line)
+
+    def keyPressEvent(self, e):
+        if e.key() in (Qt.Key_Return, Qt.Key_Enter) and e.modifiers() & Qt.ControlModifier:
+            self._change(lambda: self.doc.insert_lines(self._current + 1, [""]))
+            self._move_current(1)
+            self._edit_line(self._current)
+        elif e.key() in (Qt.Key_Return, Qt.Key_Enter):
+            self._edit_line(self._current)
+        elif e.key() == Qt.Key_Delete:
+            self._change(lambda: self.doc.delete_lines(self._current))
+        elif e.key() == Qt.Key_Up:
+            self._move_current(-1)
+        elif e.key() == Qt.Key_Down:
+            self._move_current(1)
+        elif e.key() in (Qt.Key_PageUp, Qt.Key_PageDown):
+            step = self._visible_lines() * (1 if e.key() == Qt.Key_PageDown else -1)
+            self._move_current(step)
+        elif e.key() == Qt.Key_Home and e.modifiers() & Qt.ControlModifier:
+            self._move_current(-self._current)
+        elif e.key() == Qt.Key_End and e.modifiers() & Qt.ControlModifier:
+            self._move_current(self._line_count - 1 - self._current)
+        else:
+            super().keyPressEvent(e)
+
+    def _move_current(self, delta: int):
+        self._current = max(0, min(self._line_count - 1, self._current + delta))
+        vs = self.verticalScrollBar()
+        if self._current < vs.value():
+            vs.setValue(self._current)
+        elif self._current >= vs.value() + self._visible_lines():
+            vs.setValue(self._current - self._visible_lines() + 1)
+        self.viewport().update()
+
+    def _edit_line(self, line: int, cursor: int = -1):
+        self._close_editor(commit=True)
+        row = line - self.verticalScrollBar().value()
+        if row < 0 or row >= self._visible_lines():
+            return
+        ed = _LineEdit(self.viewport())
+        ed.setFont(self.font())
+        ed.setFrame(False)
+        ed.setText(self.doc.line(line))
+        lh = self._line_height()
+        gutter = self._gutter_width()
+        ed.setGeometry(gutter, row * lh, self.viewport().width() - gutter, lh + 2)
+        ed.returnPressed.connect(lambda: self._split_line(ed))
+        # Also emitted by the editor a split has just replaced, which is ignored
+        ed.editingFinished.connect(lambda: self._editing(ed) and self._close_editor(commit=True))
+        ed.joinPrevious.connect(lambda: self._join_line(ed, -1))
+        ed.joinNext.connect(lambda: self._join_line(ed, 1))
+        ed.show()
+        ed.setFocus()
+        if cursor >= 0:
+            ed.setCursorPosition(cursor)
+        self._editor = (ed, line)
+
+    def _editing(self, ed) -> bool:
+        return self._editor is not None and self._editor[0] is ed
+
+    def _split_line(self, ed):
+        if not self._editing(ed):
+            return
+        line, text, pos = self._editor[1], ed.text(), ed.cursorPosition()
+        self._close_editor(commit=False)
+        self._change(lambda: self.doc.replace_lines(line, 1, [text[:pos], text[pos:]]))
+        self._current = line
+        self._move_current(1)
+        self._edit_line(self._current, 0)
+
+    def _join_line(self, ed, direction: int):
+        if not self._editing(ed):
+            return
+        line, text = self._editor[1], ed.text()
+        first = line - 1 if direction < 0 else line
+        if first < 0 or first + 1 >= self._line_count:
+            return
+        self._close_editor(commit=False)
+        head = self.doc.line(first) if direction < 0 else text
+        tail = text if direction < 0 else self.doc.line(line + 1)
+        self._change(lambda: self.doc.replace_lines(first, 2, [head + tail]))
+        self._current = line
+        self._move_current(first - line)
+        self._edit_line(first, len(head))
+
+    def _change(self, edit):
+        """Apply `edit` to the document and bring the view up to date."""
+        was = self.doc.modified
+        edit()
+        self._sync_line_count()
+        self._current = max(0, min(self._current, self._line_count - 1))
+        self.viewport().update()
+        self.changed.emit()
+        if self.doc.modified != was:
+            self.modificationChanged.emit(self.doc.modified)
+
+    def _close_editor(self, commit: bool):
+        if not self._editor:
+            return
+        ed, line = self._editor
+        self._editor = None
+        ed.hide()
+        ed.deleteLater()
+        self.setFocus()
+        if commit and ed.text() != self.doc.line(line):
+            self._change(lambda: self.doc.set_line(line, ed.text()))
+        else:
+            self.viewport().update()
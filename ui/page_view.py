@@ -0,0 +1,296 @@
+import math
+from typing import Dict
+from PySide6.QtWidgets import QTextEdit, QListView, QAbstractItemView
+from PySide6.QtGui import QAbstractTextDocumentLayout, QColor, QImage, QPainter, QPalette, QPixmap
+from PySide6.QtCore import Qt, QAbstractListModel, QModelIndex, QRectF, QSize, QTimer, Signal
+
+from utils.images import ImageDocument
+from utils.pdf_export import page_size, paginate
+
+DESK_COLOR = QColor("#e3e5e8")
+PAGE_BORDER = QColor("#c4c8ce")
+# Sheets are white whatever the theme, so the text on them stays dark
+PAGE_COLOR = QColor(Qt.white)
+PAGE_TEXT = QColor("#1a1d21")
+# Desk shown between two sheets; it only covers page margins
+PAGE_GAP = 10
+# Page thumbnails kept rendered; the rest are drawn again when scrolled to
+THUMB_CACHE_PAGES = 96
+# Edits are collected for this long before thumbnails of changed pages are redrawn
+THUMB_REFRESH_MS = 400
+
+
+class PageView(QTextEdit):
+    """Rich-text editor that can show its document as A4 pages.
+
+    In page mode the document is paginated at screen resolution with the
+    page size and margins of the PDF export. Qt lays a paginated document
+    out lazily, the part on screen first and the rest in the background,
+    and after an edit only the changed blocks are laid out again; blocks
+    below are moved and their page breaks checked. Page counts, page
+    thumbnails (render_page()) and PDF export with reuse_layout all read
+    that layout instead of laying the document out themselves.
+    """
+    pageCountChanged = Signal(int)
+    currentPageChanged = Signal(int)
+    # First page whose content may have changed since the last emission
+    pagesChanged = Signal(int)
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.setDocument(ImageDocument(self))
+        self._paged = False
+        # The palette outside page mode, given back when it is left
+        self._plain_palette = self.palette()
+        self._page_size = page_size()
+        self._pages = 1
+        self._current = 0
+        self._changed_from = -1
+        self._changeTimer = QTimer(self)
+        self._changeTimer.setSingleShot(True)
+        self._changeTimer.setInterval(THUMB_REFRESH_MS)
+        self._changeTimer.timeout.connect(self._emit_pages_changed)
+        self.document().contentsChange.connect(self._on_contents_change)
+        self.document().documentLayout().documentSizeChanged.connect(self._on_size_changed)
+        self.verticalScrollBar().valueChanged.connect(self._update_current_page)
+        # UndoHistory that takes undo and redo past the document's own stack
+        self.undo_history = None
+
+    def keyPressEvent(self, e):
+        if self.undo_history is not None and self.undo_history.handle_key(e):
+            return
+        super().keyPressEvent(e)
+
+    # -- page mode ----------------------------------------------------------
+
+    def page_mode(self) -> bool:
+        return self._paged
+
+    def set_page_mode(self, on: bool):
+        if on == self._paged:
+            return
+        self._paged = on
+        doc = self.document()
+        if on:
+            self.setLineWrapMode(QTextEdit.FixedPixelWidth)
+            self.setLineWrapColumnOrWidth(math.ceil(self._page_size.width()))
+            paginate(doc, self._page_size)
+        else:
+            doc.setDocumentMargin(4)
+            # Resets the page size to the viewport width, unpaginated
+            self.setLineWrapMode(QTextEdit.WidgetWidth)
+        # Pages are painted on the desk, which also fills the margin that centers them
+        self.viewport().setAutoFillBackground(not on)
+        if on:
+            self._plain_palette = self.palette()
+            pal = QPalette(self._plain_palette)
+            pal.setColor(QPalette.Window, DESK_COLOR)
+            pal.setColor(QPalette.Base, PAGE_COLOR)
+            pal.setColor(QPalette.Text, PAGE_TEXT)
+            self.setPalette(pal)
+        else:
+            self.setPalette(self._plain_palette)
+        self.setAutoFillBackground(on)
+        self._center_page()
+        self.viewport().update()
+        if not on:
+            self._set_page_count(1)
+
+    def _keep_paginated(self):
+        # QTextEdit resets the page size to its own width whenever it lays the
+        # document out again (loads, scroll bars appearing, resizes)
+        if self._paged and self.document().pageSize() != self._page_size:
+            paginate(self.document(), self._page_size)
+
+    def _center_page(self):
+        if not self._paged:
+            self.setViewportMargins(0, 0, 0, 0)
+            return
+        free = self.width() - 2 * self.frameWidth() - math.ceil(self._page_size.width())
+        if self.verticalScrollBar().isVisible():
+            free -= self.verticalScrollBar().width()
+        self.setViewportMargins(max(0, free // 2), 0, 0, 0)
+
+    def resizeEvent(self, e):
+        super().resizeEvent(e)
+        if self._paged:
+            QTimer.singleShot(0, self, self._keep_paginated)
+            if e.size().width() != e.oldSize().width():
+                self._center_page()
+
+    def paintEvent(self, e):
+        if self._paged:
+            p = QPainter(self.viewport())
+            p.fillRect(e.rect(), DESK_COLOR)
+            h = self._page_size.height()
+            w = self._page_size.width()
+            x = -self.horizontalScrollBar().value()
+            top = self.verticalScrollBar().value()
+            first = int((top + e.rect().top()) // h)
+            last = int((top + e.rect().bottom()) // h)
+            p.setPen(PAGE_BORDER)
+            for page in range(first, min(last, self._pages - 1) + 1):
+                sheet = QRectF(x, page * h - top, w, h).adjusted(0.5, PAGE_GAP / 2, -0.5, -PAGE_GAP / 2)
+                p.fillRect(sheet, PAGE_COLOR)
+                p.drawRect(sheet)
+            p.end()
+        super().paintEvent(e)
+
+    # -- pages ----------------------------------------------------------------
+
+    def page_size(self):
+        return self._page_size
+
+    def page_count(self) -> int:
+        """Pages laid out so far; the full count once the layout has caught up."""
+        return self._pages
+
+    def current_page(self) -> int:
+        return self._current
+
+    def page_of(self, position: int) -> int:
+        """Page holding the character at `position` (lays the document out up to it)."""
+        block = self.document().findBlock(position)
+        if not block.isValid() or not self._paged:
+            return 0
+        y = self.document().documentLayout().blockBoundingRect(block).top()
+        return int(y // self._page_size.height())
+
+    def scroll_to_page(self, page: int):
+        self.verticalScrollBar().setValue(int(page * self._page_size.height()))
+
+    def render_page(self, page: int, width: int) -> QImage:
+        """Page `page` painted from the current layout, `width` pixels wide."""
+        scale = width / self._page_size.width()
+        h = self._page_size.height()
+        img = QImage(width, round(h * scale), QImage.Format_RGB32)
+        img.fill(PAGE_COLOR)
+        p = QPainter(img)
+        p.setRenderHint(QPainter.Antialiasing)
+        p.setRenderHint(QPainter.SmoothPixmapTransform)
+        p.scale(scale, scale)
+        p.translate(0, -page * h)
+        view = QRectF(0, page * h, self._page_size.width(), h)
+        p.setClipRect(view)
+        ctx = QAbstractTextDocumentLayout.PaintContext()
+        ctx.clip = view
+        ctx.palette.setColor(QPalette.Text, PAGE_TEXT)
+        self.document().documentLayout().draw(p, ctx)
+        p.end()
+        return img
+
+    def _on_size_changed(self, size):
+        # Reported as the layout progresses, so it never forces a full layout
+        if self._paged:
+            QTimer.singleShot(0, self, self._keep_paginated)
+            self._set_page_count(max(1, math.ceil(size.height() / self._page_size.height() - 0.01)))
+
+    def _set_page_count(self, pages: int):
+        if pages != self._pages:
+            self._pages = pages
+            self.pageCountChanged.emit(pages)
+            self._update_current_page()
+
+    def _update_current_page(self, *args):
+        page = 0
+        if self._paged:
+            # The page filling the upper part of the window
+            y = self.verticalScrollBar().value() + self.viewport().height() / 3
+            page = min(self._pages - 1, int(y // self._page_size.height()))
+        if page != self._current:
+            self._current = page
+            self.currentPageChanged.emit(page)
+
+    def _on_contents_change(self, position: int, removed: int, added: int):
+        if self._changed_from < 0 or position < self._changed_from:
+            self._changed_from = position
+        self._changeTimer.start()
+
+    def _emit_pages_changed(self):
+        position, self._changed_from = self._changed_from, -1
+        if position >= 0 and self._paged:
+            self.pagesChanged.emit(self.page_of(position))
+
+
+class PageThumbnails(QAbstractListModel):
+    """Thumbnails of the pages of a PageView, rendered when a view asks for them."""
+
+    def __init__(self, view: PageView, width: int = 120, parent=None):
+        super().__init__(parent)
+        self._view = view
+        self._width = width
+        self._rows = view.page_count()
+        self._cache: Dict[int, QPixmap] = {}
+        view.pageCountChanged.connect(self._set_rows)
+        view.pagesChanged.connect(self.invalidate)
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else self._rows
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid():
+            return None
+        page = index.row()
+        if role == Qt.DisplayRole:
+            return str(page + 1)
+        if role == Qt.DecorationRole:
+            pix = self._cache.get(page)
+            if pix is None:
+                pix = QPixmap.fromImage(self._view.render_page(page, self._width))
+                if len(self._cache) >= THUMB_CACHE_PAGES:
+                    # Drop the thumbnail furthest from the one being shown
+                    del self._cache[max(self._cache, key=lambda p: abs(p - page))]
+                self._cache[page] = pix
+            return pix
+        if role == Qt.SizeHintRole:
+            size = self._view.page_size()
+            return QSize(self._width + 16, round(size.height() * self._width / size.width()) + 28)
+        return None
+
+    def invalidate(self, first_page: int = 0):
+        """Thumbnails from `first_page` on are drawn again."""
+        for page in [p for p in self._cache if p >= first_page]:
+            del self._cache[page]
+        if first_page < self._rows:
+            self.dataChanged.emit(self.index(first_page), self.index(self._rows - 1), [Qt.DecorationRole])
+
+    def _set_rows(self, rows: int):
+        if rows > self._rows:
+            self.beginInsertRows(QModelIndex(), self._rows, rows - 1)
+            self._rows = rows
+            self.endInsertRows()
+        elif rows < self._rows:
+            self.beginRemoveRows(QModelIndex(), rows, self._rows - 1)
+            for page in [p for p in self._cache if p >= rows]:
+                del self._cache[page]
+            self._rows = rows
+            self.endRemoveRows()
+
+
+class PageStrip(QListView):
+    """Column of page thumbnails; clicking one scrolls the editor to that page."""
+
+    def __init__(self, view: PageView, parent=None):
+        super().__init__(parent)
+        self._view = view
+        self.setModel(PageThumbnails(view, parent=self))
+        self.setViewMode(QListView.IconMode)
+        self.setFlow(QListView.TopToBottom)
+        self.setWrapping(False)
+        self.setMovement(QListView.Static)
+        self.setUniformItemSizes(True)
+        size = view.page_size()
+        self.setIconSize(QSize(120, round(size.height() * 120 / size.width())))
+        self.setSelectionMode(QAbstractItemView.SingleSelection)
+        self.setHorizontalScrollBarPolicy(Qt.ScrollBarAlwaysOff)
+        pal = self.palette()
+        pal.setColor(QPalette.Base, DESK_COLOR)
+        self.setPalette(pal)
+        self.clicked.connect(lambda index: view.scroll_to_page(index.row()))
+        view.currentPageChanged.connect(self._follow)
+
+    def _follow(self, page: int):
+        index = self.model().index(page)
+        if index.isValid():
+            self.setCurrentIndex(index)
+            self.scrollTo(index)
@@ -0,0 +1,63 @@
+import os
+from PySide6.QtWidgets import QLabel
+from PySide6.QtGui import QFont
+from PySide6.QtCore import Qt, QTimer
+
+from utils.trace import tracer
+
+# How often the numbers are read again from the tracer
+OVERLAY_REFRESH_MS = 500
+# Spans listed, most recently finished first
+OVERLAY_ROWS = 10
+
+
+class TraceOverlay(QLabel):
+    """Small always-on-top window with the latest numbers of the running trace.
+
+    Double-click to hide it; tracing goes on.
+    """
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.setWindowFlags(Qt.Tool | Qt.FramelessWindowHint | Qt.WindowStaysOnTopHint | Qt.WindowDoesNotAcceptFocus)
+        self.setAttribute(Qt.WA_ShowWithoutActivating)
+        self.setTextFormat(Qt.PlainText)
+        self.setAlignment(Qt.AlignLeft | Qt.AlignTop)
+        f = QFont("Consolas" if os.name == "nt" else "monospace")
+        f.setStyleHint(QFont.Monospace)
+        f.setPointSize(9)
+        self.setFont(f)
+        self.setStyleSheet("QLabel { background: rgba(12, 16, 24, 220); color: rgb(200, 220, 240);"
+                           " border: 1px solid rgb(60, 80, 110); padding: 8px; }")
+        self.setWindowOpacity(0.92)
+        self._timer = QTimer(self)
+        self._timer.setInterval(OVERLAY_REFRESH_MS)
+        self._timer.timeout.connect(self.update_numbers)
+        self._timer.start()
+        self.update_numbers()
+
+    def update_numbers(self):
+        t = tracer()
+        if t is None:
+            self.setText("Tracing is off")
+            return
+        snap = t.snapshot()
+        lines = [f"{'span':<34}{'n':>6}{'last ms':>9}{'avg':>9}{'max':>9}"]
+        for name, count, last, avg, peak in snap["spans"][:OVERLAY_ROWS]:
+            lines.append(f"{name[:33]:<34}{count:>6}{last:>9.1f}{avg:>9.1f}{peak:>9.1f}")
+        stalls, last, peak = snap["stalls"]
+        lines.append("")
+        lines.append(f"event loop stalls {stalls}  last {last:.0f} ms  max {peak:.0f} ms")
+        lines.append(f"read {snap['bytes_read'] / 1e6:.2f} MB  written {snap['bytes_written'] / 1e6:.2f} MB")
+        lines.append(os.path.basename(t.path))
+        self.setText("\n".join(lines))
+        self.adjustSize()
+
+    def showEvent(self, e):
+        super().showEvent(e)
+        # Top right corner of the screen the overlay is on
+        screen = self.screen().availableGeometry()
+        self.move(screen.right() - self.width() - 16, screen.top() + 16)
+
+    def mouseDoubleClickEvent(self, e):
+        self.hide()
@@ -0,0 +1,202 @@
+import json
+import os
+from datetime import datetime
+from typing import Dict, List, Optional
+from PySide6.QtGui import QTextDocument
+from PySide6.QtCore import QLockFile, QObject, QRunnable, QThreadPool
+
+from .document_store import APP_DIR
+
+RECOVERY_DIR = os.path.join(APP_DIR, "recovery")
+# Idle time after the last edit before a snapshot is journaled
+AUTOSAVE_IDLE_MS = 3000
+# Journal content by kind of document: HTML of a rich-text document, or the
+# edits of a memory-mapped large text file (LargeTextDocument.journal())
+_CONTENT_EXT = {"html": ".html", "large_text": ".ltx"}
+
+
+def _write_atomic(path: str, data: bytes):
+    tmp = path + ".tmp"
+    with open(tmp, "wb") as f:
+        f.write(data)
+    os.replace(tmp, path)
+
+
+def _remove(path: str):
+    try:
+        os.remove(path)
+    except OSError:
+        pass
+
+
+class _SnapshotJob(QRunnable):
+    def __init__(self, entry_id: str, content, meta: Dict):
+        super().__init__()
+        self._entry_id = entry_id
+        # The HTML of a document, or journal bytes
+        self._content = content
+        self._meta = meta
+
+    def run(self):
+        try:
+            data = self._content
+            if isinstance(data, str):
+                data = data.encode("utf-8")
+            os.makedirs(RECOVERY_DIR, exist_ok=True)
+            base = os.path.join(RECOVERY_DIR, self._entry_id)
+            _write_atomic(base + _CONTENT_EXT[self._meta["kind"]], data)
+            # Metadata last: an entry only counts once its content is complete
+            _write_atomic(base + ".json", json.dumps(self._meta, ensure_ascii=False).encode("utf-8"))
+        except Exception:
+            pass
+        finally:
+            self._content = None
+
+
+class _DiscardJob(QRunnable):
+    def __init__(self, entry_id: str, lock: Optional[QLockFile]):
+        super().__init__()
+        self._entry_id = entry_id
+        self._lock = lock
+
+    def run(self):
+        base = os.path.join(RECOVERY_DIR, self._entry_id)
+        _remove(base + ".json")
+        for ext in _CONTENT_EXT.values():
+            _remove(base + ext)
+        # Released only now, so no other instance sees a half-removed entry as abandoned
+        if self._lock is not None:
+            self._lock.unlock()
+            self._lock = None
+
+
+def _lock_file(entry_id: str) -> QLockFile:
+    lock = QLockFile(os.path.join(RECOVERY_DIR, entry_id + ".lock"))
+    # Stale only when the owning process is gone, however long it has held the lock
+    lock.setStaleLockTime(0)
+    return lock
+
+
+class AutosaveWriter(QObject):
+    """Writes document snapshots into the recovery journal off the GUI thread.
+
+    A single worker keeps journal writes and discards for an entry in order.
+    Each entry this process journals is held under a lock file until it is
+    discarded, so other running instances do not offer it for recovery.
+    """
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self._pool = QThreadPool(self)
+        self._pool.setMaxThreadCount(1)
+        self._locks: Dict[str, QLockFile] = {}
+
+    def claim(self, entry_id: str) -> bool:
+        """Hold the lock of `entry_id`; False if another running instance holds it."""
+        if entry_id in self._locks:
+            return True
+        os.makedirs(RECOVERY_DIR, exist_ok=True)
+        lock = _lock_file(entry_id)
+        if not lock.tryLock(0):
+            return False
+        self._locks[entry_id] = lock
+        return True
+
+    def release(self, entry_id: str):
+        """Let go of `entry_id` without discarding it, for another session to recover."""
+        lock = self._locks.pop(entry_id, None)
+        if lock is not None:
+            lock.unlock()
+
+    def snapshot(self, entry_id: str, doc: QTextDocument, path: Optional[str], title: str):
+        """Journal `doc`; it is serialized here, encoding and writing happen on the worker."""
+        self.claim(entry_id)
+        # toHtml() takes a fraction of what clone() would (0.1 s against 0.65 s
+        # for 3.6M characters), and the document must not be read off its thread
+        self._pool.start(_SnapshotJob(entry_id, doc.toHtml(), _meta(entry_id, "html", path, title)))
+
+    def snapshot_large_text(self, entry_id: str, doc, path: Optional[str], title: str):
+        """Journal the edits of a LargeTextDocument; the file itself stays where it is."""
+        self.claim(entry_id)
+        self._pool.start(_SnapshotJob(entry_id, doc.journal(), _meta(entry_id, "large_text", path, title)))
+
+    def discard(self, entry_id: str):
+        self._pool.start(_DiscardJob(entry_id, self._locks.pop(entry_id, None)))
+
+    def wait(self, msecs: int = -1) -> bool:
+        return self._pool.waitForDone(msecs)
+
+
+def _meta(entry_id: str, kind: str, path: Optional[str], title: str) -> Dict:
+    return {
+        "id": entry_id,
+        "kind": kind,
+        "path": path,
+        "title": title,
+        "ts": datetime.now().isoformat(timespec="seconds"),
+        "pid": os.getpid(),
+    }
+
+
+_writer: Optional[AutosaveWriter] = None
+
+
+def autosave_writer() -> AutosaveWriter:
+    global _writer
+    if _writer is None:
+        _writer = AutosaveWriter()
+    return _writer
+
+
+def _abandoned(entry_id: str) -> bool:
+    # The lock is free once its owner has exited or crashed; journals from
+    # before lock files existed have none and count as abandoned
+    lock = _lock_file(entry_id)
+    if not lock.tryLock(0):
+        return False
+    lock.unlock()
+    return True
+
+
+def pending_recoveries() -> List[Dict]:
+    """Journal entries left behind by sessions that are no longer running, newest first."""
+    out = []
+    try:
+        names = os.listdir(RECOVERY_DIR)
+    except OSError:
+        return out
+    for name in names:
+        if not name.endswith(".json"):
+            continue
+        try:
+            with open(os.path.join(RECOVERY_DIR, name), "r", encoding="utf-8") as f:
+                meta = json.load(f)
+        except Exception:
+            continue
+        if meta.get("pid") == os.getpid() or not _abandoned(name[:-5]):
+            continue
+        ext = _CONTENT_EXT.get(meta.setdefault("kind", "html"))
+        if ext is None:
+            continue
+        meta["content_path"] = os.path.join(RECOVERY_DIR, name[:-5] + ext)
+        if os.path.exists(meta["content_path"]):
+            out.append(meta)
+    out.sort(key=lambda m: m.get("ts", ""), reverse=True)
+    return out
+
+
+def read_recovery(meta: Dict) -> str:
+    """The HTML of a rich-text entry."""
+    with open(meta["content_path"], "r", encoding="utf-8") as f:
+        return f.read()
+
+
+def read_large_text_recovery(meta: Dict) -> bytes:
+    """The journaled edits of a large text file entry."""
+    with open(meta["content_path"], "rb") as f:
+        return f.read()
+
+
+def discard_recovery(meta: Dict):
+    _remove(os.path.join(RECOVERY_DIR, meta["id"] + ".json"))
+    _remove(meta["content_path"])
@@ -0,0 +1,112 @@
+import os
+from typing import Dict, Optional, Tuple
+from PySide6.QtGui import QTextDocument
+
+from .wpg import collect_images, is_wpg_path, load_wpg, read_wpg_text, write_wpg
+from .rtf import is_rtf_file, read_rtf, rtf_to_text, write_rtf
+from .trace import add_bytes, file_read, file_written, traced
+
+DOCUMENT_EXTS = (".wpg", ".html", ".htm", ".rtf", ".txt")
+HTML_EXTS = (".html", ".htm")
+EXPORT_FORMATS = ("wpg", "html", "rtf", "txt", "pdf")
+
+
+def document_kind(path: str) -> str:
+    """How the file at `path` is read: "wpg", "rtf", "html" or "text"."""
+    ext = os.path.splitext(path)[1].lower()
+    if is_wpg_path(path):
+        return "wpg"
+    if ext == ".rtf":
+        # Earlier versions wrote HTML into .rtf files
+        return "rtf" if is_rtf_file(path) else "html"
+    if ext in HTML_EXTS:
+        return "html"
+    return "text"
+
+
+def is_html_path(path: str) -> bool:
+    return document_kind(path) == "html"
+
+
+def read_text(path: str, limit: int = -1) -> str:
+    with open(path, "r", encoding="utf-8", errors="ignore") as f:
+        data = f.read(limit)
+    add_bytes(read=len(data), path=path)
+    return data
+
+
+@traced("load_document")
+def load_document(path: str, doc: Optional[QTextDocument] = None) -> QTextDocument:
+    """Read `path` into `doc` (a new document if not given)."""
+    doc = doc if doc is not None else QTextDocument()
+    kind = document_kind(path)
+    if kind in ("wpg", "rtf"):
+        file_read(path)
+        if kind == "wpg":
+            load_wpg(path, doc)
+        else:
+            read_rtf(path, doc)
+        return doc
+    data = read_text(path)
+    if kind == "html":
+        doc.setHtml(data)
+    else:
+        doc.setPlainText(data)
+    return doc
+
+
+def serialize_document(doc: QTextDocument, path: str) -> Tuple[str, bool]:
+    """The text written for `doc` when saved as `path` (HTML or plain text), and whether it is HTML."""
+    if os.path.splitext(path)[1].lower() in HTML_EXTS:
+        return doc.toHtml(), True
+    return doc.toPlainText(), False
+
+
+def read_index_text(path: str, limit: int = -1) -> Tuple[str, bool]:
+    """Text to index for `path`, and whether it is HTML; containers give their extract."""
+    kind = document_kind(path)
+    if kind == "wpg":
+        return read_wpg_text(path)[:limit] if limit >= 0 else read_wpg_text(path), False
+    if kind == "rtf":
+        return rtf_to_text(path, limit), False
+    return read_text(path, limit), kind == "html"
+
+
+@traced("save_document")
+def save_document(doc: QTextDocument, path: str) -> Tuple[str, bool, Optional[Tuple[str, Dict[str, bytes]]]]:
+    """Write `doc` to `path`; returns what was written, whether it is HTML, and the snapshot.
+
+    For .wpg and .rtf files what was written is the document's plain text.
+    The snapshot is the document's HTML and its images by name, for the
+    formats that serialize it anyway (.wpg and HTML); None for the others.
+    """
+    snapshot = None
+    if is_wpg_path(path):
+        from .thumbnails import render_thumbnail_image
+        html = doc.toHtml()
+        images = collect_images(doc)
+        text = write_wpg(path, doc, render_thumbnail_image(html, True, doc), html, images)
+        out = text, False
+        snapshot = html, {name: data for name, (_, data) in images.items()}
+    elif path.lower().endswith(".rtf"):
+        write_rtf(doc, path)
+        out = doc.toPlainText(), False
+    else:
+        out = serialize_document(doc, path)
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(out[0])
+        if out[1]:
+            # Walking the document for images costs more than the HTML; most have none
+            images = collect_images(doc) if "<img" in out[0] else {}
+            snapshot = out[0], {name: data for name, (_, data) in images.items()}
+    file_written(path)
+    return out[0], out[1], snapshot
+
+
+def export_document(doc: QTextDocument, path: str):
+    """Save `doc` as `path`, printing it when the extension is .pdf."""
+    if path.lower().endswith(".pdf"):
+        from .pdf_export import print_to_pdf
+        print_to_pdf(doc, path)
+    else:
+        save_document(doc, path)
@@ -1,69 +1,200 @@
+import atexit
+import itertools
 import json
 import os
 import shutil
+import threading
 from datetime import datetime
 from typing import List, Dict
 
+from .trace import file_read, file_written, traced
+
 APP_DIR = os.path.join(os.path.expanduser("~"), ".winpages")
 DOCS_DIR = os.path.join(APP_DIR, "documents")
 RECENTS_FILE = os.path.join(APP_DIR, "recents.json")
 
-os.makedirs(APP_DIR, exist_ok=True)
-os.makedirs(DOCS_DIR, exist_ok=True)
 
-def _load() -> List[Dict]:
-    if os.path.exists(RECENTS_FILE):
+MAX_RECENTS = 50
+# Mutations are written out this many seconds after the last one
+RECENTS_SAVE_DELAY = 0.5
+
+
+_dirs_made = False
+
+
+def ensure_app_dirs():
+    """Create ~/.winpages and its documents folder; done before the first write, not on import."""
+    global _dirs_made
+    if not _dirs_made:
+        os.makedirs(DOCS_DIR, exist_ok=True)
+        _dirs_made = True
+
+
+class RecentsStore:
+    """Process-wide recents list, loaded once and served from memory.
+
+    Mutations mark the store dirty and schedule a single debounced write;
+    the file is replaced atomically so a crash never leaves it half written.
+    Writes are serialized, each with the list as it is when its turn comes,
+    so a slower older write never lands after a newer one.
+    The on-disk format is the same JSON list as before.
+    """
+    _tmp_ids = itertools.count()
+
+    def __init__(self, path: str, delay: float = RECENTS_SAVE_DELAY):
+        self.path = path
+        self.delay = delay
+        self._lock = threading.RLock()
+        # Held across a whole write; taken before _lock, never inside it
+        self._write_lock = threading.Lock()
+        self._items: List[Dict] | None = None
+        self._timer: threading.Timer | None = None
+        self._dirty = False
+        self.writes = 0
+
+    def _ensure_loaded(self) -> List[Dict]:
+        if self._items is None:
+            self._items = self._read()
+        return self._items
+
+    def _read(self) -> List[Dict]:
         try:
-            with open(RECENTS_FILE, "r", encoding="utf-8") as f:
-                return json.load(f)
+            with open(self.path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            file_read(self.path)
         except Exception:
             return []
-    return []
+        if not isinstance(data, list):
+            return []
+        return [i for i in data if isinstance(i, dict) and i.get("path")]
+
+    def _write(self, items: List[Dict]):
+        ensure_app_dirs()
+        tmp = f"{self.path}.{os.getpid()}.{threading.get_ident()}.{next(self._tmp_ids)}.tmp"
+        try:
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump(items, f, ensure_ascii=False, indent=2)
+            os.replace(tmp, self.path)
+        except OSError:
+            try:
+                os.remove(tmp)
+            except OSError:
+                pass
+            raise
+        self.writes += 1
+        file_written(self.path)
+
+    def _schedule(self):
+        if self._timer is not None:
+            self._timer.cancel()
+        self._timer = threading.Timer(self.delay, self.flush)
+        self._timer.daemon = True
+        self._timer.start()
+
+    @traced("RecentsStore.flush")
+    def flush(self):
+        with self._write_lock:
+            with self._lock:
+                if self._timer is not None:
+                    self._timer.cancel()
+                    self._timer = None
+                if not self._dirty:
+                    return
+                items = list(self._items)
+                self._dirty = False
+            try:
+                self._write(items)
+            except OSError:
+                # Left dirty for the next mutation or the flush at exit
+                with self._lock:
+                    self._dirty = True
+
+    def touch(self, paths: List[str]):
+        # Last touched goes first, as if each path had been touched in turn
+        entries = [_recent_entry(p) for p in dict.fromkeys(reversed(paths))]
+        with self._lock:
+            items = self._ensure_loaded()
+            new_paths = {e["path"] for e in entries}
+            items[:] = entries + [i for i in items if i.get("path") not in new_paths]
+            del items[MAX_RECENTS:]
+            self._dirty = True
+            self._schedule()
+
+    def remove(self, paths: List[str]):
+        gone = set(paths)
+        with self._lock:
+            items = self._ensure_loaded()
+            before = len(items)
+            items[:] = [i for i in items if i.get("path") not in gone]
+            if len(items) != before:
+                self._dirty = True
+                self._schedule()
+
+    def list(self) -> List[Dict]:
+        with self._lock:
+            return [dict(i) for i in self._ensure_loaded()]
+
+
+def _recent_entry(path: str) -> Dict:
+    try:
+        size = os.path.getsize(path)
+    except OSError:
+        size = 0
+    return {
+        "path": path,
+        "name": os.path.basename(path),
+        "size": size,
+        "ts": datetime.now().isoformat(timespec="minutes"),
+    }
 
 
-def _save(items: List[Dict]):
-    with open(RECENTS_FILE, "w", encoding="utf-8") as f:
-        json.dump(items, f, ensure_ascii=False, indent=2)
+_recents = RecentsStore(RECENTS_FILE)
+atexit.register(_recents.flush)
 
 
+@traced("document_store.touch_recent")
 def touch_recent(path: str):
-    items = _load()
-    items = [i for i in items if i.get("path") != path]
-    items.insert(0, {
-        "path": path,
-        "name": os.path.basename(path),
-        "size": os.path.getsize(path) if os.path.exists(path) else 0,
-        "ts": datetime.now().isoformat(timespec="minutes"),
-    })
-    _save(items[:50])
+    _recents.touch([path])
+
 
+@traced("document_store.touch_recents")
+def touch_recents(paths: List[str]):
+    """Same as calling touch_recent for each path in order, with a single write."""
+    _recents.touch(list(paths))
 
+
+@traced("document_store.remove_recent")
 def remove_recent(path: str):
-    items = _load()
-    items = [i for i in items if i.get("path") != path]
-    _save(items)
+    _recents.remove([path])
 
 
+@traced("document_store.list_recents")
 def list_recents() -> List[Dict]:
-    return _load()
+    return _recents.list()
+
+
+def flush_recents():
+    """Write pending recents changes now instead of waiting for the debounce."""
+    _recents.flush()
 
 
 def app_documents_dir() -> str:
+    ensure_app_dirs()
     return DOCS_DIR
 
 
-def unique_path(basename: str, ext_preferred: str | None = None) -> str:
+@traced("document_store.unique_path")
+def unique_path(basename: str, ext_preferred: str | None = None, taken: set | None = None) -> str:
+    """A free path in the documents dir; `taken` holds paths already promised but not yet written."""
+    from .library import library_catalog
+    ensure_app_dirs()
     name, ext = os.path.splitext(basename)
     if ext_preferred:
         ext = ext_preferred if ext_preferred.startswith('.') else f'.{ext_preferred}'
-    candidate = os.path.join(DOCS_DIR, f"{name}{ext}")
-    i = 1
-    while os.path.exists(candidate):
-        candidate = os.path.join(DOCS_DIR, f"{name} {i}{ext}")
-        i += 1
-    return candidate
+    return library_catalog().unique_path(DOCS_DIR, f"{name}{ext}", taken)
 
 
+@traced("document_store.import_file")
 def import_file(src_path: str) -> str:
     """Copy a file from anywhere into the app documents dir with unique naming, update recents, and return dest path."""
     if not os.path.exists(src_path):
@@ -71,5 +202,9 @@ def import_file(src_path: str) -> str:
     base = os.path.basename(src_path)
     dest = unique_path(base)
     shutil.copy2(src_path, dest)
+    from .library import library_catalog
+    library_catalog().note(dest)
     touch_recent(dest)
+    from .search_index import index_document
+    index_document(dest)
     return dest
@@ -0,0 +1,280 @@
+import hashlib
+import json
+import os
+import shutil
+import zlib
+from datetime import datetime, timedelta
+from typing import Dict, Iterator, List, Optional, Tuple
+from PySide6.QtGui import QTextDocument
+from PySide6.QtCore import QObject, QRunnable, QThreadPool
+
+from .document_store import APP_DIR
+from .images import add_image
+from .wpg import collect_images
+
+HISTORY_DIR = os.path.join(APP_DIR, "history")
+REVISIONS = "revisions.jsonl"
+OBJECTS = "objects"
+
+# The newest revisions are always kept; older ones are thinned to the
+# newest revision per bucket, and dropped once older than the last limit
+KEEP_RECENT = 20
+RETENTION = (
+    (timedelta(days=1), timedelta(hours=1)),
+    (timedelta(days=30), timedelta(days=1)),
+    (timedelta(days=365), timedelta(weeks=1)),
+)
+
+# Snapshots are cut into chunks after lines whose crc32 hits the mask, so an
+# edit only changes the chunk around it and every other chunk is shared
+# with the previous revision. About one line in 64 ends a chunk.
+CHUNK_MIN = 2 * 1024
+CHUNK_MAX = 64 * 1024
+_CHUNK_MASK = 63
+
+
+def _history_dir(path: str) -> str:
+    key = hashlib.blake2b(os.path.normcase(os.path.abspath(path)).encode("utf-8"), digest_size=12).hexdigest()
+    return os.path.join(HISTORY_DIR, key)
+
+
+def _object_hash(data: bytes) -> str:
+    return hashlib.blake2b(data, digest_size=20).hexdigest()
+
+
+def chunk_content(data: bytes) -> Iterator[bytes]:
+    """Content-defined chunks of `data`, cut at line ends."""
+    start = pos = 0
+    n = len(data)
+    while pos < n:
+        nl = data.find(b"\n", pos)
+        end = n if nl < 0 else nl + 1
+        if end - pos > CHUNK_MAX:
+            # One huge line: flush what is pending and slice it
+            if pos > start:
+                yield data[start:pos]
+            for i in range(pos, end, CHUNK_MAX):
+                yield data[i:min(end, i + CHUNK_MAX)]
+            start = pos = end
+            continue
+        line_crc = zlib.crc32(data[pos:end])
+        pos = end
+        size = pos - start
+        if size >= CHUNK_MAX or (size >= CHUNK_MIN and line_crc & _CHUNK_MASK == 0):
+            yield data[start:pos]
+            start = pos
+    if start < n:
+        yield data[start:]
+
+
+def _write_object(root: str, data: bytes) -> str:
+    h = _object_hash(data)
+    d = os.path.join(root, OBJECTS, h[:2])
+    p = os.path.join(d, h)
+    if not os.path.exists(p):
+        os.makedirs(d, exist_ok=True)
+        tmp = f"{p}.{os.getpid()}.tmp"
+        with open(tmp, "wb") as f:
+            f.write(zlib.compress(data, 6))
+        os.replace(tmp, p)
+    return h
+
+
+def _read_object(root: str, h: str) -> bytes:
+    with open(os.path.join(root, OBJECTS, h[:2], h), "rb") as f:
+        return zlib.decompress(f.read())
+
+
+def _read_revisions(root: str) -> List[Dict]:
+    out = []
+    try:
+        with open(os.path.join(root, REVISIONS), "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    out.append(json.loads(line))
+                except ValueError:
+                    continue
+    except OSError:
+        pass
+    return out
+
+
+def _write_revisions(root: str, revisions: List[Dict]):
+    p = os.path.join(root, REVISIONS)
+    tmp = f"{p}.{os.getpid()}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        for r in revisions:
+            f.write(json.dumps(r, ensure_ascii=False) + "\n")
+    os.replace(tmp, p)
+
+
+def record_revision(path: str, html: str, images: Optional[Dict[str, bytes]] = None) -> Optional[Dict]:
+    """Store `html` (and its images by name) as the newest revision of `path`.
+
+    Returns the revision, or None when it equals the newest one already stored.
+    """
+    images = images or {}
+    data = html.encode("utf-8")
+    content_id = _object_hash(data + b"".join(
+        name.encode("utf-8") + _object_hash(blob).encode("ascii") for name, blob in sorted(images.items())))
+    root = _history_dir(path)
+    revisions = _read_revisions(root)
+    if revisions and revisions[-1].get("id") == content_id:
+        return None
+    os.makedirs(root, exist_ok=True)
+    rev = {
+        "id": content_id,
+        "ts": datetime.now().isoformat(timespec="seconds"),
+        "path": path,
+        "size": len(data),
+        "chunks": [_write_object(root, c) for c in chunk_content(data)],
+        "images": {name: _write_object(root, blob) for name, blob in images.items()},
+    }
+    with open(os.path.join(root, REVISIONS), "a", encoding="utf-8") as f:
+        f.write(json.dumps(rev, ensure_ascii=False) + "\n")
+    return rev
+
+
+def revisions_to_keep(revisions: List[Dict], now: Optional[datetime] = None) -> List[Dict]:
+    """Apply the retention policy to `revisions` (oldest first)."""
+    now = now or datetime.now()
+    keep = set(range(max(0, len(revisions) - KEEP_RECENT), len(revisions)))
+    buckets = set()
+    for i in range(len(revisions) - 1, -1, -1):
+        try:
+            ts = datetime.fromisoformat(revisions[i]["ts"])
+        except (KeyError, ValueError):
+            continue
+        if i in keep:
+            continue
+        age = now - ts
+        for limit, width in RETENTION:
+            if age <= limit:
+                bucket = (width, int(ts.timestamp() // width.total_seconds()))
+                if bucket not in buckets:
+                    buckets.add(bucket)
+                    keep.add(i)
+                break
+    return [r for i, r in enumerate(revisions) if i in keep]
+
+
+def prune_history(path: str, now: Optional[datetime] = None) -> int:
+    """Drop revisions of `path` outside the retention policy and their unused objects."""
+    root = _history_dir(path)
+    revisions = _read_revisions(root)
+    kept = revisions_to_keep(revisions, now)
+    if len(kept) == len(revisions):
+        return 0
+    _write_revisions(root, kept)
+    used = set()
+    for r in kept:
+        used.update(r.get("chunks", ()))
+        used.update(r.get("images", {}).values())
+    for d, _, files in os.walk(os.path.join(root, OBJECTS)):
+        for name in files:
+            if name not in used:
+                try:
+                    os.remove(os.path.join(d, name))
+                except OSError:
+                    pass
+    return len(revisions) - len(kept)
+
+
+def list_revisions(path: str) -> List[Dict]:
+    """Stored revisions of `path`, newest first."""
+    return list(reversed(_read_revisions(_history_dir(path))))
+
+
+def read_revision_html(path: str, rev: Dict) -> str:
+    root = _history_dir(path)
+    return b"".join(_read_object(root, h) for h in rev["chunks"]).decode("utf-8")
+
+
+def load_revision(path: str, rev: Dict, doc: QTextDocument):
+    """Replace the contents of `doc` with a stored revision, images included."""
+    root = _history_dir(path)
+    html = read_revision_html(path, rev)
+    doc.clear()
+    for name, h in rev.get("images", {}).items():
+        add_image(doc, name, _read_object(root, h))
+    doc.setHtml(html)
+
+
+def history_bytes(path: str) -> int:
+    total = 0
+    for d, _, files in os.walk(_history_dir(path)):
+        for name in files:
+            try:
+                total += os.path.getsize(os.path.join(d, name))
+            except OSError:
+                pass
+    return total
+
+
+def move_history(old_path: str, new_path: str):
+    """Keep the history of a renamed document."""
+    src, dest = _history_dir(old_path), _history_dir(new_path)
+    if os.path.isdir(src) and not os.path.exists(dest):
+        try:
+            shutil.move(src, dest)
+        except OSError:
+            pass
+
+
+class _RecordJob(QRunnable):
+    def __init__(self, path: str, content):
+        super().__init__()
+        self._path = path
+        # A document clone, serialized here, or (html, images) already serialized
+        self._content = content
+
+    def run(self):
+        try:
+            content = self._content
+            if isinstance(content, QTextDocument):
+                html = content.toHtml()
+                images = {name: data for name, (_, data) in collect_images(content).items()}
+            else:
+                html, images = content
+            if record_revision(self._path, html, images):
+                prune_history(self._path)
+        except Exception:
+            pass
+        finally:
+            self._content = None
+
+
+class HistoryWriter(QObject):
+    """Records revisions off the GUI thread, one at a time and in save order."""
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self._pool = QThreadPool(self)
+        self._pool.setMaxThreadCount(1)
+
+    def record(self, path: str, doc: QTextDocument,
+               snapshot: Optional[Tuple[str, Dict[str, bytes]]] = None):
+        """Record `doc` as saved to `path`.
+
+        `snapshot` is its (html, images) when the save already serialized
+        them (see save_document()); only without it is the document cloned.
+        """
+        if snapshot is not None:
+            self._pool.start(_RecordJob(path, snapshot))
+            return
+        clone = doc.clone()
+        clone.moveToThread(None)
+        self._pool.start(_RecordJob(path, clone))
+
+    def wait(self, msecs: int = -1) -> bool:
+        return self._pool.waitForDone(msecs)
+
+
+_writer: Optional[HistoryWriter] = None
+
+
+def history_writer() -> HistoryWriter:
+    global _writer
+    if _writer is None:
+        _writer = HistoryWriter()
+    return _writer
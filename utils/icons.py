@@ -0,0 +1,65 @@
+"""Icons from the pre-rasterized resource bundle.
+
+`tools/generate_ico.py` renders assets/icons/*.svg and the app icon to
+PNGs at every size below and compiles them into assets/icons.rcc. The
+bundle is memory-mapped once per process and each icon is built once, so
+editor windows after the first (and the first, too) never parse SVG.
+Without the bundle (a checkout that has not run the build step) icons
+fall back to the SVG files.
+"""
+import os
+from typing import Dict, Optional
+from PySide6.QtCore import QResource, QSize
+from PySide6.QtGui import QIcon
+
+from .paths import asset_path
+
+ICON_BUNDLE_NAME = "icons.rcc"
+# Toolbar icon sizes in logical pixels, and the screen scales they are rendered for
+ICON_LOGICAL_SIZES = (18, 24)
+ICON_SCALES = (1.0, 1.25, 1.5, 2.0)
+ICON_SIZES = tuple(sorted({round(s * f) for s in ICON_LOGICAL_SIZES for f in ICON_SCALES}))
+APP_ICON_SIZES = (16, 24, 32, 48, 64, 128, 256)
+
+_registered: Optional[bool] = None
+_cache: Dict[str, QIcon] = {}
+
+
+def _bundle_loaded() -> bool:
+    global _registered
+    if _registered is None:
+        path = asset_path("assets", ICON_BUNDLE_NAME)
+        _registered = os.path.exists(path) and QResource.registerResource(path)
+    return _registered
+
+
+def _from_bundle(folder: str, sizes) -> QIcon:
+    ic = QIcon()
+    for px in sizes:
+        ic.addFile(f":/{folder}/{px}.png", QSize(px, px))
+    return ic
+
+
+def icon(name: str) -> QIcon:
+    """Toolbar icon `name` (file name in assets/icons without .svg)."""
+    ic = _cache.get(name)
+    if ic is None:
+        if _bundle_loaded() and QResource(f":/icons/{name}/{ICON_SIZES[0]}.png").isValid():
+            ic = _from_bundle(f"icons/{name}", ICON_SIZES)
+        else:
+            ic = QIcon(asset_path("assets", "icons", f"{name}.svg"))
+        _cache[name] = ic
+    return ic
+
+
+def app_icon() -> QIcon:
+    """The application icon at every size the bundle has."""
+    ic = _cache.get(":app")
+    if ic is None:
+        if _bundle_loaded():
+            ic = _from_bundle("app", APP_ICON_SIZES)
+        else:
+            ico = asset_path("assets", "app_icon.ico")
+            ic = QIcon(ico if os.path.exists(ico) else asset_path("assets", "app_icon.svg"))
+        _cache[":app"] = ic
+    return ic
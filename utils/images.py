@@ -0,0 +1,251 @@
+import itertools
+import os
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Dict, Optional, Tuple
+from PySide6.QtGui import QTextDocument, QImage, QImageReader, QPixmap
+from PySide6.QtCore import QBuffer, QByteArray, QCoreApplication, QIODevice, QSize, QThread, QUrl, Qt
+
+# Memory for decoded images shared by all documents, override with WINPAGES_IMAGE_CACHE_MB
+IMAGE_CACHE_BUDGET = int(os.environ.get("WINPAGES_IMAGE_CACHE_MB", "64")) * 1024 * 1024
+# Longest side of the proxies shown while editing: an A4 page at twice the screen density
+PROXY_MAX_SIDE = 1600
+# Longest side of the proxies painted onto home-screen thumbnails
+THUMB_PROXY_SIDE = 400
+FULL_RESOLUTION = 0
+
+
+class ImageSource:
+    """Encoded image data or an image file; decoded only when asked."""
+    _ids = itertools.count(1)
+
+    def __init__(self, data: Optional[bytes] = None, path: Optional[str] = None):
+        self.data = data
+        self.path = path
+        if path is not None:
+            # Documents linking the same unchanged file share its decoded images
+            try:
+                self.key = ("file", os.path.normcase(os.path.abspath(path)), os.stat(path).st_mtime_ns)
+            except OSError:
+                self.key = ("file", path, 0)
+        else:
+            self.key = ("data", next(self._ids))
+
+    def _reader(self) -> Tuple[QImageReader, Optional[QBuffer]]:
+        if self.data is None:
+            return QImageReader(self.path), None
+        buf = QBuffer()
+        buf.setData(QByteArray(self.data))
+        buf.open(QIODevice.ReadOnly)
+        return QImageReader(buf), buf
+
+    def encoded(self) -> Optional[bytes]:
+        if self.data is not None:
+            return self.data
+        try:
+            with open(self.path, "rb") as f:
+                return f.read()
+        except OSError:
+            return None
+
+    def decode(self, max_side: int = FULL_RESOLUTION) -> QImage:
+        """The image, scaled down to fit `max_side` while decoding if it is larger.
+
+        A scaled image keeps the original's size in the layout through its
+        device pixel ratio, so swapping it for the original moves nothing.
+        """
+        reader, buf = self._reader()
+        size = reader.size()
+        if max_side and size.isValid() and max(size.width(), size.height()) > max_side:
+            scaled = size.scaled(max_side, max_side, Qt.KeepAspectRatio)
+            reader.setScaledSize(scaled)
+            img = reader.read()
+            if not img.isNull():
+                img.setDevicePixelRatio(scaled.width() / size.width())
+        else:
+            img = reader.read()
+        if buf is not None:
+            buf.close()
+        return img
+
+
+class ImageCache:
+    """Decoded images by (source, resolution), least recently used first out.
+
+    Entries are evicted once their decoded size exceeds `budget` bytes; the
+    image just decoded is always handed out, even when it alone is larger.
+    Thread-safe; pixmaps are only made on the GUI thread.
+    """
+
+    def __init__(self, budget: int = IMAGE_CACHE_BUDGET):
+        self.budget = budget
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[tuple, Tuple[object, int]]" = OrderedDict()
+        self._bytes = 0
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, source: ImageSource, max_side: int, pixmap: bool = False):
+        key = (source.key, max_side, pixmap)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[0]
+            self.misses += 1
+        img = source.decode(max_side)
+        if img.isNull():
+            return None
+        cost = img.sizeInBytes()
+        value = QPixmap.fromImage(img) if pixmap else img
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._bytes -= old[1]
+            self._entries[key] = (value, cost)
+            self._bytes += cost
+            while self._bytes > self.budget and len(self._entries) > 1:
+                _, (_, freed) = self._entries.popitem(last=False)
+                self._bytes -= freed
+        return value
+
+    def bytes_used(self) -> int:
+        return self._bytes
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+
+_cache: Optional[ImageCache] = None
+_cache_lock = threading.Lock()
+
+
+def image_cache() -> ImageCache:
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = ImageCache()
+        return _cache
+
+
+def _on_gui_thread() -> bool:
+    app = QCoreApplication.instance()
+    return app is not None and QThread.currentThread() == app.thread()
+
+
+class ImageDocument(QTextDocument):
+    """QTextDocument that decodes its images on demand, as proxies.
+
+    Images are registered as encoded data with add_image() or picked up
+    from the files the document links to. Layout and painting get a
+    proxy no larger than `max_side` from the shared image_cache(), and
+    Qt's own per-document cache is bypassed, so a decoded image lives
+    only as long as its cache entry. full_resolution() hands out the
+    originals instead, for printing.
+    """
+
+    def __init__(self, parent=None, max_side: int = PROXY_MAX_SIDE):
+        super().__init__(parent)
+        self._sources: Dict[str, ImageSource] = {}
+        self._max_side = max_side
+        self._full = 0
+
+    def add_image(self, name: str, data: bytes):
+        self._sources[QUrl(name).toString()] = ImageSource(data=data)
+
+    def share_images(self, other: "ImageDocument"):
+        """Resolve images through the sources `other` has registered so far."""
+        self._sources.update(other._sources)
+
+    def image_source(self, name: str) -> Optional[ImageSource]:
+        url = QUrl(name)
+        key = url.toString()
+        src = self._sources.get(key)
+        if src is None and url.scheme() in ("", "file"):
+            path = url.toLocalFile() if url.isLocalFile() else url.path()
+            if path and os.path.isfile(path):
+                src = ImageSource(path=path)
+                self._sources[key] = src
+        return src
+
+    def encoded_bytes(self) -> int:
+        """Size of the embedded images this document holds encoded."""
+        return sum(len(src.data) for src in self._sources.values() if src.data is not None)
+
+    def clear(self):
+        self._sources.clear()
+        super().clear()
+
+    def clone(self, parent=None) -> QTextDocument:
+        # The copy is a plain QTextDocument (printed or serialized off the GUI
+        # thread): embedded images go along encoded and are decoded in full
+        # there; linked files resolve as usual
+        doc = super().clone(parent)
+        for name, src in self._sources.items():
+            if src.data is not None:
+                doc.addResource(QTextDocument.ImageResource, QUrl(name), QByteArray(src.data))
+        return doc
+
+    def loadResource(self, type, name):
+        if type == QTextDocument.ImageResource:
+            src = self.image_source(name.toString() if isinstance(name, QUrl) else name)
+            if src is not None:
+                img = image_cache().get(src, FULL_RESOLUTION if self._full else self._max_side, _on_gui_thread())
+                if img is not None:
+                    return img
+        return super().loadResource(type, name)
+
+
+def add_image(doc: QTextDocument, name: str, data: bytes) -> bool:
+    """Make encoded image `data` available to `doc` under `name`.
+
+    An ImageDocument keeps the data and decodes it when the image is first
+    shown; any other document gets the decoded image right away.
+    """
+    if isinstance(doc, ImageDocument):
+        if not image_info(data)[0].isValid():
+            return False
+        doc.add_image(name, data)
+        return True
+    img = QImage.fromData(data)
+    if img.isNull():
+        return False
+    doc.addResource(QTextDocument.ImageResource, QUrl(name), img)
+    return True
+
+
+def image_data(doc: QTextDocument, name: str) -> Optional[bytes]:
+    """The original encoded data of an image of an ImageDocument, if it has it."""
+    if isinstance(doc, ImageDocument):
+        src = doc.image_source(name)
+        if src is not None:
+            return src.encoded()
+    return None
+
+
+def image_info(data: bytes) -> Tuple[QSize, str]:
+    """(size, format name) read from the header of encoded image data."""
+    buf = QBuffer()
+    buf.setData(QByteArray(data))
+    buf.open(QIODevice.ReadOnly)
+    reader = QImageReader(buf)
+    size, fmt = reader.size(), bytes(reader.format()).decode("ascii", errors="ignore")
+    buf.close()
+    return size, fmt
+
+
+@contextmanager
+def full_resolution(doc: QTextDocument):
+    """Hand out original images while in the block (for an ImageDocument)."""
+    if not isinstance(doc, ImageDocument):
+        yield
+        return
+    doc._full += 1
+    try:
+        yield
+    finally:
+        doc._full -= 1
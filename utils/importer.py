@@ -0,0 +1,216 @@
+import hashlib
+import os
+import shutil
+import threading
+from typing import Dict, Iterable, List, Optional, Tuple
+from PySide6.QtCore import QObject, QRunnable, QThread, QThreadPool, Signal, Qt
+
+from .document_store import DOCS_DIR, MAX_RECENTS, unique_path, touch_recents, flush_recents
+from .doc_io import DOCUMENT_EXTS
+from .library import library_catalog
+from .search_index import index_document
+from .thumbnails import thumbnail_loader
+
+_HASH_CHUNK = 1024 * 1024
+
+IMPORTED = "imported"
+DUPLICATE = "duplicate"
+FAILED = "failed"
+CANCELLED = "cancelled"
+
+
+def collect_documents(paths: Iterable[str], recursive: bool = True) -> List[str]:
+    """Files among `paths`, plus the documents inside any folders among them."""
+    out = []
+    for p in paths:
+        if os.path.isdir(p):
+            for root, dirs, files in os.walk(p):
+                dirs.sort()
+                for name in sorted(files):
+                    if os.path.splitext(name)[1].lower() in DOCUMENT_EXTS:
+                        out.append(os.path.join(root, name))
+                if not recursive:
+                    break
+        elif os.path.isfile(p):
+            out.append(p)
+    return out
+
+
+def file_digest(path: str) -> str:
+    h = hashlib.blake2b(digest_size=20)
+    with open(path, "rb") as f:
+        while True:
+            data = f.read(_HASH_CHUNK)
+            if not data:
+                break
+            h.update(data)
+    return h.hexdigest()
+
+
+class LibraryContents:
+    """Finds library documents with the same content as a file being imported.
+
+    Only documents of exactly the same size are hashed, each at most once, so
+    importing a folder of new files reads little besides the files themselves.
+    claim() is thread-safe and also catches duplicates within one import.
+    """
+
+    def __init__(self, directory: str = DOCS_DIR):
+        self.directory = directory
+        self._lock = threading.Lock()
+        self._by_size: Optional[Dict[int, List[str]]] = None
+        self._digests: Dict[str, Tuple[int, str]] = {}
+        # (size, digest) -> destination, for files claimed but maybe not copied yet
+        self._claimed: Dict[Tuple[int, str], str] = {}
+        self._taken = set()
+
+    def _sizes(self) -> Dict[int, List[str]]:
+        with self._lock:
+            if self._by_size is None:
+                by_size: Dict[int, List[str]] = {}
+                for path, size, _ in library_catalog().files(self.directory):
+                    by_size.setdefault(size, []).append(path)
+                self._by_size = by_size
+            return self._by_size
+
+    def _digest_of(self, path: str) -> Optional[str]:
+        try:
+            mtime = os.stat(path).st_mtime_ns
+            cached = self._digests.get(path)
+            if cached and cached[0] == mtime:
+                return cached[1]
+            digest = file_digest(path)
+        except OSError:
+            return None
+        self._digests[path] = (mtime, digest)
+        return digest
+
+    def claim(self, src: str) -> Tuple[str, str]:
+        """(IMPORTED, free destination) or (DUPLICATE, document already holding the content)."""
+        size = os.path.getsize(src)
+        candidates = list(self._sizes().get(size, ()))
+        digest = file_digest(src)
+        for path in candidates:
+            if self._digest_of(path) == digest:
+                return DUPLICATE, path
+        with self._lock:
+            existing = self._claimed.get((size, digest))
+            if existing:
+                return DUPLICATE, existing
+            dest = unique_path(os.path.basename(src), taken=self._taken)
+            self._taken.add(dest)
+            self._claimed[(size, digest)] = dest
+            return IMPORTED, dest
+
+    def release(self, dest: str):
+        """Forget a claim whose copy failed."""
+        with self._lock:
+            for key, path in list(self._claimed.items()):
+                if path == dest:
+                    del self._claimed[key]
+            self._taken.discard(dest)
+
+
+class _ImportJob(QRunnable):
+    def __init__(self, importer: "Importer", src: str):
+        super().__init__()
+        self._importer = importer
+        self._src = src
+
+    def run(self):
+        importer = self._importer
+        # Exactly one _job_done per job, whatever happens, or the import never finishes
+        result = (self._src, FAILED, "")
+        try:
+            if importer._cancel.is_set():
+                result = (self._src, CANCELLED, "")
+                return
+            status = dest = ""
+            try:
+                status, dest = importer._library.claim(self._src)
+                if status == IMPORTED:
+                    # copy2 uses the platform's in-kernel copy where there is one
+                    shutil.copy2(self._src, dest)
+                    library_catalog().note(dest)
+                result = (self._src, status, dest)
+            except Exception as e:
+                if status == IMPORTED:
+                    importer._library.release(dest)
+                    try:
+                        os.remove(dest)
+                    except OSError:
+                        pass
+                result = (self._src, FAILED, str(e))
+        finally:
+            try:
+                importer._job_done.emit(*result)
+            except RuntimeError:
+                # The importer was deleted while this job ran
+                pass
+
+
+class Importer(QObject):
+    """Copies files into the library on a private thread pool.
+
+    Content already in the library (or earlier in the same import) is not
+    copied again; its existing document is moved to the top of recents
+    instead. Recents are written once when the import ends, new documents
+    are indexed, and thumbnails are rendered by the shared loader.
+    `finished(imported, duplicates, failed)` carries destination paths,
+    existing documents and failed sources.
+    """
+    progress = Signal(int, int)
+    finished = Signal(list, list, list)
+    _job_done = Signal(str, str, str)
+
+    def __init__(self, parent=None, max_threads: int | None = None):
+        super().__init__(parent)
+        self._pool = QThreadPool(self)
+        if max_threads is None:
+            max_threads = max(2, min(8, QThread.idealThreadCount()))
+        self._pool.setMaxThreadCount(max_threads)
+        self._library = LibraryContents()
+        self._cancel = threading.Event()
+        self._total = 0
+        self._done = 0
+        self._results: List[Tuple[str, str, str]] = []
+        self._job_done.connect(self._on_job_done, Qt.QueuedConnection)
+
+    def add(self, paths: Iterable[str]) -> int:
+        """Queue files and folders; an import that is running picks them up too."""
+        files = collect_documents(paths)
+        for src in files:
+            self._total += 1
+            self._pool.start(_ImportJob(self, src))
+        if files:
+            self.progress.emit(self._done, self._total)
+        return len(files)
+
+    def cancel(self):
+        """Skip files not started yet; copies in flight complete."""
+        self._cancel.set()
+
+    def is_active(self) -> bool:
+        return self._done < self._total
+
+    def _on_job_done(self, src: str, status: str, dest: str):
+        self._done += 1
+        self._results.append((src, status, dest))
+        self.progress.emit(self._done, self._total)
+        if self._done == self._total:
+            self._commit()
+
+    def _commit(self):
+        results, self._results = self._results, []
+        imported = [dest for _, status, dest in results if status == IMPORTED]
+        duplicates = [dest for _, status, dest in results if status == DUPLICATE]
+        failed = [src for src, status, _ in results if status == FAILED]
+        touch_recents(imported + duplicates)
+        flush_recents()
+        for dest in imported:
+            index_document(dest)
+        # The rest render when the home grid scrolls to them
+        loader = thumbnail_loader()
+        for dest in reversed((imported + duplicates)[-MAX_RECENTS:]):
+            loader.request(dest)
+        self.finished.emit(imported, duplicates, failed)
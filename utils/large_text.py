@@ -0,0 +1,296 @@
+import json
+import mmap
+import os
+import threading
+from array import array
+from bisect import bisect_right
+from typing import Iterator, List, Optional, Tuple
+
+# Plain-text files above this size open in the memory-mapped viewer
+LARGE_TEXT_THRESHOLD = 32 * 1024 * 1024
+_INDEX_BLOCK = 4 * 1024 * 1024
+# Piece kinds: a run of lines of the mapped file, or of lines added since
+_ORIG, _ADDED = 0, 1
+_JOURNAL_VERSION = 1
+
+
+class LargeTextDocument:
+    """A memory-mapped plain-text file with line-granular edits.
+
+    Line start offsets are indexed once on a background thread; lines are
+    decoded only when asked for. Edits go into a piece table: the mapped
+    original stays untouched, the document is a list of runs of original
+    or added lines (added text goes into an add buffer), and `save()`
+    streams them back to disk. Lines can be replaced, inserted and
+    deleted, also while the rest of the file is still being indexed.
+    """
+
+    def __init__(self, path: str, encoding: str = "utf-8"):
+        self.path = path
+        self.encoding = encoding
+        self._file = None
+        self._mm: Optional[mmap.mmap] = None
+        self._offsets = array("Q", [0])
+        self._indexed = False
+        self._lock = threading.Lock()
+        self._reset_pieces()
+        # Bumped by every edit, for autosave
+        self.revision = 0
+        self._open()
+
+    def _reset_pieces(self):
+        # (kind, first, count): lines first..first+count of the file or of
+        # `_added`; the last piece runs to the end of the file (count None)
+        # so lines indexed later show up in it
+        self._pieces: List[Tuple[int, int, Optional[int]]] = [(_ORIG, 0, None)]
+        self._starts = [0]
+        # (start, length) of each added line in the add buffer, without line break
+        self._added: List[Tuple[int, int]] = []
+        self._add = bytearray()
+
+    def _open(self):
+        self._file = open(self.path, "rb")
+        st = os.fstat(self._file.fileno())
+        size = st.st_size
+        self._size = size
+        self._stat = (size, st.st_mtime_ns)
+        self._mm = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ) if size else None
+        self._offsets = array("Q", [0])
+        self._indexed = size == 0
+        if size:
+            args = (self._mm, size, self._offsets)
+            threading.Thread(target=self._build_index, args=args, name="line-index", daemon=True).start()
+
+    def _reopen(self):
+        """Map the unchanged file again after a failed save, keeping the edits."""
+        if not self._indexed:
+            # Unmodified (saving edits needs the index), so indexing can start over
+            self._open()
+            return
+        self._file = open(self.path, "rb")
+        self._mm = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ) if self._size else None
+
+    def close(self):
+        mm, f = self._mm, self._file
+        self._mm = None
+        self._file = None
+        if mm is not None:
+            mm.close()
+        if f is not None:
+            f.close()
+
+    def _build_index(self, mm: mmap.mmap, size: int, offsets: array):
+        pos = 0
+        batch = array("Q")
+        try:
+            while pos < size:
+                end = min(size, pos + _INDEX_BLOCK)
+                find = mm.find
+                i = find(b"\n", pos, end)
+                while i >= 0:
+                    batch.append(i + 1)
+                    i = find(b"\n", i + 1, end)
+                pos = end
+                # Publish per block so the view can scroll while indexing continues
+                with self._lock:
+                    offsets.extend(batch)
+                batch = array("Q")
+        except (ValueError, OSError):
+            # Mapping closed underneath us (document closed or saved)
+            return
+        with self._lock:
+            if offsets[-1] != size:
+                offsets.append(size)
+            # A save may have reopened the file meanwhile; only flag our own index
+            if offsets is self._offsets:
+                self._indexed = True
+
+    @property
+    def indexed(self) -> bool:
+        return self._indexed
+
+    @property
+    def modified(self) -> bool:
+        return self._pieces != [(_ORIG, 0, None)]
+
+    def _orig_lines(self) -> int:
+        with self._lock:
+            return len(self._offsets) - 1
+
+    def _piece_len(self, piece) -> int:
+        kind, first, count = piece
+        return count if count is not None else max(0, self._orig_lines() - first)
+
+    def _total(self) -> int:
+        return self._starts[-1] + self._piece_len(self._pieces[-1])
+
+    def line_count(self) -> int:
+        n = self._total()
+        return max(1, n) if self._indexed else n
+
+    def _span(self, i: int) -> Tuple[int, int]:
+        with self._lock:
+            if i + 1 < len(self._offsets):
+                return self._offsets[i], self._offsets[i + 1]
+            if i + 1 == len(self._offsets) and not self._indexed:
+                return self._offsets[i], self._offsets[i]
+        return self._size, self._size
+
+    def line(self, i: int) -> str:
+        p = bisect_right(self._starts, i) - 1
+        kind, first, _ = self._pieces[p]
+        k = first + i - self._starts[p]
+        if kind == _ADDED:
+            start, length = self._added[k]
+            return self._add[start:start + length].decode(self.encoding, errors="replace")
+        start, end = self._span(k)
+        raw = self._mm[start:end] if self._mm is not None else b""
+        return raw.rstrip(b"\r\n").decode(self.encoding, errors="replace")
+
+    def set_line(self, i: int, text: str):
+        """Replace the text of line `i`; line breaks in `text` split it into several lines."""
+        lines = text.replace("\r\n", "\n").replace("\r", "\n").split("\n")
+        if len(lines) == 1 and i < self._total() and text == self.line(i):
+            return
+        self.replace_lines(i, 1, lines)
+
+    def insert_lines(self, i: int, lines: List[str]):
+        """Insert `lines` before line `i` (at the end for the line count)."""
+        self.replace_lines(i, 0, lines)
+
+    def delete_lines(self, i: int, count: int = 1):
+        self.replace_lines(i, count, [])
+
+    def replace_lines(self, i: int, count: int, lines: List[str]):
+        """Replace `count` lines from line `i` on with `lines` (without line breaks)."""
+        total = self._total()
+        i = max(0, min(i, total))
+        count = max(0, min(count, total - i))
+        if not count and not lines:
+            return
+        added = []
+        if lines:
+            added.append((_ADDED, len(self._added), len(lines)))
+            for text in lines:
+                data = text.encode(self.encoding)
+                self._added.append((len(self._add), len(data)))
+                self._add += data
+        self._set_pieces(self._slice(0, i) + added + self._slice(i + count))
+        self.revision += 1
+
+    def _slice(self, lo: int, hi: Optional[int] = None) -> List[Tuple[int, int, Optional[int]]]:
+        """The pieces of lines lo..hi; to the end, still open, for hi None."""
+        out = []
+        for start, piece in zip(self._starts, self._pieces):
+            kind, first, count = piece
+            skip = max(0, lo - start)
+            if count is None and hi is None:
+                out.append((kind, first + skip, None))
+                continue
+            end = start + self._piece_len(piece)
+            stop = end if hi is None else min(hi, end)
+            if stop > start + skip:
+                out.append((kind, first + skip, stop - start - skip))
+        return out
+
+    def _set_pieces(self, pieces):
+        merged = []
+        for kind, first, count in pieces:
+            if merged:
+                pk, pf, pc = merged[-1]
+                if pk == kind and pc is not None and pf + pc == first:
+                    merged[-1] = (kind, pf, None if count is None else pc + count)
+                    continue
+            merged.append((kind, first, count))
+        self._pieces = merged
+        self._starts = []
+        n = 0
+        for piece in merged:
+            self._starts.append(n)
+            if piece[2] is not None:
+                n += piece[2]
+
+    def _eol(self) -> bytes:
+        """The line break of the file, for added lines."""
+        start, end = self._span(0)
+        if self._mm is not None and end > start and self._mm[end - 2:end] == b"\r\n":
+            return b"\r\n"
+        return b"\n"
+
+    def _chunks(self) -> Iterator[bytes]:
+        eol = self._eol()
+        # The last line written has no line break yet
+        open_line = False
+        for kind, first, count in self._pieces:
+            if kind == _ADDED:
+                for k in range(first, first + count):
+                    if open_line:
+                        yield eol
+                    start, length = self._added[k]
+                    yield bytes(self._add[start:start + length])
+                    open_line = True
+                continue
+            with self._lock:
+                last = len(self._offsets) - 1 if count is None else min(first + count, len(self._offsets) - 1)
+                if first >= last:
+                    continue
+                pos, end = self._offsets[first], self._offsets[last]
+            if open_line:
+                yield eol
+            while pos < end:
+                n = min(end - pos, _INDEX_BLOCK)
+                yield self._mm[pos:pos + n]
+                pos += n
+            open_line = self._mm[end - 1:end] != b"\n"
+        # Added last lines end like the file did
+        if open_line and self._size and self._mm[self._size - 1:self._size] == b"\n":
+            yield eol
+
+    def journal(self) -> bytes:
+        """The edits, to be replayed onto the unchanged file by apply_journal()."""
+        head = {
+            "version": _JOURNAL_VERSION,
+            "size": self._stat[0],
+            "mtime_ns": self._stat[1],
+            "pieces": self._pieces,
+            "added": self._added,
+        }
+        return json.dumps(head).encode("utf-8") + b"\n" + bytes(self._add)
+
+    def apply_journal(self, data: bytes):
+        """Replay edits from journal(); the file must not have changed since."""
+        head, _, add = data.partition(b"\n")
+        meta = json.loads(head.decode("utf-8"))
+        if meta.get("version") != _JOURNAL_VERSION:
+            raise ValueError("Unknown recovery journal format")
+        if (meta["size"], meta["mtime_ns"]) != self._stat:
+            raise ValueError(f"{os.path.basename(self.path)} has changed since its unsaved edits were journaled")
+        self._added = [tuple(a) for a in meta["added"]]
+        self._add = bytearray(add)
+        self._set_pieces([tuple(p) for p in meta["pieces"]])
+        self.revision += 1
+
+    def save(self, path: Optional[str] = None):
+        """Write original spans and added lines to `path` (default: in place)."""
+        if not self._indexed and self.modified:
+            raise RuntimeError("The file is still being indexed")
+        path = path or self.path
+        tmp = f"{path}.{os.getpid()}.tmp"
+        try:
+            with open(tmp, "wb") as f:
+                for chunk in self._chunks():
+                    f.write(chunk)
+            # The mapping must be closed before the file can be replaced on Windows
+            self.close()
+            os.replace(tmp, path)
+        except BaseException:
+            if self._file is None:
+                self._reopen()
+            try:
+                os.remove(tmp)
+            except OSError:
+                pass
+            raise
+        self.path = path
+        self._reset_pieces()
+        self._open()
@@ -0,0 +1,288 @@
+import os
+import re
+import threading
+from typing import Dict, Iterable, Optional, Set, Tuple
+from PySide6.QtCore import QCoreApplication, QFileSystemWatcher, QObject, QThread, QTimer, Signal
+
+from .document_store import DOCS_DIR, ensure_app_dirs
+from .doc_io import DOCUMENT_EXTS
+
+# Directory events are collected for this long before the directories are rescanned
+RESCAN_DELAY_MS = 150
+
+_SUFFIX = re.compile(r"^(.*) (\d+)$")
+
+# normcased name -> (name, size, mtime_ns)
+_Listing = Dict[str, Tuple[str, int, int]]
+
+
+def _key(path: str) -> str:
+    return os.path.normcase(os.path.abspath(path))
+
+
+def _scan(directory: str) -> Optional[_Listing]:
+    out = {}
+    try:
+        with os.scandir(directory) as it:
+            for e in it:
+                try:
+                    if e.is_file():
+                        st = e.stat()
+                        out[os.path.normcase(e.name)] = (e.name, st.st_size, st.st_mtime_ns)
+                except OSError:
+                    continue
+    except OSError:
+        return None
+    return out
+
+
+def _is_document(name: str) -> bool:
+    return os.path.splitext(name)[1].lower() in DOCUMENT_EXTS
+
+
+class LibraryCatalog(QObject):
+    """In-memory listing of DOCS_DIR and the folders holding recent documents.
+
+    Name, existence, size and mtime queries are answered from the listing
+    instead of the disk. Once watch() has been called on the GUI thread a
+    QFileSystemWatcher keeps it current: directory events are batched and
+    the affected folders rescanned, and `added`, `changed` and `removed`
+    are emitted for documents that appeared, were modified or vanished
+    outside the app. Files the app writes itself are reported with note(),
+    which updates the listing without a signal.
+
+    Queries are thread-safe; signals are delivered on the GUI thread.
+    """
+    added = Signal(str)
+    changed = Signal(str)
+    removed = Signal(str)
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self._lock = threading.RLock()
+        # normcased directory -> listing, for every directory kept current
+        self._dirs: Dict[str, _Listing] = {}
+        # normcased directory -> the directory as first given, for paths in signals
+        self._dir_paths: Dict[str, str] = {}
+        # (directory, stem, ext) -> first " N" suffix that may be free
+        self._hints: Dict[Tuple[str, str, str], int] = {}
+        self._recents: Set[str] = set()
+        self._watcher: Optional[QFileSystemWatcher] = None
+        self._dirty: Set[str] = set()
+        self._timer: Optional[QTimer] = None
+        ensure_app_dirs()
+        self._listing(DOCS_DIR)
+
+    # -- queries ----------------------------------------------------------
+
+    def _listing(self, directory: str) -> Optional[_Listing]:
+        """The listing of a tracked directory, scanning it on first use."""
+        d = _key(directory)
+        with self._lock:
+            listing = self._dirs.get(d)
+            if listing is None:
+                listing = _scan(directory)
+                if listing is None:
+                    return None
+                self._dirs[d] = listing
+                self._dir_paths[d] = os.path.abspath(directory)
+                if self._watcher is not None:
+                    self._watcher.addPath(directory)
+            return listing
+
+    def _entry(self, path: str) -> Optional[Tuple[str, int, int]]:
+        d, name = os.path.split(_key(path))
+        with self._lock:
+            listing = self._dirs.get(d)
+            if listing is not None:
+                return listing.get(name)
+        try:
+            st = os.stat(path)
+        except OSError:
+            return None
+        return os.path.basename(path), st.st_size, st.st_mtime_ns
+
+    def exists(self, path: str) -> bool:
+        return self._entry(path) is not None
+
+    def stat(self, path: str) -> Optional[Tuple[int, int]]:
+        """(size, mtime_ns) of `path`, or None if it does not exist."""
+        e = self._entry(path)
+        return (e[1], e[2]) if e else None
+
+    def files(self, directory: str):
+        """(path, size, mtime_ns) of every file directly in `directory`."""
+        with self._lock:
+            listing = self._listing(directory)
+            return [(os.path.join(directory, n), size, mtime) for n, size, mtime in (listing or {}).values()]
+
+    def documents(self):
+        """(path, size, mtime_ns) of every document in the library folder, newest first."""
+        docs = [f for f in self.files(DOCS_DIR) if _is_document(f[0])]
+        docs.sort(key=lambda f: f[2], reverse=True)
+        return docs
+
+    def unique_path(self, directory: str, basename: str, taken: Optional[set] = None) -> str:
+        """`basename` in `directory`, or "name N.ext" with the first free N.
+
+        `taken` holds paths already promised but not yet written. Names are
+        looked up in the listing; only the answer is checked on disk.
+        """
+        name, ext = os.path.splitext(basename)
+        d = _key(directory)
+        hint_key = (d, os.path.normcase(name), os.path.normcase(ext))
+        with self._lock:
+            listing = self._listing(directory)
+            if listing is None:
+                listing = {}
+            i = 0
+            while True:
+                candidate = basename if i == 0 else f"{name} {i}{ext}"
+                path = os.path.join(directory, candidate)
+                if os.path.normcase(candidate) not in listing and (taken is None or path not in taken):
+                    if not os.path.exists(path):
+                        break
+                    # The listing is behind (no watcher, or an event not processed yet)
+                    self._store(directory, path)
+                if i == 0:
+                    i = max(1, self._hints.get(hint_key, 1))
+                else:
+                    i += 1
+            if i:
+                self._hints[hint_key] = i
+            return path
+
+    # -- updates from the app -----------------------------------------------
+
+    def _store(self, directory: str, path: str):
+        try:
+            st = os.stat(path)
+        except OSError:
+            return
+        listing = self._dirs.get(_key(directory))
+        if listing is not None:
+            name = os.path.basename(path)
+            listing[os.path.normcase(name)] = (name, st.st_size, st.st_mtime_ns)
+
+    def note(self, path: str):
+        """`path` was just written or created by the app: update the listing quietly."""
+        with self._lock:
+            self._store(os.path.dirname(_key(path)), path)
+
+    def forget(self, path: str):
+        """`path` was just removed or renamed away by the app."""
+        d, name = os.path.split(_key(path))
+        with self._lock:
+            listing = self._dirs.get(d)
+            if listing is not None:
+                listing.pop(name, None)
+            self._drop_hint(d, os.path.basename(path))
+
+    def _drop_hint(self, d: str, name: str):
+        # A freed "name N" slot is reused by the next unique_path(), as before
+        stem, ext = os.path.splitext(name)
+        m = _SUFFIX.match(stem)
+        if m:
+            self._hints.pop((d, os.path.normcase(m.group(1)), os.path.normcase(ext)), None)
+
+    def track_recents(self, paths: Iterable[str]):
+        """Keep the folders and files of the recent documents current."""
+        paths = {p for p in paths if p}
+        with self._lock:
+            gone = self._recents - paths
+            self._recents = paths
+            for p in paths:
+                self._listing(os.path.dirname(os.path.abspath(p)))
+            if self._watcher is not None:
+                self._watch_files(paths, gone)
+
+    # -- watching -------------------------------------------------------------
+
+    def watch(self):
+        """Start the file system watcher; call on the GUI thread."""
+        if self._watcher is not None:
+            return
+        self._watcher = QFileSystemWatcher(self)
+        self._watcher.directoryChanged.connect(self._on_directory_changed)
+        self._watcher.fileChanged.connect(self._on_file_changed)
+        self._timer = QTimer(self)
+        self._timer.setSingleShot(True)
+        self._timer.setInterval(RESCAN_DELAY_MS)
+        self._timer.timeout.connect(self._rescan)
+        with self._lock:
+            dirs = list(self._dir_paths.values())
+            recents = set(self._recents)
+        if dirs:
+            self._watcher.addPaths(dirs)
+        self._watch_files(recents, set())
+
+    def _watch_files(self, paths: Set[str], gone: Set[str]):
+        # Directory events do not report in-place writes on every platform;
+        # the recent documents (a few dozen at most) are watched one by one
+        watched = set(self._watcher.files())
+        stale = [p for p in gone if p in watched]
+        if stale:
+            self._watcher.removePaths(stale)
+        new = [p for p in paths if p not in watched and os.path.exists(p)]
+        if new:
+            self._watcher.addPaths(new)
+
+    def _on_directory_changed(self, directory: str):
+        self._dirty.add(directory)
+        self._timer.start()
+
+    def _on_file_changed(self, path: str):
+        self._dirty.add(os.path.dirname(path))
+        # Replacing a file (atomic saves) drops its watch; pick it up again
+        if path in self._recents and os.path.exists(path) and path not in self._watcher.files():
+            self._watcher.addPath(path)
+        self._timer.start()
+
+    def _rescan(self):
+        dirty, self._dirty = self._dirty, set()
+        events = []
+        for directory in dirty:
+            d = _key(directory)
+            fresh = _scan(directory)
+            with self._lock:
+                old = self._dirs.get(d)
+                if old is None:
+                    continue
+                base = self._dir_paths[d]
+                if fresh is None:
+                    # The folder itself is gone
+                    del self._dirs[d]
+                    del self._dir_paths[d]
+                    fresh = {}
+                else:
+                    self._dirs[d] = fresh
+                for k, (name, size, mtime) in fresh.items():
+                    before = old.get(k)
+                    if before is None:
+                        events.append((self.added, name, base))
+                    elif before[1:] != (size, mtime):
+                        events.append((self.changed, name, base))
+                for k, (name, _, _) in old.items():
+                    if k not in fresh:
+                        self._drop_hint(d, name)
+                        events.append((self.removed, name, base))
+        for signal, name, directory in events:
+            if _is_document(name):
+                signal.emit(os.path.join(directory, name))
+
+
+_catalog: Optional[LibraryCatalog] = None
+_catalog_lock = threading.Lock()
+
+
+def library_catalog() -> LibraryCatalog:
+    """Process-wide catalog; usable from any thread, watching starts with watch()."""
+    global _catalog
+    with _catalog_lock:
+        if _catalog is None:
+            _catalog = LibraryCatalog()
+            app = QCoreApplication.instance()
+            if app is not None and QThread.currentThread() != app.thread():
+                # Created by a worker first: its timer and watcher belong on the GUI thread
+                _catalog.moveToThread(app.thread())
+        return _catalog
@@ -0,0 +1,320 @@
+import inspect
+import json
+import os
+import threading
+import time
+from datetime import datetime
+from typing import Callable, Dict, Generator, Optional, Tuple
+import PySide6
+from PySide6.QtGui import QTextDocument, QPdfWriter, QPainter, QPageSize, QFontMetricsF, QAbstractTextDocumentLayout
+from PySide6.QtCore import QObject, QRunnable, QThread, QThreadPool, QTimer, QMarginsF, QRectF, QPointF, QSizeF, Signal, Qt
+
+from .document_store import APP_DIR, ensure_app_dirs
+from .images import full_resolution
+from .progressive import TURN_BUDGET_MS
+from .trace import file_written, traced, tracer
+
+# One JSON object per export, appended so export speed can be compared across releases
+EXPORT_TIMINGS = os.path.join(APP_DIR, "export_timings.jsonl")
+PDF_RESOLUTION = 1200
+_MARGIN_CM = 2.0
+# Frame margins are given at screen resolution; the layout scales them to the device
+_SOURCE_DPI = 96
+PAGE_MARGIN = int(_MARGIN_CM / 2.54 * _SOURCE_DPI)
+# Longest paginated document exported from its existing layout; it is held
+# read-only meanwhile, so anything longer goes to a worker and editing goes on
+REUSE_LAYOUT_MAX_PAGES = 20
+
+
+class ExportCancelled(Exception):
+    pass
+
+
+def page_size(dpi: float = _SOURCE_DPI) -> QSizeF:
+    """An A4 page in pixels at `dpi`."""
+    return QPageSize(QPageSize.A4).size(QPageSize.Millimeter) * (dpi / 25.4)
+
+
+def paginate(doc: QTextDocument, size: QSizeF):
+    """Lay `doc` out on pages of `size` with the export margins."""
+    doc.setDocumentMargin(PAGE_MARGIN)
+    doc.setPageSize(size)
+
+
+def is_paginated(doc: QTextDocument) -> bool:
+    return doc.pageSize().height() > 0
+
+
+def pdf_pages(doc: QTextDocument, out_path: str,
+              reuse_layout: bool = False) -> Generator[Tuple[int, int], None, Dict]:
+    """Print `doc` onto A4 pages of a PDF, yielding (page, pages) after each one.
+
+    Lays the document out like QTextDocument.print_() does (2 cm margins,
+    page numbers bottom right) and returns timing stats when exhausted.
+    By default `doc` is re-laid out for the PDF, so pass a clone the caller
+    does not show anywhere. With `reuse_layout` a document already
+    paginated at screen resolution (see paginate()) is painted as laid out,
+    scaled to the PDF resolution, and is left untouched; it must not change
+    until the generator is done.
+    """
+    t0 = time.perf_counter()
+    writer = QPdfWriter(out_path)
+    writer.setResolution(PDF_RESOLUTION)
+    writer.setPageSize(QPageSize(QPageSize.A4))
+    # The 2 cm margins are part of the layout; the whole sheet is drawn on
+    writer.setPageMargins(QMarginsF(0, 0, 0, 0))
+    painter = QPainter()
+    if not painter.begin(writer):
+        raise OSError(f"Cannot write {out_path}")
+    try:
+        layout = doc.documentLayout()
+        dpi = writer.logicalDpiY()
+        if reuse_layout:
+            if not is_paginated(doc):
+                raise ValueError("The document is not paginated")
+            scale = dpi / _SOURCE_DPI
+        else:
+            layout.setPaintDevice(writer)
+            paginate(doc, QSizeF(writer.width(), writer.height()))
+            scale = 1.0
+        body = QRectF(QPointF(0, 0), doc.pageSize())
+        pages = doc.pageCount()
+        t_layout = time.perf_counter()
+
+        # Page numbers are drawn unscaled, in PDF device pixels
+        margin = _MARGIN_CM / 2.54 * dpi
+        fm = QFontMetricsF(doc.defaultFont(), writer)
+        number_pos = QPointF(writer.width() - margin, writer.height() - margin + fm.ascent() + 5 * dpi / 72.0)
+        for page in range(pages):
+            if page:
+                writer.newPage()
+            view = QRectF(0, page * body.height(), body.width(), body.height())
+            painter.save()
+            painter.scale(scale, scale)
+            painter.translate(0, -view.top())
+            ctx = QAbstractTextDocumentLayout.PaintContext()
+            painter.setClipRect(view)
+            ctx.clip = view
+            ctx.palette.setColor(ctx.palette.ColorRole.Text, Qt.black)
+            # Images are printed from the originals; their size in the layout is
+            # the same. Only while painting: between pages the document may be
+            # on screen, and it must not hold the originals then
+            with full_resolution(doc):
+                layout.draw(painter, ctx)
+            painter.restore()
+            painter.setFont(doc.defaultFont())
+            label = str(page + 1)
+            painter.drawText(number_pos - QPointF(fm.horizontalAdvance(label), 0), label)
+            yield page + 1, pages
+    finally:
+        painter.end()
+    t_end = time.perf_counter()
+    file_written(out_path)
+    return {
+        "pages": pages,
+        "chars": doc.characterCount(),
+        "reused_layout": reuse_layout,
+        "layout_s": round(t_layout - t0, 4),
+        "render_s": round(t_end - t_layout, 4),
+        "total_s": round(t_end - t0, 4),
+        "bytes": os.path.getsize(out_path),
+    }
+
+
+@traced("print_to_pdf")
+def print_to_pdf(doc: QTextDocument, out_path: str,
+                 progress: Optional[Callable[[int, int], None]] = None,
+                 is_cancelled: Optional[Callable[[], bool]] = None,
+                 reuse_layout: bool = False) -> Dict:
+    """Run pdf_pages() to the end, checking `is_cancelled` between pages.
+
+    Reports `progress(page, pages)` and returns the timing stats.
+    """
+    pages = pdf_pages(doc, out_path, reuse_layout)
+    try:
+        while True:
+            if is_cancelled and is_cancelled():
+                raise ExportCancelled()
+            try:
+                page, total = next(pages)
+            except StopIteration as done:
+                return done.value
+            if progress:
+                progress(page, total)
+    finally:
+        pages.close()
+
+
+def record_export_timing(stats: Dict):
+    entry = {
+        "ts": datetime.now().isoformat(timespec="seconds"),
+        "qt": PySide6.__version__,
+        **stats,
+    }
+    try:
+        ensure_app_dirs()
+        with open(EXPORT_TIMINGS, "a", encoding="utf-8") as f:
+            f.write(json.dumps(entry) + "\n")
+    except OSError:
+        pass
+
+
+class _ExportJob(QRunnable):
+    def __init__(self, export: "PdfExport", doc: QTextDocument, out_path: str):
+        super().__init__()
+        self._export = export
+        self._doc = doc
+        self._out_path = out_path
+        self._cancel = export._cancel
+
+    def run(self):
+        # Pull the parentless clone into this thread so its layout timers belong here
+        self._doc.moveToThread(QThread.currentThread())
+        try:
+            try:
+                stats = print_to_pdf(self._doc, self._out_path,
+                                     lambda page, pages: self._export.progress.emit(page, pages),
+                                     self._cancel.is_set)
+                self._export._done.emit(stats)
+            except ExportCancelled:
+                _remove(self._out_path)
+                self._export.cancelled.emit()
+            except Exception as e:
+                _remove(self._out_path)
+                self._export.failed.emit(str(e))
+        except RuntimeError:
+            # The export object was deleted (editor closed) while printing
+            pass
+        finally:
+            self._doc = None
+
+
+def _remove(path: str):
+    try:
+        os.remove(path)
+    except OSError:
+        pass
+
+
+def _abandon(pages: Generator, out_path: str):
+    """Close a pdf_pages() generator stopped halfway and remove its partial PDF."""
+    if inspect.getgeneratorstate(pages) == inspect.GEN_SUSPENDED:
+        pages.close()
+        _remove(out_path)
+
+
+class PdfExport(QObject):
+    """Exports a snapshot of a document to PDF on a worker thread.
+
+    The document is cloned when the export starts, so the user can keep
+    editing; the clone is laid out and painted page by page on the worker.
+
+    With `reuse_layout` a paginated document is painted from the layout it
+    already has instead, a few pages per event-loop turn on the GUI thread.
+    Nothing is laid out again, but the document must stay unchanged until
+    the export ends; if it changes anyway the export fails. cancel() then
+    stops it at once, and if the export is deleted halfway (its editor
+    closed) the partial PDF is removed.
+    """
+    progress = Signal(int, int)
+    finished = Signal(str)
+    failed = Signal(str)
+    cancelled = Signal()
+    _done = Signal(dict)
+
+    def __init__(self, doc: QTextDocument, out_path: str, parent=None, reuse_layout: bool = False):
+        super().__init__(parent)
+        self._out_path = out_path
+        self._cancel = threading.Event()
+        self._active = False
+        self._doc = None
+        self._clone = None
+        self._pages = None
+        self._timer = None
+        self._reuse_layout = reuse_layout
+        self._started = None
+        if reuse_layout:
+            self._doc = doc
+            doc.contentsChange.connect(self._on_contents_change)
+        else:
+            self._clone = doc.clone()
+            self._clone.moveToThread(None)
+        self._done.connect(self._on_done)
+        self.finished.connect(self._stop)
+        self.failed.connect(self._stop)
+        self.cancelled.connect(self._stop)
+        self.failed.connect(lambda msg: self._trace("failed"))
+        self.cancelled.connect(lambda: self._trace("cancelled"))
+
+    def start(self):
+        self._active = True
+        self._started = time.perf_counter()
+        if self._doc is not None:
+            pages = pdf_pages(self._doc, self._out_path, reuse_layout=True)
+            self._pages = pages
+            # Not through self: the wrapper is gone by the time this runs
+            out_path = self._out_path
+            self.destroyed.connect(lambda *args: _abandon(pages, out_path))
+            self._timer = QTimer(self)
+            self._timer.setInterval(0)
+            self._timer.timeout.connect(self._step)
+            self._timer.start()
+            return
+        clone, self._clone = self._clone, None
+        QThreadPool.globalInstance().start(_ExportJob(self, clone, self._out_path))
+
+    @traced("PdfExport._step")
+    def _step(self):
+        deadline = time.perf_counter() + TURN_BUDGET_MS / 1000.0
+        try:
+            while time.perf_counter() < deadline:
+                page, pages = next(self._pages)
+                self.progress.emit(page, pages)
+        except StopIteration as done:
+            self._end_pages()
+            self._done.emit(done.value)
+        except Exception as e:
+            self._end_pages()
+            _remove(self._out_path)
+            self.failed.emit(str(e))
+
+    def _end_pages(self):
+        self._timer.stop()
+        self._pages.close()
+        self._pages = None
+        self._doc.contentsChange.disconnect(self._on_contents_change)
+        self._doc = None
+
+    def _on_contents_change(self, *args):
+        if self._pages is not None:
+            self._end_pages()
+            _remove(self._out_path)
+            self.failed.emit("The document changed while it was being exported.")
+
+    def cancel(self):
+        self._cancel.set()
+        if self._pages is not None:
+            # Painted on this thread: stop now, as the editor may be closing
+            self._end_pages()
+            _remove(self._out_path)
+            self.cancelled.emit()
+
+    def is_active(self) -> bool:
+        return self._active
+
+    def reuses_layout(self) -> bool:
+        return self._reuse_layout
+
+    def _stop(self, *args):
+        self._active = False
+
+    def _trace(self, outcome: str, stats: Optional[Dict] = None):
+        t = tracer()
+        if t is not None and self._started is not None:
+            t.complete("PdfExport", self._started, time.perf_counter(),
+                       dict(stats or {}, outcome=outcome, reused_layout=self._reuse_layout), track="PDF export")
+
+    def _on_done(self, stats: dict):
+        record_export_timing(stats)
+        self._trace("finished", stats)
+        self.finished.emit(self._out_path)
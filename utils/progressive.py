@@ -0,0 +1,239 @@
+import re
+import time
+from typing import List, Optional, Tuple
+from PySide6.QtGui import QTextCursor, QTextDocument, QTextDocumentFragment
+from PySide6.QtCore import QObject, QRunnable, QThreadPool, QTimer, Signal
+
+from .rtf import RtfReader
+
+# Files above this size are opened progressively
+PROGRESSIVE_THRESHOLD = 1024 * 1024
+CHUNK_SIZE = 16 * 1024
+# GUI time spent inserting chunks per event-loop turn
+TURN_BUDGET_MS = 12
+
+_TAG = re.compile(r"<!--.*?-->|<(/?)([a-zA-Z][\w:-]*)[^>]*?(/?)>", re.S)
+_BODY_OPEN = re.compile(r"<body\b[^>]*>", re.I)
+_BODY_CLOSE = re.compile(r"</body\s*>", re.I)
+_VOID = {"br", "hr", "img", "meta", "link", "input", "col", "area", "base", "wbr", "param", "source"}
+# Chunks are only cut between two of these top-level elements; a list or
+# table split across chunks would not be joined back together by Qt
+_SPLITTABLE = {"p", "h1", "h2", "h3", "h4", "h5", "h6"}
+
+
+def split_html(data: str, chunk_size: int = CHUNK_SIZE) -> Tuple[str, str, List[str]]:
+    """Split an HTML document into (prefix, suffix, body chunks).
+
+    Every chunk wrapped in prefix/suffix is a complete document with the
+    original <head> styles and <body> attributes, and ends where one
+    top-level paragraph or heading is followed by another.
+    """
+    m = _BODY_OPEN.search(data)
+    start = m.end() if m else 0
+    end_m = _BODY_CLOSE.search(data, start)
+    end = end_m.start() if end_m else len(data)
+    prefix = data[:start]
+    suffix = data[end:]
+
+    chunks = []
+    depth = 0
+    last = start
+    closed = None  # (name, end offset) of the last top-level element closed
+    for t in _TAG.finditer(data, start, end):
+        name = t.group(2)
+        if not name:
+            continue
+        name = name.lower()
+        if t.group(1):
+            depth = max(0, depth - 1)
+            if depth == 0:
+                closed = (name, t.end())
+            continue
+        if (depth == 0 and closed and closed[0] in _SPLITTABLE and name in _SPLITTABLE
+                and closed[1] - last >= chunk_size):
+            chunks.append(data[last:closed[1]])
+            last = closed[1]
+        if not t.group(3) and name not in _VOID:
+            depth += 1
+    chunks.append(data[last:end])
+    return prefix, suffix, chunks
+
+
+def split_text(data: str, chunk_size: int = CHUNK_SIZE) -> List[str]:
+    """Split plain text into chunks that end right after a newline."""
+    chunks = []
+    pos = 0
+    n = len(data)
+    while pos < n:
+        cut = data.find("\n", pos + chunk_size)
+        cut = n if cut < 0 else cut + 1
+        chunks.append(data[pos:cut])
+        pos = cut
+    return chunks or [""]
+
+
+def split_bytes(data: bytes, chunk_size: int = CHUNK_SIZE) -> List[bytes]:
+    """Split raw data into fixed-size chunks (the RTF reader carries state across them)."""
+    return [data[i:i + chunk_size] for i in range(0, len(data), chunk_size)] or [b""]
+
+
+class _SplitJob(QRunnable):
+    def __init__(self, loader: "ProgressiveLoader", path: str, kind: str):
+        super().__init__()
+        self._loader = loader
+        self._path = path
+        self._kind = kind
+
+    def run(self):
+        try:
+            try:
+                if self._kind == "rtf":
+                    with open(self._path, "rb") as f:
+                        raw = f.read()
+                    self._loader._split_ready.emit("", "", split_bytes(raw), len(raw))
+                    return
+                with open(self._path, "r", encoding="utf-8", errors="ignore") as f:
+                    data = f.read()
+                if self._kind == "html":
+                    prefix, suffix, chunks = split_html(data)
+                else:
+                    prefix, suffix, chunks = "", "", split_text(data)
+                self._loader._split_ready.emit(prefix, suffix, chunks, len(data))
+            except Exception as e:
+                self._loader._split_failed.emit(str(e))
+        except RuntimeError:
+            # The loader was deleted (editor closed) while reading
+            pass
+
+
+class ProgressiveLoader(QObject):
+    """Loads a large file into a QTextDocument a few chunks per event-loop turn.
+
+    `kind` is "html", "rtf" or "text" (see doc_io.document_kind). RTF is
+    fed to an RtfReader in fixed-size byte chunks.
+
+    Reading and splitting happen on a worker thread. Insertion has to happen
+    on the GUI thread: QTextDocument is not thread-safe, and PySide keeps the
+    GIL while setHtml() runs, so a worker parse would stall Python slots
+    anyway. Each turn inserts chunks until TURN_BUDGET_MS is used up, so
+    the first screen shows right away and the window stays responsive.
+    """
+    progress = Signal(int, int)
+    finished = Signal()
+    failed = Signal(str)
+    cancelled = Signal()
+    _split_ready = Signal(str, str, list, int)
+    _split_failed = Signal(str)
+
+    def __init__(self, doc: QTextDocument, path: str, kind: str, parent=None):
+        super().__init__(parent)
+        self._doc = doc
+        self._path = path
+        self._kind = kind
+        self._rtf: Optional[RtfReader] = None
+        self._chunks: list = []
+        self._prefix = ""
+        self._suffix = ""
+        self._next = 0
+        self._total = 0
+        self._done = 0
+        self._active = False
+        self._cursor: Optional[QTextCursor] = None
+        self._timer = QTimer(self)
+        self._timer.setInterval(0)
+        self._timer.timeout.connect(self._step)
+        self._split_ready.connect(self._on_split)
+        self._split_failed.connect(self._on_failed)
+
+    def start(self):
+        self._active = True
+        QThreadPool.globalInstance().start(_SplitJob(self, self._path, self._kind))
+
+    def cancel(self):
+        if not self._active:
+            return
+        self._active = False
+        self._timer.stop()
+        self._finish_doc()
+        self.cancelled.emit()
+
+    def is_active(self) -> bool:
+        return self._active
+
+    def _on_failed(self, msg: str):
+        if self._active:
+            self._active = False
+            self.failed.emit(msg)
+
+    def _on_split(self, prefix: str, suffix: str, chunks: list, total: int):
+        if not self._active:
+            return
+        self._prefix, self._suffix, self._chunks = prefix, suffix, chunks
+        self._total = total
+        self._doc.setUndoRedoEnabled(False)
+        # The first chunk replaces the document so it picks up the body defaults
+        first = chunks[0]
+        if self._kind == "rtf":
+            self._rtf = RtfReader(self._doc)
+            self._rtf.feed(first)
+        elif self._kind == "html":
+            self._doc.setHtml(prefix + first + suffix)
+        else:
+            self._doc.setPlainText(first)
+        self._done = len(first)
+        self._next = 1
+        self._cursor = QTextCursor(self._doc)
+        self.progress.emit(self._done, self._total)
+        if self._next >= len(chunks):
+            self._complete()
+        else:
+            self._timer.start()
+
+    def _insert_html(self, chunk: str):
+        part = QTextDocument()
+        part.setHtml(self._prefix + chunk + self._suffix)
+        # Start a block with the chunk's own first-block format; the fragment's
+        # first block is merged into it and would otherwise lose alignment/margins
+        first = part.firstBlock()
+        self._cursor.insertBlock(first.blockFormat(), first.charFormat())
+        self._cursor.insertFragment(QTextDocumentFragment(part))
+
+    def _step(self):
+        deadline = time.perf_counter() + TURN_BUDGET_MS / 1000.0
+        while self._next < len(self._chunks):
+            chunk = self._chunks[self._next]
+            self._chunks[self._next] = ""
+            self._next += 1
+            if self._rtf is not None:
+                self._rtf.feed(chunk)
+                self._done += len(chunk)
+                if time.perf_counter() >= deadline:
+                    break
+                continue
+            self._cursor.movePosition(QTextCursor.End)
+            if self._kind == "html":
+                self._insert_html(chunk)
+            else:
+                self._cursor.insertText(chunk)
+            self._done += len(chunk)
+            if time.perf_counter() >= deadline:
+                break
+        self.progress.emit(self._done, self._total)
+        if self._next >= len(self._chunks):
+            self._complete()
+
+    def _complete(self):
+        self._timer.stop()
+        self._active = False
+        self._finish_doc()
+        self.finished.emit()
+
+    def _finish_doc(self):
+        if self._rtf is not None:
+            # Flush the pending paragraph; on cancel that keeps what was read so far
+            self._rtf.close()
+            self._rtf = None
+        self._chunks = []
+        self._cursor = None
+        self._doc.setUndoRedoEnabled(True)
+        self._doc.setModified(False)
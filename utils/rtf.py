@@ -0,0 +1,934 @@
+import codecs
+import os
+import re
+from typing import BinaryIO, Dict, Iterator, List, Optional, Tuple
+from PySide6.QtGui import (QTextDocument, QTextCursor, QTextCharFormat, QTextBlockFormat, QTextImageFormat,
+                           QTextListFormat, QTextFormat, QFont, QColor, QImage, QPixmap, QBrush)
+from PySide6.QtCore import Qt, QUrl, QBuffer, QByteArray, QIODevice, QSize
+
+from .images import add_image, image_data, image_info
+
+RTF_CHUNK = 64 * 1024
+_TWIPS_PER_PX = 15  # 1440 twips per inch at 96 dpi
+
+_TOKEN = re.compile(
+    rb"\\([a-zA-Z]{1,32})(-?\d{1,10})? ?"  # 1, 2: control word and parameter
+    rb"|\\'([0-9a-fA-F]{2})"               # 3: hex byte
+    rb"|\\([^a-zA-Z'])"                    # 4: control symbol
+    rb"|([{}])"                            # 5: group
+    rb"|[\r\n]+"                           # line breaks carry no meaning
+    rb"|[^\\{}\r\n]+"                      # text
+)
+
+_SPECIAL = {
+    "tab": "\t", "line": "\u2028", "emdash": "\u2014", "endash": "\u2013", "bullet": "\u2022",
+    "lquote": "\u2018", "rquote": "\u2019", "ldblquote": "\u201c", "rdblquote": "\u201d",
+    "emspace": "\u2003", "enspace": "\u2002", "qmspace": "\u2005", "cell": "\t",
+}
+_SYMBOLS = {b"~": "\u00a0", b"_": "\u2011", b"-": "\u00ad", b"\\": "\\", b"{": "{", b"}": "}"}
+_PARAGRAPH_BREAKS = {"par", "sect", "page", "row"}
+# Destinations whose contents are never body text
+_SKIP_DESTS = {
+    "stylesheet", "info", "header", "headerl", "headerr", "headerf", "footer", "footerl", "footerr",
+    "footerf", "footnote", "annotation", "xe", "tc", "txe", "listtable", "listoverridetable",
+    "revtbl", "rsidtbl", "generator", "themedata", "colorschememapping", "latentstyles", "datastore",
+    "filetbl", "nonshppict", "fldinst", "object", "pgdsctbl", "xmlnstbl", "mmathPr", "userprops",
+}
+# Ignorable (\*) destinations that do carry content
+_KEEP_STARRED = {"shppict", "pn", "listtext", "pntext"}
+_CHARSETS = {
+    0: "cp1252", 77: "mac_roman", 128: "cp932", 129: "cp949", 134: "cp936", 136: "cp950",
+    161: "cp1253", 162: "cp1254", 163: "cp1258", 177: "cp1255", 178: "cp1256", 186: "cp1257",
+    204: "cp1251", 222: "cp874", 238: "cp1250",
+}
+_ALIGN = {"ql": Qt.AlignLeft, "qc": Qt.AlignHCenter, "qr": Qt.AlignRight, "qj": Qt.AlignJustify}
+
+
+def is_rtf_data(head: bytes) -> bool:
+    return head.lstrip()[:5] == b"{\\rtf"
+
+
+def is_rtf_file(path: str) -> bool:
+    try:
+        with open(path, "rb") as f:
+            return is_rtf_data(f.read(64))
+    except OSError:
+        return False
+
+
+class _State:
+    """Character and destination state saved and restored by RTF groups."""
+    __slots__ = ("bold", "italic", "underline", "strike", "valign", "font", "size", "fg", "bg",
+                 "hidden", "uc", "dest")
+
+    def __init__(self):
+        self.dest = None
+        self.uc = 1
+        self.plain()
+
+    def plain(self):
+        self.bold = self.italic = self.underline = self.strike = self.hidden = False
+        self.valign = 0
+        self.font = None
+        self.size = None
+        self.fg = 0
+        self.bg = 0
+
+    def copy(self) -> "_State":
+        s = _State.__new__(_State)
+        for k in _State.__slots__:
+            setattr(s, k, getattr(self, k))
+        return s
+
+    def key(self):
+        return (self.bold, self.italic, self.underline, self.strike, self.valign,
+                self.font, self.size, self.fg, self.bg)
+
+
+class _Paragraph:
+    __slots__ = ("align", "li", "ri", "fi", "sb", "sa", "heading", "list_style", "list_id", "list_level")
+
+    def __init__(self):
+        self.align = None
+        self.li = self.ri = self.fi = self.sb = self.sa = 0
+        self.heading = 0
+        self.list_style = None
+        self.list_id = None
+        self.list_level = 0
+
+
+class RtfParser:
+    """Incremental RTF tokenizer and interpreter.
+
+    feed() takes the file in arbitrary byte chunks; only an unfinished
+    control word is carried over between chunks, so memory stays bounded by
+    the chunk size (plus whatever the sink keeps). Text, paragraph breaks
+    and images are reported to the sink as they are parsed.
+    """
+
+    def __init__(self, sink):
+        self.sink = sink
+        self._stack: List[_State] = []
+        self._st = _State()
+        self._para = _Paragraph()
+        self._carry = b""
+        self._bin_left = 0
+        self._skip = 0
+        self._starred = False
+        self._group_start = False
+        self._codepage = "cp1252"
+        self._deff = None
+        self._fonts: Dict[int, dict] = {}
+        self._font: Optional[dict] = None
+        self._colors: List[Optional[QColor]] = []
+        self._rgb = [None, None, None]
+        self._bytes = bytearray()
+        self._bytes_cp = None
+        self._capture: List[str] = []
+        self._capture_depth = 0
+        self._pict: Optional[dict] = None
+        self._pict_depth = 0
+        self._high = 0
+
+    # -- tokenizer
+
+    def feed(self, data: bytes):
+        self._scan(self._carry + data if self._carry else data, eof=False)
+
+    def close(self):
+        if self._carry:
+            self._scan(self._carry, eof=True)
+        self._flush_bytes()
+        self.sink.finish(self._para)
+
+    def _scan(self, buf: bytes, eof: bool):
+        self._carry = b""
+        pos = 0
+        n = len(buf)
+        match = _TOKEN.match
+        while pos < n:
+            if self._bin_left:
+                take = min(n - pos, self._bin_left)
+                if self._pict is not None and len(self._stack) >= self._pict_depth:
+                    self._pict["data"] += buf[pos:pos + take]
+                pos += take
+                self._bin_left -= take
+                continue
+            m = match(buf, pos)
+            if m is None:
+                # A backslash or \' cut off by the chunk boundary, or malformed input
+                if not eof and n - pos < 4:
+                    break
+                pos += 1
+                continue
+            word = m.group(1)
+            if word is not None:
+                param = m.group(2)
+                # More data could still extend the word or start its parameter
+                if not eof and (m.end() == n or (param is None and buf[m.end():] == b"-")):
+                    break
+                self._word(word.decode("ascii"), int(param) if param is not None else None)
+            elif m.group(3) is not None:
+                self._byte(int(m.group(3), 16))
+            elif m.group(4) is not None:
+                self._symbol(m.group(4))
+            elif m.group(5) is not None:
+                if m.group(5) == b"{":
+                    self._push()
+                else:
+                    self._pop()
+            else:
+                text = m.group(0)
+                if text[0] not in (13, 10):
+                    self._text(text)
+            pos = m.end()
+        if pos < n:
+            self._carry = buf[pos:]
+
+    # -- groups
+
+    def _push(self):
+        self._flush_bytes()
+        self._stack.append(self._st)
+        self._st = self._st.copy()
+        self._skip = 0
+        self._group_start = True
+        self._starred = False
+
+    def _pop(self):
+        self._flush_bytes()
+        depth = len(self._stack)
+        if self._pict is not None and depth == self._pict_depth:
+            self._end_pict()
+        if self._capture_depth and depth == self._capture_depth:
+            self._end_capture()
+        if self._font is not None and self._st.dest == "fonttbl":
+            self._end_font()
+        if self._stack:
+            self._st = self._stack.pop()
+        self._skip = 0
+        self._group_start = False
+
+    def _set_dest(self, name: str):
+        self._st.dest = name
+        if name in ("listtext", "pntext"):
+            self._capture = []
+            self._capture_depth = len(self._stack)
+        elif name == "pict":
+            self._pict = {"data": bytearray(), "hex": True, "w": 0, "h": 0, "goalw": 0, "goalh": 0}
+            self._pict_depth = len(self._stack)
+
+    # -- control words
+
+    def _word(self, w: str, p: Optional[int]):
+        self._flush_bytes()
+        st = self._st
+        group_start, self._group_start = self._group_start, False
+        if w == "bin":
+            self._bin_left = max(0, p or 0)
+            if self._pict is not None:
+                self._pict["hex"] = False
+            return
+        if st.dest == "skip":
+            return
+        if group_start or self._starred:
+            if self._starred and w not in _KEEP_STARRED and w != "pict":
+                st.dest = "skip"
+                self._starred = False
+                return
+            self._starred = False
+            if w in _SKIP_DESTS:
+                st.dest = "skip"
+                return
+            if w in ("fonttbl", "colortbl", "pict", "listtext", "pntext", "pn"):
+                self._set_dest(w)
+                if w != "pn":
+                    return
+        dest = st.dest
+        if dest == "fonttbl":
+            self._font_word(w, p)
+            return
+        if dest == "colortbl":
+            if w in ("red", "green", "blue"):
+                self._rgb[("red", "green", "blue").index(w)] = p or 0
+            return
+        if dest == "pict":
+            self._pict_word(w, p)
+            return
+        if dest == "pn":
+            self._pn_word(w, p)
+            return
+        if self._skip:
+            # Control words inside a \u fallback count as one character
+            self._skip -= 1
+            return
+
+        if w == "u" and p is not None:
+            code = p + 65536 if p < 0 else p
+            if 0xD800 <= code < 0xDC00:
+                # High surrogate: wait for the low half written as the next \u
+                self._high = code
+            elif 0xDC00 <= code < 0xE000 and self._high:
+                self._emit(chr(0x10000 + ((self._high - 0xD800) << 10) + (code - 0xDC00)))
+                self._high = 0
+            else:
+                self._emit(chr(code))
+            self._skip = st.uc
+        elif w in _PARAGRAPH_BREAKS:
+            if dest is None:
+                self.sink.paragraph(self._para)
+        elif w in _SPECIAL:
+            self._emit(_SPECIAL[w])
+        elif w == "pard":
+            self._para = _Paragraph()
+        elif w == "plain":
+            st.plain()
+        elif w == "b":
+            st.bold = p != 0
+        elif w == "i":
+            st.italic = p != 0
+        elif w in ("ul", "uld", "uldb", "ulw", "ulth", "uldash", "ulwave"):
+            st.underline = p != 0
+        elif w == "ulnone":
+            st.underline = False
+        elif w in ("strike", "striked"):
+            st.strike = p != 0
+        elif w == "super":
+            st.valign = 1
+        elif w == "sub":
+            st.valign = 2
+        elif w == "nosupersub":
+            st.valign = 0
+        elif w == "f":
+            st.font = p
+        elif w == "fs":
+            st.size = p
+        elif w == "cf":
+            st.fg = p or 0
+        elif w in ("cb", "chcbpat", "highlight"):
+            st.bg = p or 0
+        elif w == "v":
+            st.hidden = p != 0
+        elif w == "uc":
+            st.uc = max(0, p or 0)
+        elif w in _ALIGN:
+            self._para.align = _ALIGN[w]
+        elif w == "li":
+            self._para.li = p or 0
+        elif w == "ri":
+            self._para.ri = p or 0
+        elif w == "fi":
+            self._para.fi = p or 0
+        elif w == "sb":
+            self._para.sb = p or 0
+        elif w == "sa":
+            self._para.sa = p or 0
+        elif w == "outlinelevel":
+            self._para.heading = (p or 0) + 1 if (p or 0) < 6 else 0
+        elif w == "ls":
+            self._para.list_id = p
+            self._para.list_style = self._para.list_style or QTextListFormat.ListDisc
+        elif w == "ilvl":
+            self._para.list_level = p or 0
+        elif w == "ansicpg" and p:
+            self._codepage = _codec(f"cp{p}")
+        elif w == "pc":
+            self._codepage = "cp437"
+        elif w == "pca":
+            self._codepage = "cp850"
+        elif w == "mac":
+            self._codepage = "mac_roman"
+        elif w == "deff":
+            self._deff = p
+
+    def _symbol(self, s: bytes):
+        self._group_start = False
+        if s == b"*":
+            self._starred = True
+            return
+        if self._st.dest == "skip":
+            return
+        if s in (b"\r", b"\n"):
+            self._word("par", None)
+            return
+        ch = _SYMBOLS.get(s)
+        if ch is None:
+            return
+        if self._skip:
+            self._skip -= 1
+            return
+        if ch == "\u00ad":
+            return
+        if self._st.dest in (None, "listtext", "pntext"):
+            self._flush_bytes()
+            self._emit(ch)
+        else:
+            self._text(ch.encode("latin-1"))
+
+    def _font_word(self, w: str, p: Optional[int]):
+        if w == "f":
+            self._end_font()
+            self._font = {"id": p, "name": "", "cp": None}
+        elif w == "fcharset" and self._font is not None:
+            self._font["cp"] = "symbol" if p == 2 else _CHARSETS.get(p)
+
+    def _end_font(self):
+        f = self._font
+        if f is not None and f["id"] is not None:
+            f["name"] = f["name"].strip()
+            self._fonts[f["id"]] = f
+        self._font = None
+
+    def _pict_word(self, w: str, p: Optional[int]):
+        pict = self._pict
+        if pict is None:
+            return
+        if w in ("picw", "pich", "picwgoal", "pichgoal"):
+            pict[{"picw": "w", "pich": "h", "picwgoal": "goalw", "pichgoal": "goalh"}[w]] = p or 0
+
+    def _pn_word(self, w: str, p: Optional[int]):
+        styles = {
+            "pnlvlblt": QTextListFormat.ListDisc, "pndec": QTextListFormat.ListDecimal,
+            "pnlcltr": QTextListFormat.ListLowerAlpha, "pnucltr": QTextListFormat.ListUpperAlpha,
+            "pnlcrm": QTextListFormat.ListLowerRoman, "pnucrm": QTextListFormat.ListUpperRoman,
+        }
+        if w in styles:
+            self._para.list_style = styles[w]
+        elif w in ("pntxta", "pntxtb"):
+            self._st.dest = "skip"
+
+    # -- text
+
+    def _cp(self) -> str:
+        f = self._fonts.get(self._st.font if self._st.font is not None else self._deff)
+        return (f and f["cp"]) or self._codepage
+
+    def _byte(self, b: int):
+        self._group_start = False
+        if self._skip:
+            self._skip -= 1
+            return
+        dest = self._st.dest
+        if dest == "skip":
+            return
+        if dest in (None, "listtext", "pntext", "fonttbl"):
+            cp = self._cp() if dest != "fonttbl" else (self._font and self._font["cp"]) or self._codepage
+            if self._bytes and self._bytes_cp != cp:
+                self._flush_bytes()
+            self._bytes_cp = cp
+            self._bytes.append(b)
+
+    def _text(self, data: bytes):
+        self._group_start = False
+        if self._skip:
+            k = min(self._skip, len(data))
+            data = data[k:]
+            self._skip -= k
+            if not data:
+                return
+        dest = self._st.dest
+        if dest is None or dest in ("listtext", "pntext"):
+            cp = self._cp()
+            if self._bytes and self._bytes_cp != cp:
+                self._flush_bytes()
+            self._bytes_cp = cp
+            self._bytes += data
+        elif dest == "pict":
+            if self._pict is not None:
+                self._pict["data"] += data
+        elif dest == "fonttbl":
+            self._flush_bytes()
+            if self._font is not None:
+                name = data.decode((self._font["cp"] if self._font["cp"] != "symbol" else None) or "latin-1",
+                                   errors="replace")
+                if ";" in name:
+                    self._font["name"] += name.split(";", 1)[0]
+                    self._end_font()
+                else:
+                    self._font["name"] += name
+        elif dest == "colortbl":
+            for _ in range(data.count(b";")):
+                r, g, b = self._rgb
+                self._colors.append(None if r is None and g is None and b is None
+                                    else QColor(r or 0, g or 0, b or 0))
+                self._rgb = [None, None, None]
+
+    def _flush_bytes(self):
+        if not self._bytes:
+            return
+        cp = self._bytes_cp
+        data = bytes(self._bytes)
+        self._bytes.clear()
+        if cp == "symbol":
+            text = "".join("\u2022" if b == 0xB7 else chr(b) for b in data)
+        else:
+            text = data.decode(cp or "cp1252", errors="replace")
+        if self._st.dest == "fonttbl":
+            if self._font is not None:
+                self._font["name"] += text
+        else:
+            self._emit(text)
+
+    def _emit(self, text: str):
+        dest = self._st.dest
+        if dest is None:
+            if not self._st.hidden:
+                self.sink.text(text, self._st, self)
+        elif dest in ("listtext", "pntext"):
+            self._capture.append(text)
+
+    def _end_capture(self):
+        self._capture_depth = 0
+        marker = "".join(self._capture).strip()
+        para = self._para
+        if marker and para.list_style in (None, QTextListFormat.ListDisc):
+            if any(c.isdigit() for c in marker):
+                para.list_style = QTextListFormat.ListDecimal
+            elif para.list_style is None:
+                para.list_style = QTextListFormat.ListDisc
+        self._capture = []
+
+    def _end_pict(self):
+        pict, self._pict = self._pict, None
+        data = bytes(pict["data"])
+        if pict["hex"]:
+            try:
+                data = bytes.fromhex(data.decode("ascii", errors="ignore"))
+            except ValueError:
+                return
+        w = round(pict["goalw"] / _TWIPS_PER_PX) if pict["goalw"] else 0
+        h = round(pict["goalh"] / _TWIPS_PER_PX) if pict["goalh"] else 0
+        # Decoding is left to whoever shows the picture
+        self.sink.image(data, w, h)
+
+    # -- tables used by sinks
+
+    def font_name(self, font_id: Optional[int]) -> Optional[str]:
+        if font_id is None or font_id == self._deff:
+            return None
+        f = self._fonts.get(font_id)
+        return f["name"] if f and f["name"] else None
+
+    def color(self, index: int) -> Optional[QColor]:
+        if 0 < index < len(self._colors):
+            return self._colors[index]
+        return None
+
+
+def _codec(name: str) -> str:
+    try:
+        codecs.lookup(name)
+        return name
+    except LookupError:
+        return "cp1252"
+
+
+class _DocumentSink:
+    """Builds the parsed RTF into a QTextDocument through one cursor."""
+
+    def __init__(self, doc: QTextDocument):
+        self.doc = doc
+        self.cursor = QTextCursor(doc)
+        self.cursor.movePosition(QTextCursor.End)
+        self._need_block = False
+        self._formats: Dict[tuple, QTextCharFormat] = {}
+        self._run: List[str] = []
+        self._run_fmt: Optional[QTextCharFormat] = None
+        self._run_key = None
+        self._list = None
+        self._list_key = None
+        self._images = 0
+
+    def _char_format(self, st: _State, parser: RtfParser) -> QTextCharFormat:
+        key = st.key()
+        fmt = self._formats.get(key)
+        if fmt is None:
+            fmt = QTextCharFormat()
+            if st.bold:
+                fmt.setFontWeight(QFont.Bold)
+            if st.italic:
+                fmt.setFontItalic(True)
+            if st.underline:
+                fmt.setFontUnderline(True)
+            if st.strike:
+                fmt.setFontStrikeOut(True)
+            if st.valign:
+                fmt.setVerticalAlignment(QTextCharFormat.AlignSuperScript if st.valign == 1
+                                         else QTextCharFormat.AlignSubScript)
+            name = parser.font_name(st.font)
+            if name:
+                fmt.setFontFamilies([name])
+            if st.size:
+                fmt.setFontPointSize(st.size / 2)
+            fg = parser.color(st.fg)
+            if fg is not None:
+                fmt.setForeground(QBrush(fg))
+            bg = parser.color(st.bg)
+            if bg is not None:
+                fmt.setBackground(QBrush(bg))
+            self._formats[key] = fmt
+        return fmt
+
+    def _open_block(self):
+        if self._need_block:
+            self._flush_run()
+            self.cursor.insertBlock(QTextBlockFormat(), QTextCharFormat())
+            self._need_block = False
+
+    def _flush_run(self):
+        if self._run:
+            self.cursor.insertText("".join(self._run), self._run_fmt)
+            self._run = []
+
+    def text(self, text: str, st: _State, parser: RtfParser):
+        self._open_block()
+        key = st.key()
+        if key != self._run_key:
+            self._flush_run()
+            self._run_key = key
+            self._run_fmt = self._char_format(st, parser)
+        self._run.append(text)
+
+    def image(self, data: bytes, width: int, height: int):
+        fmt_name = image_info(data)[1] or "png"
+        name = f"rtf-image-{self._images + 1}.{'jpg' if fmt_name == 'jpeg' else fmt_name}"
+        if not add_image(self.doc, name, data):
+            return
+        self._open_block()
+        self._flush_run()
+        self._images += 1
+        fmt = QTextImageFormat()
+        fmt.setName(name)
+        if width:
+            fmt.setWidth(width)
+        if height:
+            fmt.setHeight(height)
+        self.cursor.insertImage(fmt)
+
+    def paragraph(self, para: _Paragraph):
+        self._open_block()
+        self._flush_run()
+        self._format_block(para)
+        self._need_block = True
+
+    def finish(self, para: _Paragraph):
+        self._flush_run()
+        if not self._need_block and self.cursor.block().length() > 1:
+            self._format_block(para)
+
+    def _format_block(self, para: _Paragraph):
+        fmt = QTextBlockFormat()
+        if para.align is not None:
+            fmt.setAlignment(para.align)
+        if para.heading:
+            fmt.setHeadingLevel(para.heading)
+        if para.sb:
+            fmt.setTopMargin(para.sb / _TWIPS_PER_PX)
+        if para.sa:
+            fmt.setBottomMargin(para.sa / _TWIPS_PER_PX)
+        if para.list_style is None:
+            if para.li:
+                fmt.setLeftMargin(para.li / _TWIPS_PER_PX)
+            if para.fi:
+                fmt.setTextIndent(para.fi / _TWIPS_PER_PX)
+        if para.ri:
+            fmt.setRightMargin(para.ri / _TWIPS_PER_PX)
+        self.cursor.setBlockFormat(fmt)
+        if para.list_style is None:
+            self._list = None
+            self._list_key = None
+            return
+        key = (para.list_id, para.list_style, para.list_level)
+        if self._list is not None and key == self._list_key:
+            self._list.add(self.cursor.block())
+        else:
+            lf = QTextListFormat()
+            lf.setStyle(para.list_style)
+            lf.setIndent(para.list_level + 1)
+            self._list = self.cursor.createList(lf)
+            self._list_key = key
+
+
+class _TextSink:
+    """Collects plain text only, e.g. for the search index."""
+
+    def __init__(self):
+        self.parts: List[str] = []
+
+    def text(self, text: str, st: _State, parser: RtfParser):
+        self.parts.append(text.replace("\u2028", "\n"))
+
+    def image(self, data, width, height):
+        pass
+
+    def paragraph(self, para):
+        self.parts.append("\n")
+
+    def finish(self, para):
+        pass
+
+
+class RtfReader:
+    """Streams RTF bytes into `doc`, replacing its contents."""
+
+    def __init__(self, doc: QTextDocument):
+        doc.clear()
+        self._parser = RtfParser(_DocumentSink(doc))
+
+    def feed(self, data: bytes):
+        self._parser.feed(data)
+
+    def close(self):
+        self._parser.close()
+
+
+def _read_chunks(f: BinaryIO, limit: int) -> Iterator[bytes]:
+    left = limit
+    while left != 0:
+        data = f.read(RTF_CHUNK if left < 0 else min(RTF_CHUNK, left))
+        if not data:
+            return
+        if left > 0:
+            left -= len(data)
+        yield data
+
+
+def read_rtf(path: str, doc: QTextDocument, limit: int = -1):
+    """Load the RTF file at `path` into `doc`; `limit` stops after that many bytes."""
+    reader = RtfReader(doc)
+    with open(path, "rb") as f:
+        for data in _read_chunks(f, limit):
+            reader.feed(data)
+    reader.close()
+
+
+def rtf_to_text(path: str, limit: int = -1) -> str:
+    sink = _TextSink()
+    parser = RtfParser(sink)
+    with open(path, "rb") as f:
+        for data in _read_chunks(f, limit):
+            parser.feed(data)
+    parser.close()
+    return "".join(sink.parts)
+
+
+# -- writer
+
+_ESCAPE = re.compile("[\\\\{}\t\u2028\u2029\x00-\x08\x0b-\x1f\u007f-\U0010ffff]")
+_LIST_PN = {
+    QTextListFormat.ListDecimal: "\\pnlvlbody\\pndec",
+    QTextListFormat.ListLowerAlpha: "\\pnlvlbody\\pnlcltr",
+    QTextListFormat.ListUpperAlpha: "\\pnlvlbody\\pnucltr",
+    QTextListFormat.ListLowerRoman: "\\pnlvlbody\\pnlcrm",
+    QTextListFormat.ListUpperRoman: "\\pnlvlbody\\pnucrm",
+}
+
+
+def _escape_char(m) -> str:
+    c = m.group(0)
+    if c in "\\{}":
+        return "\\" + c
+    if c == "\t":
+        return "\\tab "
+    if c in "\u2028\u2029":
+        return "\\line "
+    code = ord(c)
+    if code < 0x20 or code == 0x7f:
+        return ""
+    if code > 0xFFFF:
+        code -= 0x10000
+        hi, lo = 0xD800 + (code >> 10), 0xDC00 + (code & 0x3FF)
+        return f"\\u{hi - 65536}?\\u{lo - 65536}?"
+    return f"\\u{code if code < 32768 else code - 65536}?"
+
+
+def _escape(text: str) -> str:
+    return _ESCAPE.sub(_escape_char, text)
+
+
+def _family(fmt: QTextCharFormat) -> Optional[str]:
+    # fontFamilies() crashes PySide when the property is unset, so check first
+    if fmt.hasProperty(QTextFormat.FontFamilies):
+        fams = fmt.fontFamilies()
+        if fams:
+            return fams[0]
+    if fmt.hasProperty(QTextFormat.FontFamily):
+        return fmt.fontFamily() or None
+    return None
+
+
+# QTextFormat::font() scaling for HTML <font size> / <h1>..<h6> adjustments -3..+3
+_SIZE_ADJUST = (0.7, 0.8, 1.0, 1.2, 1.5, 2.0, 2.4)
+
+
+def _point_size(fmt: QTextCharFormat, base: float) -> float:
+    if fmt.fontPointSize() > 0:
+        return fmt.fontPointSize()
+    if fmt.hasProperty(QTextFormat.FontSizeAdjustment) and base > 0:
+        adjust = fmt.intProperty(QTextFormat.FontSizeAdjustment)
+        return base * _SIZE_ADJUST[max(0, min(6, adjust + 2))]
+    return 0
+
+
+def _fragments(doc: QTextDocument):
+    block = doc.begin()
+    while block.isValid():
+        it = block.begin()
+        frags = []
+        while not it.atEnd():
+            frags.append(it.fragment())
+            it += 1
+        yield block, frags
+        block = block.next()
+
+
+def _image_blip(doc: QTextDocument, name: str) -> Optional[Tuple[str, QSize, bytes]]:
+    """(blip type, pixel size, data) for an image; PNG and JPEG originals are kept as they are."""
+    data = image_data(doc, name)
+    if data is not None:
+        size, fmt = image_info(data)
+        if fmt == "png":
+            return "pngblip", size, data
+        if fmt == "jpeg":
+            return "jpegblip", size, data
+        res = QImage.fromData(data)
+    else:
+        res = doc.resource(QTextDocument.ImageResource, QUrl(name))
+    if isinstance(res, QPixmap):
+        res = res.toImage()
+    if isinstance(res, (bytes, QByteArray)):
+        res = QImage.fromData(bytes(res))
+    if not isinstance(res, QImage) or res.isNull():
+        return None
+    buf = QByteArray()
+    dev = QBuffer(buf)
+    dev.open(QIODevice.WriteOnly)
+    res.save(dev, "PNG")
+    dev.close()
+    return "pngblip", res.size(), bytes(buf)
+
+
+def iter_rtf(doc: QTextDocument) -> Iterator[str]:
+    """Serialize `doc` as RTF, one paragraph at a time."""
+    default_family = doc.defaultFont().family()
+    base_size = doc.defaultFont().pointSizeF()
+    fonts = {default_family: 0}
+    colors: Dict[str, int] = {}
+    # First pass: font and color tables must precede the body
+    for _, frags in _fragments(doc):
+        for frag in frags:
+            fmt = frag.charFormat()
+            fam = _family(fmt)
+            if fam and fam not in fonts:
+                fonts[fam] = len(fonts)
+            for prop, brush in ((QTextFormat.ForegroundBrush, fmt.foreground()),
+                                (QTextFormat.BackgroundBrush, fmt.background())):
+                if fmt.hasProperty(prop) and brush.style() != Qt.NoBrush:
+                    colors.setdefault(brush.color().name(), len(colors) + 1)
+
+    head = ["{\\rtf1\\ansi\\ansicpg1252\\deff0\\uc1{\\fonttbl"]
+    for fam, i in fonts.items():
+        head.append(f"{{\\f{i}\\fnil\\fcharset0 {_escape(fam)};}}")
+    head.append("}{\\colortbl;")
+    for name in colors:
+        c = QColor(name)
+        head.append(f"\\red{c.red()}\\green{c.green()}\\blue{c.blue()};")
+    head.append("}{\\*\\generator WinPages;}\n")
+    yield "".join(head)
+
+    for block, frags in _fragments(doc):
+        out = ["\\pard"]
+        bf = block.blockFormat()
+        align = bf.alignment() & Qt.AlignHorizontal_Mask
+        for word, flag in (("\\qc", Qt.AlignHCenter), ("\\qr", Qt.AlignRight), ("\\qj", Qt.AlignJustify)):
+            if (align & flag) == flag:
+                out.append(word)
+                break
+        if bf.headingLevel():
+            out.append(f"\\outlinelevel{bf.headingLevel() - 1}")
+        for word, value in (("sb", bf.topMargin()), ("sa", bf.bottomMargin()), ("ri", bf.rightMargin())):
+            if value:
+                out.append(f"\\{word}{round(value * _TWIPS_PER_PX)}")
+        lst = block.textList()
+        if lst is not None:
+            lf = lst.format()
+            indent = max(1, lf.indent())
+            out.append(f"\\fi-360\\li{360 * indent + 360}")
+            pn = _LIST_PN.get(lf.style())
+            if pn is None:
+                out.append("{\\pntext \\u8226?\\tab}{\\*\\pn\\pnlvlblt\\pnindent0{\\pntxtb\\u8226?}}")
+            else:
+                n = lst.itemNumber(block) + 1
+                out.append(f"{{\\pntext {lst.itemText(block) or str(n) + '.'}\\tab}}"
+                           f"{{\\*\\pn{pn}\\pnstart1\\pnindent0{{\\pntxta.}}}}")
+        else:
+            if bf.leftMargin():
+                out.append(f"\\li{round(bf.leftMargin() * _TWIPS_PER_PX)}")
+            if bf.textIndent():
+                out.append(f"\\fi{round(bf.textIndent() * _TWIPS_PER_PX)}")
+        if not out[-1].endswith("}"):
+            out.append(" ")
+        for frag in frags:
+            fmt = frag.charFormat()
+            if fmt.isImageFormat():
+                img = fmt.toImageFormat()
+                found = _image_blip(doc, img.name())
+                if found is None:
+                    continue
+                blip, size, data = found
+                w = round((img.width() or size.width()) * _TWIPS_PER_PX)
+                h = round((img.height() or size.height()) * _TWIPS_PER_PX)
+                hexdata = data.hex()
+                lines = "\n".join(hexdata[i:i + 128] for i in range(0, len(hexdata), 128))
+                out.append(f"{{\\pict\\{blip}\\picw{size.width()}\\pich{size.height()}"
+                           f"\\picwgoal{w}\\pichgoal{h}\n{lines}}}")
+                continue
+            props = []
+            if fmt.fontWeight() > QFont.Normal:
+                props.append("\\b")
+            if fmt.fontItalic():
+                props.append("\\i")
+            if fmt.fontUnderline():
+                props.append("\\ul")
+            if fmt.fontStrikeOut():
+                props.append("\\strike")
+            va = fmt.verticalAlignment()
+            if va == QTextCharFormat.AlignSuperScript:
+                props.append("\\super")
+            elif va == QTextCharFormat.AlignSubScript:
+                props.append("\\sub")
+            fam = _family(fmt)
+            if fam and fonts.get(fam):
+                props.append(f"\\f{fonts[fam]}")
+            size = _point_size(fmt, base_size)
+            if size:
+                props.append(f"\\fs{round(size * 2)}")
+            if fmt.hasProperty(QTextFormat.ForegroundBrush) and fmt.foreground().style() != Qt.NoBrush:
+                props.append(f"\\cf{colors[fmt.foreground().color().name()]}")
+            if fmt.hasProperty(QTextFormat.BackgroundBrush) and fmt.background().style() != Qt.NoBrush:
+                props.append(f"\\cb{colors[fmt.background().color().name()]}")
+            text = _escape(frag.text())
+            if props:
+                out.append("{" + "".join(props) + " " + text + "}")
+            else:
+                out.append(text)
+        out.append("\\par\n")
+        yield "".join(out)
+    yield "}\n"
+
+
+def write_rtf(doc: QTextDocument, path: str):
+    """Write `doc` to `path` as RTF, streaming paragraphs to disk."""
+    tmp = f"{path}.tmp"
+    with open(tmp, "w", encoding="ascii", newline="\n") as f:
+        pending = []
+        size = 0
+        for piece in iter_rtf(doc):
+            pending.append(piece)
+            size += len(piece)
+            if size >= RTF_CHUNK:
+                f.write("".join(pending))
+                pending = []
+                size = 0
+        f.write("".join(pending))
+    os.replace(tmp, path)
@@ -0,0 +1,277 @@
+import os
+import queue
+import re
+import sqlite3
+import threading
+from datetime import datetime
+from html.parser import HTMLParser
+from typing import Callable, Dict, Iterable, List, Optional
+
+from .document_store import APP_DIR, DOCS_DIR, ensure_app_dirs
+from .doc_io import DOCUMENT_EXTS, is_html_path, read_index_text
+
+INDEX_DB = os.path.join(APP_DIR, "search.db")
+# Text beyond this many characters of a file is not indexed
+INDEX_READ_LIMIT = 8 * 1024 * 1024
+# Commit bulk re-indexing in batches so readers see progress
+_BATCH = 200
+
+
+class _TextExtractor(HTMLParser):
+    _SKIP = {"head", "style", "script", "title"}
+    _BREAK = {"p", "div", "br", "li", "tr", "h1", "h2", "h3", "h4", "h5", "h6"}
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.parts: List[str] = []
+        self._skip = 0
+
+    def handle_starttag(self, tag, attrs):
+        if tag in self._SKIP:
+            self._skip += 1
+        elif tag in self._BREAK:
+            self.parts.append("\n")
+
+    def handle_endtag(self, tag):
+        if tag in self._SKIP and self._skip:
+            self._skip -= 1
+
+    def handle_data(self, data):
+        if not self._skip:
+            self.parts.append(data)
+
+
+def extract_text(content: str, is_html: bool) -> str:
+    """Plain text of a document, without needing a QTextDocument."""
+    if not is_html:
+        return content
+    p = _TextExtractor()
+    try:
+        p.feed(content)
+        p.close()
+    except Exception:
+        pass
+    return "".join(p.parts)
+
+
+def _fts_query(text: str) -> str:
+    # Every word must match, the last one as a prefix so results follow typing
+    words = re.findall(r"\w+", text, re.UNICODE)
+    if not words:
+        return ""
+    terms = [f'"{w}"' for w in words[:-1]] + [f'"{words[-1]}"*']
+    return " AND ".join(terms)
+
+
+class SearchIndex:
+    """Full-text index of documents in a SQLite FTS5 table.
+
+    Writes happen on a single background thread; `search()` runs on the
+    caller's thread with its own connection (WAL mode lets both proceed).
+    Falls back to a LIKE scan when the SQLite build has no FTS5.
+    """
+
+    def __init__(self, db_path: str):
+        self.db_path = db_path
+        self._local = threading.local()
+        self._queue: "queue.Queue[Callable[[], None]]" = queue.Queue()
+        self._worker: Optional[threading.Thread] = None
+        self._start_lock = threading.Lock()
+        self.fts = self._init_schema()
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=10)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def _init_schema(self) -> bool:
+        conn = self._connect()
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS docs ("
+            " id INTEGER PRIMARY KEY, path TEXT UNIQUE NOT NULL, name TEXT,"
+            " size INTEGER, mtime INTEGER, ts TEXT, body TEXT)"
+        )
+        try:
+            conn.execute(
+                "CREATE VIRTUAL TABLE IF NOT EXISTS docs_fts USING fts5("
+                "name, body, tokenize='unicode61 remove_diacritics 2')"
+            )
+            fts = True
+        except sqlite3.OperationalError:
+            fts = False
+        conn.commit()
+        return fts
+
+    # -- background writer ------------------------------------------------
+
+    def _submit(self, fn: Callable[[], None]):
+        with self._start_lock:
+            if self._worker is None:
+                self._worker = threading.Thread(target=self._run, name="search-index", daemon=True)
+                self._worker.start()
+        self._queue.put(fn)
+
+    def _run(self):
+        while True:
+            fn = self._queue.get()
+            try:
+                fn()
+            except Exception:
+                pass
+            finally:
+                self._queue.task_done()
+
+    def wait(self):
+        """Block until every queued update has been written."""
+        self._queue.join()
+
+    # -- writes (run on the worker thread) --------------------------------
+
+    def _upsert(self, conn: sqlite3.Connection, path: str, text: str, st: os.stat_result):
+        name = os.path.basename(path)
+        ts = datetime.fromtimestamp(st.st_mtime).isoformat(timespec="minutes")
+        row = conn.execute("SELECT id FROM docs WHERE path = ?", (path,)).fetchone()
+        if row:
+            doc_id = row[0]
+            conn.execute(
+                "UPDATE docs SET name=?, size=?, mtime=?, ts=?, body=? WHERE id=?",
+                (name, st.st_size, st.st_mtime_ns, ts, None if self.fts else text, doc_id),
+            )
+            if self.fts:
+                conn.execute("DELETE FROM docs_fts WHERE rowid = ?", (doc_id,))
+        else:
+            cur = conn.execute(
+                "INSERT INTO docs(path, name, size, mtime, ts, body) VALUES (?, ?, ?, ?, ?, ?)",
+                (path, name, st.st_size, st.st_mtime_ns, ts, None if self.fts else text),
+            )
+            doc_id = cur.lastrowid
+        if self.fts:
+            conn.execute("INSERT INTO docs_fts(rowid, name, body) VALUES (?, ?, ?)", (doc_id, name, text))
+
+    def _index_now(self, conn: sqlite3.Connection, path: str, content: Optional[str], is_html: Optional[bool]):
+        try:
+            st = os.stat(path)
+        except OSError:
+            self._remove_now(conn, path)
+            return
+        if content is None:
+            content, is_html = read_index_text(path, INDEX_READ_LIMIT)
+        elif is_html is None:
+            is_html = is_html_path(path)
+        self._upsert(conn, path, extract_text(content, is_html), st)
+
+    def _remove_now(self, conn: sqlite3.Connection, path: str):
+        row = conn.execute("SELECT id FROM docs WHERE path = ?", (path,)).fetchone()
+        if row:
+            conn.execute("DELETE FROM docs WHERE id = ?", (row[0],))
+            if self.fts:
+                conn.execute("DELETE FROM docs_fts WHERE rowid = ?", (row[0],))
+
+    def update(self, path: str, content: Optional[str] = None, is_html: Optional[bool] = None):
+        """Queue (re)indexing of `path`; `content` avoids re-reading a file just written."""
+        path = os.path.abspath(path)
+
+        def job():
+            conn = self._connect()
+            self._index_now(conn, path, content, is_html)
+            conn.commit()
+        self._submit(job)
+
+    def remove(self, path: str):
+        path = os.path.abspath(path)
+
+        def job():
+            conn = self._connect()
+            self._remove_now(conn, path)
+            conn.commit()
+        self._submit(job)
+
+    def reindex_library(self, extra_paths: Iterable[str] = ()):
+        """Index new or changed files in DOCS_DIR plus `extra_paths`, drop vanished ones."""
+        extra = [os.path.abspath(p) for p in extra_paths if p]
+
+        def job():
+            conn = self._connect()
+            known = dict(conn.execute("SELECT path, mtime FROM docs"))
+            paths = set(extra)
+            try:
+                with os.scandir(DOCS_DIR) as it:
+                    for e in it:
+                        if e.is_file() and os.path.splitext(e.name)[1].lower() in DOCUMENT_EXTS:
+                            paths.add(os.path.abspath(e.path))
+            except OSError:
+                pass
+            n = 0
+            for path in paths:
+                try:
+                    mtime = os.stat(path).st_mtime_ns
+                except OSError:
+                    continue
+                if known.get(path) == mtime:
+                    continue
+                try:
+                    self._index_now(conn, path, None, None)
+                except OSError:
+                    continue
+                n += 1
+                if n % _BATCH == 0:
+                    conn.commit()
+            for path in known:
+                if path not in paths and not os.path.exists(path):
+                    self._remove_now(conn, path)
+            conn.commit()
+        self._submit(job)
+
+    # -- queries (run on the caller's thread) -----------------------------
+
+    def search(self, text: str, limit: int = 200) -> List[Dict]:
+        """Best matches first, as recents-style dicts (path, name, size, ts)."""
+        conn = self._connect()
+        if self.fts:
+            q = _fts_query(text)
+            if not q:
+                return []
+            # Matches in the name weigh ten times more than matches in the body
+            sql = (
+                "SELECT d.path, d.name, d.size, d.ts FROM docs_fts f JOIN docs d ON d.id = f.rowid"
+                " WHERE docs_fts MATCH ? ORDER BY bm25(docs_fts, 10.0, 1.0) LIMIT ?"
+            )
+            args = (q, limit)
+        else:
+            like = f"%{text.strip()}%"
+            sql = "SELECT path, name, size, ts FROM docs WHERE name LIKE ? OR body LIKE ? LIMIT ?"
+            args = (like, like, limit)
+        try:
+            rows = conn.execute(sql, args).fetchall()
+        except sqlite3.Error:
+            return []
+        return [{"path": p, "name": n, "size": s or 0, "ts": ts or ""} for p, n, s, ts in rows]
+
+
+_index: Optional[SearchIndex] = None
+_index_lock = threading.Lock()
+
+
+def search_index() -> SearchIndex:
+    global _index
+    with _index_lock:
+        if _index is None:
+            ensure_app_dirs()
+            _index = SearchIndex(INDEX_DB)
+        return _index
+
+
+def index_document(path: str, content: Optional[str] = None, is_html: Optional[bool] = None):
+    search_index().update(path, content, is_html)
+
+
+def remove_document(path: str):
+    search_index().remove(path)
+
+
+def search_documents(text: str, limit: int = 200) -> List[Dict]:
+    return search_index().search(text, limit)
@@ -0,0 +1,149 @@
+"""One WinPages process per user: later launches hand their files to it.
+
+    if forward_to_running_instance(paths):
+        return  # the running instance opens them
+    server = InstanceServer()
+    server.listen()
+    server.open_requested.connect(...)
+
+The first process listens on a local socket (a named pipe on Windows).
+A later launch sends it the absolute paths it was given as one JSON line
+and exits once the answer "ok" comes back; this needs only QtCore and
+QtNetwork, so it takes milliseconds instead of a full start.
+"""
+import getpass
+import hashlib
+import json
+import os
+from typing import List, Optional
+from PySide6.QtCore import QObject, Signal
+from PySide6.QtNetwork import QLocalServer, QLocalSocket
+
+from .document_store import APP_DIR
+
+# How long a later launch waits for the running instance before starting its own
+FORWARD_TIMEOUT_MS = 1000
+# Longest request accepted from a client
+MAX_REQUEST = 1024 * 1024
+
+
+def server_name() -> str:
+    """Socket name shared by the processes of one user and one app folder."""
+    try:
+        user = getpass.getuser()
+    except Exception:
+        user = ""
+    key = hashlib.blake2b(f"{user}\0{os.path.normcase(os.path.abspath(APP_DIR))}".encode("utf-8"), digest_size=8)
+    return f"winpages-{key.hexdigest()}"
+
+
+def _allow_foreground():
+    # Windows only lets the process that got the click raise a window;
+    # hand that right on so the running instance can bring its editor up
+    if os.name == 'nt':
+        try:
+            import ctypes
+            ctypes.windll.user32.AllowSetForegroundWindow(-1)  # ASFW_ANY
+        except Exception:
+            pass
+
+
+def forward_to_running_instance(paths: List[str], timeout_ms: int = FORWARD_TIMEOUT_MS) -> bool:
+    """Ask a running instance to open `paths` (or just to come to the front).
+
+    Returns False when no instance answered, and this process should start.
+    """
+    sock = QLocalSocket()
+    sock.connectToServer(server_name())
+    if not sock.waitForConnected(timeout_ms):
+        return False
+    _allow_foreground()
+    request = {"open": [os.path.abspath(p) for p in paths]}
+    sock.write((json.dumps(request, ensure_ascii=False) + "\n").encode("utf-8"))
+    if not sock.waitForBytesWritten(timeout_ms):
+        sock.abort()
+        return False
+    reply = b""
+    while not reply.endswith(b"\n") and sock.waitForReadyRead(timeout_ms):
+        reply += bytes(sock.readAll())
+    sock.disconnectFromServer()
+    return reply.strip() == b"ok"
+
+
+class InstanceServer(QObject):
+    """Receives the files of later launches.
+
+    `open_requested(paths)` is emitted on the GUI thread; an empty list
+    means a launch without files, i.e. show the app.
+    """
+    open_requested = Signal(list)
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self._server = QLocalServer(self)
+        self._server.setSocketOptions(QLocalServer.UserAccessOption)
+        self._server.newConnection.connect(self._on_connection)
+        self._buffers = {}
+
+    def listen(self) -> bool:
+        """Start serving; False when another instance got there first."""
+        name = server_name()
+        if self._server.listen(name):
+            return True
+        if self._server.serverError() != QLocalSocket.AddressInUseError:
+            return False
+        # Left behind by a process that crashed, unless someone answers on it
+        probe = QLocalSocket()
+        probe.connectToServer(name)
+        if probe.waitForConnected(200):
+            probe.abort()
+            return False
+        QLocalServer.removeServer(name)
+        return self._server.listen(name)
+
+    def is_listening(self) -> bool:
+        return self._server.isListening()
+
+    def close(self):
+        self._server.close()
+
+    def _on_connection(self):
+        while self._server.hasPendingConnections():
+            sock = self._server.nextPendingConnection()
+            self._buffers[sock] = b""
+            sock.readyRead.connect(lambda s=sock: self._on_ready_read(s))
+            sock.disconnected.connect(lambda s=sock: self._drop(s))
+
+    def _on_ready_read(self, sock: QLocalSocket):
+        data = self._buffers.get(sock, b"") + bytes(sock.readAll())
+        if b"\n" not in data:
+            if len(data) > MAX_REQUEST:
+                sock.abort()
+            else:
+                self._buffers[sock] = data
+            return
+        line = data.split(b"\n", 1)[0]
+        self._buffers[sock] = b""
+        paths = self._parse(line)
+        if paths is None:
+            sock.abort()
+            return
+        sock.write(b"ok\n")
+        sock.flush()
+        sock.disconnectFromServer()
+        self.open_requested.emit(paths)
+
+    @staticmethod
+    def _parse(line: bytes) -> Optional[List[str]]:
+        try:
+            request = json.loads(line.decode("utf-8"))
+        except ValueError:
+            return None
+        paths = request.get("open") if isinstance(request, dict) else None
+        if not isinstance(paths, list):
+            return None
+        return [p for p in paths if isinstance(p, str) and p]
+
+    def _drop(self, sock: QLocalSocket):
+        self._buffers.pop(sock, None)
+        sock.deleteLater()
@@ -0,0 +1,178 @@
+"""Cold-start profile: `python main.py --profile-startup [file]`.
+
+Times the phases of a start, from the process being created to the home
+screen showing its recents and thumbnails, and how long every module
+took to import in each phase. The report is printed (and written as
+JSON to `file`) and the app quits. Only the standard library is used
+here, so the profile can begin before Qt is imported.
+"""
+import builtins
+import importlib.util
+import json
+import os
+import sys
+import time
+from typing import Dict, List, Optional, Tuple
+
+# Modules listed in the report, slowest first
+REPORT_MODULES = 15
+
+
+def process_age() -> Optional[float]:
+    """Seconds since this process was created, if the platform tells."""
+    try:
+        if sys.platform.startswith("linux"):
+            with open("/proc/self/stat", "rb") as f:
+                start_ticks = int(f.read().rsplit(b")", 1)[1].split()[19])
+            with open("/proc/uptime", "rb") as f:
+                uptime = float(f.read().split()[0])
+            return max(0.0, uptime - start_ticks / os.sysconf("SC_CLK_TCK"))
+        if os.name == "nt":
+            import ctypes
+            from ctypes import wintypes
+            times = [wintypes.FILETIME() for _ in range(4)]
+            now = wintypes.FILETIME()
+            k32 = ctypes.windll.kernel32
+            if k32.GetProcessTimes(k32.GetCurrentProcess(), *[ctypes.byref(t) for t in times]):
+                k32.GetSystemTimeAsFileTime(ctypes.byref(now))
+                as_int = lambda ft: (ft.dwHighDateTime << 32) | ft.dwLowDateTime
+                return max(0.0, (as_int(now) - as_int(times[0])) / 1e7)
+    except Exception:
+        pass
+    return None
+
+
+class ImportTimer:
+    """Times first imports made through the import statement.
+
+    Every record is (module, start, inclusive seconds, exclusive seconds,
+    depth); depth 0 is an import made by code that was not itself being
+    imported, so those add up to the wall time spent importing.
+    """
+
+    def __init__(self):
+        self.records: List[Tuple[str, float, float, float, int]] = []
+        self._children: List[float] = []
+        self._original = None
+
+    def install(self):
+        if self._original is None:
+            # shiboken puts a C __import__ in place that crashes on top of a
+            # Python one, so it is loaded first (timed as one import) and the
+            # timer goes on top of it
+            if "shiboken6" not in sys.modules:
+                start = time.perf_counter()
+                import shiboken6  # noqa: F401
+                took = time.perf_counter() - start
+                self.records.append(("shiboken6", start, took, took, 0))
+            self._original = builtins.__import__
+            builtins.__import__ = self._import
+
+    def uninstall(self):
+        if self._original is not None:
+            builtins.__import__ = self._original
+            self._original = None
+
+    def _import(self, name, globals=None, locals=None, fromlist=(), level=0):
+        original = self._original or builtins.__import__
+        try:
+            package = (globals or {}).get("__package__") if level else None
+            full = importlib.util.resolve_name("." * level + name, package) if level else name
+        except (ImportError, ValueError):
+            full = name
+        if full in sys.modules:
+            # `from package import module` loads the submodules it names
+            module = sys.modules[full]
+            new = [f"{full}.{f}" for f in (fromlist or ())
+                   if f != "*" and not hasattr(module, f) and f"{full}.{f}" not in sys.modules]
+            if not new:
+                return original(name, globals, locals, fromlist, level)
+            full = ", ".join(new)
+        start = time.perf_counter()
+        depth = len(self._children)
+        self._children.append(0.0)
+        try:
+            return original(name, globals, locals, fromlist, level)
+        finally:
+            took = time.perf_counter() - start
+            inner = self._children.pop()
+            if self._children:
+                self._children[-1] += took
+            self.records.append((full, start, took, took - inner, depth))
+
+
+class StartupProfile:
+    """Phase marks and import times of one start."""
+
+    def __init__(self):
+        self.t0 = time.perf_counter()
+        self.age_at_start = process_age()
+        self.phases: List[Tuple[str, float]] = []
+        self.imports = ImportTimer()
+        self.imports.install()
+
+    def mark(self, phase: str):
+        """The phase that ends now."""
+        self.phases.append((phase, time.perf_counter()))
+
+    def finish(self):
+        self.imports.uninstall()
+
+    def report(self) -> Dict:
+        phases = []
+        # Times are from the process start when known, else from main.py
+        offset = (self.age_at_start or 0.0) * 1000
+        if self.age_at_start is not None:
+            phases.append({"phase": "interpreter and main.py", "took_ms": round(offset, 1),
+                           "at_ms": round(offset, 1), "import_ms": None})
+        prev = self.t0
+        for name, at in self.phases:
+            imported = sum(r[2] for r in self.imports.records if r[4] == 0 and prev <= r[1] < at)
+            phases.append({"phase": name, "took_ms": round((at - prev) * 1000, 1),
+                           "at_ms": round(offset + (at - self.t0) * 1000, 1),
+                           "import_ms": round(imported * 1000, 1)})
+            prev = at
+        marks = {p["phase"]: p["at_ms"] for p in phases}
+        slowest = sorted(self.imports.records, key=lambda r: r[3], reverse=True)[:REPORT_MODULES]
+        packages: Dict[str, float] = {}
+        for name, _, _, own, _ in self.imports.records:
+            top = name.split(".", 1)[0].split(",", 1)[0]
+            packages[top] = packages.get(top, 0.0) + own
+        return {
+            "time_to_first_paint_ms": marks.get("first paint"),
+            "time_to_populated_ms": marks.get("home populated"),
+            "phases": phases,
+            "import_total_ms": round(sum(r[2] for r in self.imports.records if r[4] == 0) * 1000, 1),
+            "imports_by_package_ms": {k: round(v * 1000, 1) for k, v in
+                                      sorted(packages.items(), key=lambda kv: kv[1], reverse=True)[:REPORT_MODULES]},
+            "slowest_modules_ms": [{"module": n, "self_ms": round(own * 1000, 1), "total_ms": round(took * 1000, 1)}
+                                   for n, _, took, own, _ in slowest],
+        }
+
+    @staticmethod
+    def format(report: Dict) -> str:
+        lines = [f"{'phase':<30}{'took ms':>10}{'imports':>10}{'at ms':>10}"]
+        for p in report["phases"]:
+            imported = "" if p["import_ms"] is None else f"{p['import_ms']:.1f}"
+            lines.append(f"{p['phase']:<30}{p['took_ms']:>10.1f}{imported:>10}{p['at_ms']:>10.1f}")
+        lines.append("")
+        lines.append(f"time to first paint {report['time_to_first_paint_ms']} ms, "
+                     f"home populated at {report['time_to_populated_ms']} ms, "
+                     f"imports {report['import_total_ms']} ms")
+        lines.append("")
+        lines.append("imports by package (ms): " + ", ".join(f"{k} {v}" for k, v in report["imports_by_package_ms"].items()))
+        lines.append(f"{'slowest modules':<52}{'self ms':>10}{'total ms':>10}")
+        for m in report["slowest_modules_ms"]:
+            lines.append(f"{m['module'][:51]:<52}{m['self_ms']:>10.1f}{m['total_ms']:>10.1f}")
+        return "\n".join(lines)
+
+    def write(self, path: Optional[str] = None) -> Dict:
+        """Stop timing, print the report to stderr and write it to `path` as JSON."""
+        self.finish()
+        report = self.report()
+        print(self.format(report), file=sys.stderr)
+        if path:
+            with open(path, "w", encoding="utf-8") as f:
+                json.dump(report, f, indent=2)
+                f.write("\n")
+        return report
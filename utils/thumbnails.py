@@ -1,61 +1,462 @@
+import atexit
+import hashlib
+import itertools
+import json
 import os
-from typing import Optional
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Iterable, Optional
 from PySide6.QtGui import QTextDocument, QImage, QPainter, QColor
-from PySide6.QtCore import QSize, QRectF, Qt
+from PySide6.QtCore import QSize, QRectF, Qt, QObject, QRunnable, QThread, QThreadPool, Signal
 
 from .document_store import APP_DIR
+from .progressive import split_html
+from .doc_io import document_kind, read_text
+from .images import THUMB_PROXY_SIDE, ImageDocument
+from .rtf import read_rtf
+from .wpg import is_wpg_path, read_wpg_html, read_wpg_thumbnail
+from .trace import add_bytes, file_written, traced
 
 THUMB_DIR = os.path.join(APP_DIR, "thumbs")
-os.makedirs(THUMB_DIR, exist_ok=True)
+THUMB_INDEX = os.path.join(THUMB_DIR, "index.json")
+# Disk budget for the PNG cache, override with WINPAGES_THUMB_CACHE_MB
+THUMB_CACHE_BUDGET = int(os.environ.get("WINPAGES_THUMB_CACHE_MB", "64")) * 1024 * 1024
+# Only the start of a document can show up on a thumbnail
+THUMB_SOURCE_LIMIT = 64 * 1024
+
+
+def _doc_key(doc_path: str) -> str:
+    norm = os.path.normcase(os.path.abspath(doc_path))
+    return hashlib.sha1(norm.encode("utf-8")).hexdigest()[:20]
+
+
+class ThumbnailCache:
+    """Index of rendered thumbnails, keyed by document path hash.
+
+    Each PNG name also carries the source mtime/size, so a changed document
+    simply misses. Entries are kept in LRU order and evicted once the total
+    size exceeds `budget` bytes.
+    """
+
+    def __init__(self, directory: str, budget: int):
+        self.directory = directory
+        self.budget = budget
+        self._index_path = os.path.join(directory, "index.json")
+        self._lock = threading.RLock()
+        self._entries: "OrderedDict[str, dict]" = OrderedDict()
+        self._dirty = False
+        self._load()
+
+    def _load(self):
+        try:
+            with open(self._index_path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            for e in sorted(data.get("entries", []), key=lambda e: e.get("used", 0)):
+                if os.path.exists(os.path.join(self.directory, e["file"])):
+                    self._entries[e["key"]] = e
+        except Exception:
+            pass
+        # Remove PNGs the index does not know about (including the old basename-keyed cache)
+        known = {e["file"] for e in self._entries.values()}
+        try:
+            for name in os.listdir(self.directory):
+                if name.endswith(".png") and name not in known:
+                    self._remove_file(name)
+        except OSError:
+            pass
+
+    def _save(self):
+        data = {"version": 1, "entries": list(self._entries.values())}
+        tmp = self._index_path + ".tmp"
+        try:
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump(data, f)
+            os.replace(tmp, self._index_path)
+            self._dirty = False
+        except OSError:
+            pass
+
+    def _remove_file(self, name: str):
+        try:
+            os.remove(os.path.join(self.directory, name))
+        except OSError:
+            pass
+
+    def path_for(self, doc_path: str, st: os.stat_result) -> str:
+        return os.path.join(self.directory, os.path.basename(thumbnail_file_for(doc_path, st)))
+
+    def lookup(self, doc_path: str, st: os.stat_result) -> Optional[str]:
+        key = _doc_key(doc_path)
+        with self._lock:
+            e = self._entries.get(key)
+            if not e or e["mtime"] != st.st_mtime_ns or e["size"] != st.st_size:
+                return None
+            out = os.path.join(self.directory, e["file"])
+            if not os.path.exists(out):
+                del self._entries[key]
+                self._dirty = True
+                return None
+            self._entries.move_to_end(key)
+            e["used"] = int(time.time())
+            self._dirty = True
+            return out
+
+    def store(self, doc_path: str, st: os.stat_result, out: str):
+        key = _doc_key(doc_path)
+        try:
+            nbytes = os.path.getsize(out)
+        except OSError:
+            return
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old and old["file"] != os.path.basename(out):
+                self._remove_file(old["file"])
+            self._entries[key] = {
+                "key": key,
+                "path": os.path.abspath(doc_path),
+                "file": os.path.basename(out),
+                "mtime": st.st_mtime_ns,
+                "size": st.st_size,
+                "bytes": nbytes,
+                "used": int(time.time()),
+            }
+            self._evict()
+            self._save()
+
+    def forget(self, doc_path: str):
+        with self._lock:
+            e = self._entries.pop(_doc_key(doc_path), None)
+            if e:
+                self._remove_file(e["file"])
+                self._save()
+
+    def retain(self, doc_paths: Iterable[str]):
+        """Drop entries for every document not in `doc_paths`."""
+        keep = {_doc_key(p) for p in doc_paths if p}
+        with self._lock:
+            gone = [k for k in self._entries if k not in keep]
+            for k in gone:
+                self._remove_file(self._entries.pop(k)["file"])
+            if gone or self._dirty:
+                self._save()
+
+    def set_budget(self, budget: int):
+        with self._lock:
+            self.budget = budget
+            self._evict()
+            self._save()
+
+    def total_bytes(self) -> int:
+        with self._lock:
+            return sum(e["bytes"] for e in self._entries.values())
+
+    def flush(self):
+        with self._lock:
+            if self._dirty:
+                self._save()
+
+    def _evict(self):
+        total = sum(e["bytes"] for e in self._entries.values())
+        # Never evict the most recent entry, even if it alone exceeds the budget
+        while total > self.budget and len(self._entries) > 1:
+            _, e = self._entries.popitem(last=False)
+            self._remove_file(e["file"])
+            total -= e["bytes"]
+
+
+_cache: Optional[ThumbnailCache] = None
+_cache_lock = threading.Lock()
+_dir_made = False
+
+
+def _ensure_thumb_dir():
+    global _dir_made
+    if not _dir_made:
+        os.makedirs(THUMB_DIR, exist_ok=True)
+        _dir_made = True
+
+
+def _thumb_cache() -> ThumbnailCache:
+    # Loaded on first use: processes that only render (the CLI workers) never
+    # load the index, and so never prune PNGs another process is registering
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _ensure_thumb_dir()
+            _cache = ThumbnailCache(THUMB_DIR, THUMB_CACHE_BUDGET)
+            atexit.register(_cache.flush)
+        return _cache
+
+
+def thumbnail_file_for(doc_path: str, st: os.stat_result) -> str:
+    """Cache file name for this version of `doc_path`, without touching the index."""
+    _ensure_thumb_dir()
+    return os.path.join(THUMB_DIR, f"{_doc_key(doc_path)}-{st.st_mtime_ns:x}-{st.st_size:x}.png")
 
 
 def thumb_path(doc_path: str) -> str:
-    base = os.path.basename(doc_path)
-    name, _ = os.path.splitext(base)
-    return os.path.join(THUMB_DIR, f"{name}.png")
+    """Cache file for the current version of `doc_path` (may not exist yet)."""
+    try:
+        return _thumb_cache().path_for(doc_path, os.stat(doc_path))
+    except OSError:
+        return os.path.join(THUMB_DIR, f"{_doc_key(doc_path)}.png")
 
 
-def ensure_thumbnail_for_content(content: str, is_html: bool, out_path: str) -> Optional[str]:
+def forget_thumbnail(doc_path: str):
+    _thumb_cache().forget(doc_path)
+
+
+def prune_thumbnails(keep_paths: Iterable[str]):
+    _thumb_cache().retain(keep_paths)
+
+
+def set_thumbnail_cache_budget(budget: int):
+    _thumb_cache().set_budget(budget)
+
+
+def thumbnail_cache_bytes() -> int:
+    return _thumb_cache().total_bytes()
+
+
+def cached_thumbnail(doc_path: str) -> Optional[str]:
     try:
-        w, h = 210, 270
-        img = QImage(w, h, QImage.Format_ARGB32)
-        img.fill(QColor(255, 255, 255))
+        return _thumb_cache().lookup(doc_path, os.stat(doc_path))
+    except OSError:
+        return None
+
+
+def register_thumbnail(doc_path: str, out: str):
+    """Add a PNG rendered by render_thumbnail_for_file() (possibly in another process) to the cache."""
+    try:
+        st = os.stat(doc_path)
+    except OSError:
+        return
+    if os.path.basename(out) == os.path.basename(thumbnail_file_for(doc_path, st)):
+        _thumb_cache().store(doc_path, st, out)
+
+
+def _leading_part(content: str, is_html: bool) -> str:
+    if len(content) <= THUMB_SOURCE_LIMIT:
+        return content
+    if not is_html:
+        return content[:THUMB_SOURCE_LIMIT]
+    prefix, _, chunks = split_html(content[:4 * THUMB_SOURCE_LIMIT], THUMB_SOURCE_LIMIT // 4)
+    return prefix + chunks[0] + "</body></html>"
+
+
+class _PreviewDocument(ImageDocument):
+    """Decodes images at thumbnail size, through the document the preview is taken from."""
 
-        doc = QTextDocument()
-        if is_html:
-            doc.setHtml(content)
+    def __init__(self, source: Optional[QTextDocument] = None):
+        super().__init__(max_side=THUMB_PROXY_SIDE)
+        self._source = None
+        if isinstance(source, ImageDocument):
+            self.share_images(source)
         else:
-            doc.setPlainText(content)
-        doc.setTextWidth(160)
+            self._source = source
 
-        p = QPainter(img)
-        p.setRenderHint(QPainter.Antialiasing)
-        # draw page shadow-ish border
-        p.fillRect(10, 10, 190, 250, QColor(245, 246, 248))
-        p.setPen(QColor(220, 220, 225))
-        p.drawRect(10, 10, 190, 250)
+    def loadResource(self, type, name):
+        if self._source is not None:
+            res = self._source.resource(type, name)
+            if res is not None:
+                return res
+        return super().loadResource(type, name)
 
-        p.translate(20, 20)
-        doc.drawContents(p, QRectF(0, 0, 170, 230))
-        p.end()
 
-        img.save(out_path)
+def _paint_thumbnail(doc: QTextDocument) -> QImage:
+    w, h = 210, 270
+    img = QImage(w, h, QImage.Format_ARGB32)
+    img.fill(QColor(255, 255, 255))
+    doc.setTextWidth(160)
+
+    p = QPainter(img)
+    p.setRenderHint(QPainter.Antialiasing)
+    # draw page shadow-ish border
+    p.fillRect(10, 10, 190, 250, QColor(245, 246, 248))
+    p.setPen(QColor(220, 220, 225))
+    p.drawRect(10, 10, 190, 250)
+
+    p.translate(20, 20)
+    doc.drawContents(p, QRectF(0, 0, 170, 230))
+    p.end()
+    return img
+
+
+def render_thumbnail_image(content: str, is_html: bool, source: Optional[QTextDocument] = None) -> QImage:
+    """Paint the first page of `content` onto a card-sized image."""
+    content = _leading_part(content, is_html)
+    doc = _PreviewDocument(source)
+    if is_html:
+        doc.setHtml(content)
+    else:
+        doc.setPlainText(content)
+    return _paint_thumbnail(doc)
+
+
+@traced("ensure_thumbnail_for_content")
+def ensure_thumbnail_for_content(content: str, is_html: bool, out_path: str) -> Optional[str]:
+    try:
+        img = render_thumbnail_image(content, is_html)
+        if not img.save(out_path):
+            return None
+        file_written(out_path)
+        return out_path
+    except Exception:
+        return None
+
+
+def _render_file(path: str, out_path: str) -> Optional[str]:
+    if is_wpg_path(path):
+        # The container carries its own preview; copying it out needs no layout
+        png = read_wpg_thumbnail(path)
+        if png:
+            with open(out_path, "wb") as f:
+                f.write(png)
+            add_bytes(read=len(png), written=len(png), path=path)
+            return out_path
+        return ensure_thumbnail_for_content(read_wpg_html(path), True, out_path)
+    kind = document_kind(path)
+    if kind == "rtf":
+        doc = _PreviewDocument()
+        read_rtf(path, doc, 4 * THUMB_SOURCE_LIMIT)
+        if not _paint_thumbnail(doc).save(out_path):
+            return None
+        file_written(out_path)
         return out_path
+    return ensure_thumbnail_for_content(read_text(path, 4 * THUMB_SOURCE_LIMIT), kind == "html", out_path)
+
+
+@traced("update_thumbnail_for_content")
+def update_thumbnail_for_content(path: str, content: str, is_html: bool) -> Optional[str]:
+    """Render `content` as the thumbnail of the just-written file at `path`."""
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    cache = _thumb_cache()
+    out = ensure_thumbnail_for_content(content, is_html, cache.path_for(path, st))
+    if out:
+        cache.store(path, st, out)
+    return out
+
+
+@traced("render_thumbnail_for_file")
+def render_thumbnail_for_file(path: str) -> Optional[str]:
+    """Render the cache PNG for `path` without registering it in the index."""
+    try:
+        return _render_file(path, thumbnail_file_for(path, os.stat(path)))
     except Exception:
         return None
 
 
+@traced("ensure_thumbnail_for_file")
 def ensure_thumbnail_for_file(path: str) -> Optional[str]:
     try:
-        if not os.path.exists(path):
-            return None
-        out = thumb_path(path)
-        # Rebuild if missing or older than source
-        if os.path.exists(out) and os.path.getmtime(out) >= os.path.getmtime(path):
+        st = os.stat(path)
+    except OSError:
+        return None
+    try:
+        cache = _thumb_cache()
+        out = cache.lookup(path, st)
+        if out:
             return out
-        with open(path, "r", encoding="utf-8", errors="ignore") as f:
-            data = f.read()
-        is_html = os.path.splitext(path)[1].lower() in (".html", ".htm", ".rtf")
-        return ensure_thumbnail_for_content(data, is_html, out)
+        out = _render_file(path, cache.path_for(path, st))
+        if out:
+            cache.store(path, st, out)
+        return out
     except Exception:
         return None
+
+
+class _ThumbnailJob(QRunnable):
+    def __init__(self, loader: "ThumbnailLoader", path: str, ticket: int):
+        super().__init__()
+        self._loader = loader
+        self._path = path
+        self._ticket = ticket
+
+    def run(self):
+        try:
+            # A request dropped by cancel() or discard() is stale; skip the expensive render
+            if self._loader._pending.get(self._path) != self._ticket:
+                self._loader._job_done(self._path, None, self._ticket)
+                return
+            out = ensure_thumbnail_for_file(self._path)
+            self._loader._job_done(self._path, out, self._ticket)
+        except RuntimeError:
+            # The loader was deleted (application quitting) while rendering
+            pass
+
+
+class ThumbnailLoader(QObject):
+    """Renders thumbnails on a private thread pool.
+
+    `thumbnail_ready(doc_path, thumb_path)` is delivered on the GUI thread;
+    QPixmaps must only be built there, the workers only produce PNG files.
+    """
+    thumbnail_ready = Signal(str, str)
+    _delivered = Signal(str, str, int)
+
+    def __init__(self, parent=None, max_threads: int | None = None):
+        super().__init__(parent)
+        self._pool = QThreadPool(self)
+        if max_threads is None:
+            max_threads = max(1, min(4, QThread.idealThreadCount() - 1))
+        self._pool.setMaxThreadCount(max_threads)
+        # Outstanding requests: path -> ticket of the job serving it
+        self._pending: Dict[str, int] = {}
+        self._tickets = itertools.count(1)
+        self._delivered.connect(self._on_delivered, Qt.QueuedConnection)
+
+    def request(self, path: str, priority: int = 0):
+        if not path or path in self._pending:
+            return
+        ticket = self._pending[path] = next(self._tickets)
+        self._pool.start(_ThumbnailJob(self, path, ticket), priority)
+
+    def cancel(self):
+        """Drop queued jobs; running jobs finish but their results are discarded."""
+        self._pool.clear()
+        self._pending.clear()
+
+    def discard(self, paths):
+        """Like cancel(), for the requests of `paths` only; others stay queued."""
+        for p in paths:
+            self._pending.pop(p, None)
+
+    def reprioritize(self, paths):
+        """Cancel everything queued and re-queue `paths`, first item first."""
+        self.cancel()
+        n = len(paths)
+        for i, p in enumerate(paths):
+            self.request(p, n - i)
+
+    def wait(self, msecs: int = -1) -> bool:
+        return self._pool.waitForDone(msecs)
+
+    def is_idle(self) -> bool:
+        """No thumbnail requested since the last cancel() is still outstanding."""
+        return not self._pending
+
+    def _job_done(self, path: str, out: Optional[str], ticket: int):
+        # Called from a worker thread
+        self._delivered.emit(path, out or "", ticket)
+
+    def _on_delivered(self, path: str, out: str, ticket: int):
+        if self._pending.get(path) != ticket:
+            return
+        del self._pending[path]
+        if out:
+            self.thumbnail_ready.emit(path, out)
+
+
+_loader: Optional[ThumbnailLoader] = None
+
+
+def thumbnail_loader() -> ThumbnailLoader:
+    """Process-wide loader shared by the home screen and editors."""
+    global _loader
+    if _loader is None:
+        _loader = ThumbnailLoader()
+    return _loader
@@ -0,0 +1,291 @@
+"""Opt-in tracing of the hot paths into a Chrome trace file.
+
+Enabled with `python main.py --trace [file]` or WINPAGES_TRACE=<file>
+(WINPAGES_TRACE=1 writes to ~/.winpages/traces/). Open the file in
+chrome://tracing or https://ui.perfetto.dev. While tracing is off,
+traced functions cost one extra call and span() is a no-op.
+
+Spans record their duration and the bytes read and written inside them;
+the event-loop probe records every turn the GUI thread was late by more
+than STALL_THRESHOLD_MS. Events are streamed to the file as they come,
+so a trace is readable even when the app crashed.
+"""
+import atexit
+import functools
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager, nullcontext
+from datetime import datetime
+from typing import Dict, List, Optional
+from PySide6.QtCore import QObject, QTimer, Qt
+
+TRACE_ENV = "WINPAGES_TRACE"
+# The GUI thread is expected to come back to the event loop this often
+STALL_PROBE_MS = 20
+# Lateness of the probe above this is recorded as a stall
+STALL_THRESHOLD_MS = 50
+# Buffered events are written out at this count, and at least once a second
+FLUSH_EVENTS = 512
+
+
+class SpanStats:
+    __slots__ = ("count", "total_ms", "last_ms", "max_ms", "updated")
+
+    def __init__(self):
+        self.count = 0
+        self.total_ms = 0.0
+        self.last_ms = 0.0
+        self.max_ms = 0.0
+        self.updated = 0.0
+
+    def add(self, ms: float, now: float):
+        self.count += 1
+        self.total_ms += ms
+        self.last_ms = ms
+        self.max_ms = max(self.max_ms, ms)
+        self.updated = now
+
+
+class Tracer:
+    """Writes trace events of all threads to `path` and keeps running totals."""
+
+    def __init__(self, path: str):
+        self.path = path
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._file = open(path, "w", encoding="utf-8")
+        self._file.write("[\n")
+        self._first = True
+        self._lock = threading.Lock()
+        self._buffer: List[str] = []
+        self._threads = set()
+        self._tracks: Dict[str, int] = {}
+        self._local = threading.local()
+        self._t0 = time.perf_counter()
+        self._pid = os.getpid()
+        self.stats: Dict[str, SpanStats] = {}
+        self.bytes_read = 0
+        self.bytes_written = 0
+        self.stalls = SpanStats()
+        self._emit({"name": "process_name", "ph": "M", "pid": self._pid, "tid": 0, "args": {"name": "WinPages"}})
+
+    def _us(self, t: float) -> float:
+        return round((t - self._t0) * 1e6, 1)
+
+    def _emit(self, event: Dict):
+        line = json.dumps(event, ensure_ascii=False)
+        with self._lock:
+            self._buffer.append(line)
+            if len(self._buffer) >= FLUSH_EVENTS:
+                self._write_buffer()
+
+    def _tid(self) -> int:
+        tid = threading.get_ident()
+        if tid not in self._threads:
+            self._threads.add(tid)
+            self._emit({"name": "thread_name", "ph": "M", "pid": self._pid, "tid": tid,
+                        "args": {"name": threading.current_thread().name}})
+        return tid
+
+    def _track(self, track: str) -> int:
+        # Spans that outlive the calls around them get a row of their own
+        with self._lock:
+            tid = self._tracks.get(track)
+            if tid is None:
+                tid = self._tracks[track] = -1 - len(self._tracks)
+        if tid not in self._threads:
+            self._threads.add(tid)
+            self._emit({"name": "thread_name", "ph": "M", "pid": self._pid, "tid": tid, "args": {"name": track}})
+        return tid
+
+    def _write_buffer(self):
+        if not self._buffer or self._file is None:
+            return
+        text = ",\n".join(self._buffer)
+        self._file.write(text if self._first else ",\n" + text)
+        self._file.flush()
+        self._first = False
+        self._buffer.clear()
+
+    def complete(self, name: str, start: float, end: float, args: Optional[Dict] = None,
+                 cat: str = "app", track: Optional[str] = None):
+        """Record a finished span from perf_counter() times `start` to `end`.
+
+        It goes on the calling thread's row, or on the row named `track`.
+        """
+        tid = self._track(track) if track else self._tid()
+        event = {"name": name, "cat": cat, "ph": "X", "pid": self._pid, "tid": tid,
+                 "ts": self._us(start), "dur": round((end - start) * 1e6, 1)}
+        if args:
+            event["args"] = args
+        self._emit(event)
+        stats = self.stalls if cat == "stall" else None
+        with self._lock:
+            if stats is None:
+                stats = self.stats.get(name)
+                if stats is None:
+                    stats = self.stats[name] = SpanStats()
+            stats.add((end - start) * 1000, end)
+
+    @contextmanager
+    def span(self, name: str, **args):
+        stack = getattr(self._local, "stack", None)
+        if stack is None:
+            stack = self._local.stack = []
+        stack.append(args)
+        start = time.perf_counter()
+        try:
+            yield args
+        finally:
+            end = time.perf_counter()
+            stack.pop()
+            self.complete(name, start, end, args)
+
+    def add_bytes(self, read: int = 0, written: int = 0, path: Optional[str] = None):
+        """Count I/O, also in the arguments of the spans open on this thread."""
+        with self._lock:
+            self.bytes_read += read
+            self.bytes_written += written
+        for args in getattr(self._local, "stack", ()):
+            if read:
+                args["bytes_read"] = args.get("bytes_read", 0) + read
+            if written:
+                args["bytes_written"] = args.get("bytes_written", 0) + written
+            if path:
+                args.setdefault("file", os.path.basename(path))
+
+    def counters(self):
+        """Record the I/O totals as a counter track."""
+        self._emit({"name": "io", "ph": "C", "pid": self._pid, "tid": 0, "ts": self._us(time.perf_counter()),
+                    "args": {"bytes_read": self.bytes_read, "bytes_written": self.bytes_written}})
+
+    def snapshot(self) -> Dict:
+        """Copy of the running totals, spans most recently finished first."""
+        with self._lock:
+            spans = sorted(self.stats.items(), key=lambda kv: kv[1].updated, reverse=True)
+            return {
+                "spans": [(name, s.count, s.last_ms, s.total_ms / s.count, s.max_ms) for name, s in spans],
+                "stalls": (self.stalls.count, self.stalls.last_ms, self.stalls.max_ms),
+                "bytes_read": self.bytes_read,
+                "bytes_written": self.bytes_written,
+            }
+
+    def flush(self):
+        with self._lock:
+            self._write_buffer()
+
+    def close(self):
+        self.counters()
+        with self._lock:
+            self._write_buffer()
+            if self._file is not None:
+                self._file.write("\n]\n")
+                self._file.close()
+                self._file = None
+
+
+_tracer: Optional[Tracer] = None
+
+
+def tracer() -> Optional[Tracer]:
+    """The active tracer, or None while tracing is off."""
+    return _tracer
+
+
+def enabled() -> bool:
+    return _tracer is not None
+
+
+def trace_path(option: Optional[str] = None) -> Optional[str]:
+    """The trace file asked for by a --trace option or else by WINPAGES_TRACE, if any.
+
+    "1" (a bare --trace) stands for a new file in ~/.winpages/traces/.
+    """
+    path = option or os.environ.get(TRACE_ENV, "").strip() or None
+    if path in ("1", "true", "yes", "on"):
+        from .document_store import APP_DIR
+        path = os.path.join(APP_DIR, "traces", f"trace-{datetime.now():%Y%m%d-%H%M%S}-{os.getpid()}.json")
+    return path
+
+
+def enable(path: str) -> Tracer:
+    """Start tracing to `path`; the file is completed when the process exits."""
+    global _tracer
+    if _tracer is None:
+        _tracer = Tracer(path)
+        atexit.register(_tracer.close)
+    return _tracer
+
+
+def span(name: str, **args):
+    """Context manager timing the block as `name` while tracing, else a no-op."""
+    t = _tracer
+    return nullcontext(args) if t is None else t.span(name, **args)
+
+
+def traced(name: Optional[str] = None):
+    """Decorator recording every call of the function as a span."""
+    def wrap(fn):
+        label = name or fn.__qualname__
+
+        @functools.wraps(fn)
+        def inner(*args, **kwargs):
+            t = _tracer
+            if t is None:
+                return fn(*args, **kwargs)
+            with t.span(label):
+                return fn(*args, **kwargs)
+        return inner
+    return wrap
+
+
+def add_bytes(read: int = 0, written: int = 0, path: Optional[str] = None):
+    t = _tracer
+    if t is not None:
+        t.add_bytes(read, written, path)
+
+
+def file_read(path: str):
+    """Count the size of the file at `path` as read, while tracing."""
+    if _tracer is not None:
+        try:
+            _tracer.add_bytes(read=os.path.getsize(path), path=path)
+        except OSError:
+            pass
+
+
+def file_written(path: str):
+    """Count the size of the file at `path` as written, while tracing."""
+    if _tracer is not None:
+        try:
+            _tracer.add_bytes(written=os.path.getsize(path), path=path)
+        except OSError:
+            pass
+
+
+class StallProbe(QObject):
+    """Records the turns of this thread's event loop that came late."""
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self._last = time.perf_counter()
+        self._flushed = self._last
+        self._timer = QTimer(self)
+        self._timer.setTimerType(Qt.PreciseTimer)
+        self._timer.setInterval(STALL_PROBE_MS)
+        self._timer.timeout.connect(self._tick)
+        self._timer.start()
+
+    def _tick(self):
+        now = time.perf_counter()
+        t = _tracer
+        if t is not None:
+            due = self._last + STALL_PROBE_MS / 1000.0
+            if (now - due) * 1000 > STALL_THRESHOLD_MS:
+                t.complete("event loop stall", due, now, {"late_ms": round((now - due) * 1000, 1)}, cat="stall")
+            if now - self._flushed >= 1.0:
+                self._flushed = now
+                t.counters()
+                t.flush()
+        self._last = now
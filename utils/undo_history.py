@@ -0,0 +1,484 @@
+"""Undo history for an editor, bounded by memory rather than by steps.
+
+QTextDocument keeps every edit of a session on its undo stack, together
+with all the text it ever held, so a day of editing only grows. An
+UndoHistory on the editor keeps that in check:
+
+- the document's own stack (which already merges a run of typing into
+  one step) is measured as edits come in and cleared once it is
+  estimated past `budget` bytes;
+- at pauses in typing the document is checkpointed as zlib-compressed
+  HTML, so undo goes on past a cleared stack one checkpoint at a time;
+  the state a document was loaded in is checkpointed only at its first
+  edit, so opening one serializes nothing;
+- checkpoints past `memory` bytes are spilled to a file (oldest first)
+  or, without spilling, dropped.
+
+Undo and redo keys go to the document while it has steps of its own and
+to the checkpoints after that (the view passes them to handle_key()).
+"""
+import os
+import time
+import zlib
+from contextlib import contextmanager
+from typing import List, Optional
+from PySide6.QtCore import QObject, QTimer
+from PySide6.QtGui import QKeySequence, QTextCursor
+
+from .document_store import APP_DIR, ensure_app_dirs
+from .trace import traced
+
+# Memory the document's own undo stack may take, override with WINPAGES_UNDO_MEMORY_MB
+UNDO_MEMORY_BUDGET = int(os.environ.get("WINPAGES_UNDO_MEMORY_MB", "8")) * 1024 * 1024
+# Compressed checkpoints kept in memory; older ones go to the spill file
+CHECKPOINT_MEMORY = 2 * 1024 * 1024
+# WINPAGES_UNDO_SPILL=0 drops old checkpoints instead of writing them to disk
+UNDO_SPILL = os.environ.get("WINPAGES_UNDO_SPILL", "1") != "0"
+# Largest spill file. When it is full, the space of released checkpoints
+# is reclaimed; only if the live ones alone fill it are the oldest dropped,
+# down to UNDO_SPILL_REFILL of it so the file is not compacted at every step
+UNDO_SPILL_MAX = 256 * 1024 * 1024
+UNDO_SPILL_REFILL = 0.75
+UNDO_DIR = os.path.join(APP_DIR, "undo")
+# Spill files left by a crashed session are removed after this long
+UNDO_SPILL_MAX_AGE_S = 24 * 3600
+# Checkpoints per `budget` of edits, i.e. how fine undo is past the document's stack
+CHECKPOINTS_PER_BUDGET = 16
+# A pause in typing this long is when a checkpoint is taken
+CHECKPOINT_IDLE_MS = 1500
+# Measured cost of an undo step, and of each character inserted: the document
+# keeps all text it was ever given, UTF-16, for undo
+BYTES_PER_COMMAND = 90
+BYTES_PER_INSERTED_CHAR = 2
+
+
+class Checkpoint:
+    """One compressed document state, in memory or at `offset` in the spill file."""
+    __slots__ = ("data", "offset", "length", "cursor", "depth")
+
+    def __init__(self, data: bytes, cursor: int, depth: int):
+        self.data: Optional[bytes] = data
+        self.offset = -1
+        self.length = len(data)
+        self.cursor = cursor
+        # Undo steps the document had when it was taken
+        self.depth = depth
+
+    def available(self) -> bool:
+        return self.data is not None or self.offset >= 0
+
+
+class CheckpointStore:
+    """Checkpoints in memory up to `memory` bytes, then in a spill file, oldest first.
+
+    The spill file grows up to `spill_max` bytes; then the checkpoints still
+    kept are moved to its front, over those released meanwhile.
+    """
+
+    def __init__(self, memory: int = CHECKPOINT_MEMORY, spill: bool = UNDO_SPILL,
+                 spill_max: int = UNDO_SPILL_MAX):
+        self.memory = memory
+        self.spill = spill
+        self.spill_max = spill_max
+        self._resident: List[Checkpoint] = []
+        self._bytes = 0
+        self._file = None
+        self._path: Optional[str] = None
+        self._end = 0
+        # Checkpoints in the spill file in file order, and their size
+        self._spilled: List[Checkpoint] = []
+        self._spilled_bytes = 0
+
+    def add(self, html: str, cursor: int, depth: int) -> Checkpoint:
+        cp = Checkpoint(zlib.compress(html.encode("utf-8"), 6), cursor, depth)
+        self._resident.append(cp)
+        self._bytes += cp.length
+        while self._bytes > self.memory and len(self._resident) > 1:
+            self._evict(self._resident[0])
+        return cp
+
+    def read(self, cp: Checkpoint) -> str:
+        data = cp.data
+        if data is None:
+            if cp.offset < 0:
+                raise ValueError("This undo step is no longer kept.")
+            self._file.seek(cp.offset)
+            data = self._file.read(cp.length)
+        return zlib.decompress(data).decode("utf-8")
+
+    def release(self, cp: Checkpoint):
+        """Forget `cp`; its space in the spill file is reused once the file is full."""
+        if cp.data is not None:
+            self._resident.remove(cp)
+            self._bytes -= cp.length
+            cp.data = None
+        if cp.offset >= 0:
+            self._spilled.remove(cp)
+            self._spilled_bytes -= cp.length
+        cp.offset = -1
+
+    def spill_all(self):
+        while self._resident:
+            self._evict(self._resident[0])
+
+    def bytes_in_memory(self) -> int:
+        return self._bytes
+
+    def reset(self):
+        for cp in self._resident:
+            cp.data = None
+        self._resident = []
+        self._bytes = 0
+        for cp in self._spilled:
+            cp.offset = -1
+        self._spilled = []
+        self._spilled_bytes = 0
+        if self._file is not None:
+            self._file.seek(0)
+            self._file.truncate()
+            self._end = 0
+
+    def close(self):
+        self.reset()
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+            try:
+                os.remove(self._path)
+            except OSError:
+                pass
+
+    def _evict(self, cp: Checkpoint):
+        self._resident.remove(cp)
+        self._bytes -= cp.length
+        if self.spill and self._open() and self._room_for(cp.length):
+            try:
+                self._file.seek(self._end)
+                self._file.write(cp.data)
+                self._file.flush()
+                cp.offset = self._end
+                self._end += cp.length
+                self._spilled.append(cp)
+                self._spilled_bytes += cp.length
+            except OSError:
+                cp.offset = -1
+        cp.data = None
+
+    def _room_for(self, n: int) -> bool:
+        if self._end + n <= self.spill_max:
+            return True
+        # The oldest go only if the ones kept would still fill the file
+        target = int(self.spill_max * UNDO_SPILL_REFILL)
+        while self._spilled and self._spilled_bytes + n > target:
+            old = self._spilled.pop(0)
+            self._spilled_bytes -= old.length
+            old.offset = -1
+        self._compact()
+        return self._end + n <= self.spill_max
+
+    @traced("CheckpointStore._compact")
+    def _compact(self):
+        """Move the spilled checkpoints to the front of the file, in order."""
+        end = 0
+        try:
+            # Each moves towards the start, never over one not moved yet
+            for cp in self._spilled:
+                if cp.offset != end:
+                    self._file.seek(cp.offset)
+                    data = self._file.read(cp.length)
+                    self._file.seek(end)
+                    self._file.write(data)
+                    cp.offset = end
+                end += cp.length
+            self._file.truncate(end)
+            self._file.flush()
+        except OSError:
+            # Half moved: none of them can be trusted any more
+            for cp in self._spilled:
+                cp.offset = -1
+            self._spilled = []
+            self._spilled_bytes = 0
+            end = 0
+        self._end = end
+
+    def _open(self) -> bool:
+        if self._file is None:
+            try:
+                ensure_app_dirs()
+                os.makedirs(UNDO_DIR, exist_ok=True)
+                _prune_undo_dir()
+                self._path = os.path.join(UNDO_DIR, f"{os.getpid()}-{id(self):x}-{time.time_ns():x}.undo")
+                self._file = open(self._path, "w+b")
+            except OSError:
+                self.spill = False
+                return False
+        return True
+
+
+class UndoHistory(QObject):
+    """Bounded undo for the QTextEdit `view`; see the module docstring.
+
+    Call reset() whenever the document is loaded anew, and wrap
+    programmatic replacements that should stay undoable in replacing().
+    """
+
+    def __init__(self, view, budget: int = UNDO_MEMORY_BUDGET, store: Optional[CheckpointStore] = None,
+                 parent=None):
+        super().__init__(parent)
+        self._view = view
+        self._doc = view.document()
+        self.budget = budget
+        self.store = store if store is not None else CheckpointStore()
+        # Oldest first; the last is the state the document's own stack starts from
+        self._deep: List[Checkpoint] = []
+        # Taken since the stack was last cleared, later than _deep[-1]
+        self._pending: List[Checkpoint] = []
+        # States undone past the document's stack, next one last
+        self._redo: List[Checkpoint] = []
+        self._native_bytes = 0
+        self._since_checkpoint = 0
+        # The document's undo steps when last counted
+        self._depth = 0
+        self._suspended = False
+        self._loading = False
+        self._compact_queued = False
+        # The state undo stops at is still to be checkpointed (see _take_base())
+        self._need_base = False
+        self._base_queued = False
+        self._idle = QTimer(self)
+        self._idle.setSingleShot(True)
+        self._idle.setInterval(CHECKPOINT_IDLE_MS)
+        self._idle.timeout.connect(self._on_idle)
+        self._doc.contentsChange.connect(self._on_change)
+        self._doc.undoCommandAdded.connect(self._on_command)
+
+    def checkpoint_every(self) -> int:
+        return max(1, self.budget // CHECKPOINTS_PER_BUDGET)
+
+    def reset(self):
+        """Forget all history; the document as it is now is where undo stops."""
+        self._idle.stop()
+        self.store.reset()
+        self._deep, self._pending, self._redo = [], [], []
+        self._doc.clearUndoRedoStacks()
+        self._native_bytes = self._since_checkpoint = self._depth = 0
+        # Not now: reset() comes with every open, and most documents are only read
+        self._need_base = True
+
+    def bytes_in_memory(self) -> int:
+        """Estimated memory of the document's undo stack and the checkpoints held in memory."""
+        return self._native_bytes + self.store.bytes_in_memory()
+
+    def can_undo(self) -> bool:
+        return self._doc.isUndoAvailable() or (len(self._deep) >= 2 and self._deep[-2].available())
+
+    def can_redo(self) -> bool:
+        return self._doc.isRedoAvailable() or bool(self._redo)
+
+    def undo(self):
+        if self._doc.isUndoAvailable():
+            self._doc.undo()
+        elif self.can_undo():
+            # The document is at _deep[-1]; what came after it becomes redoable
+            current = self._deep.pop()
+            if self._load(self._deep[-1]):
+                self._redo.extend(reversed(self._pending))
+                self._redo.append(current)
+                self._pending = []
+            else:
+                self._deep.append(current)
+
+    def redo(self):
+        if self._doc.isRedoAvailable():
+            self._doc.redo()
+        elif self._redo:
+            cp = self._redo[-1]
+            if self._load(cp):
+                self._redo.pop()
+                self._deep.append(cp)
+
+    @traced("UndoHistory.compact")
+    def compact(self):
+        """Checkpoint the document and clear its own undo stack."""
+        self._compact_queued = False
+        self._idle.stop()
+        self._take_base()
+        if self._since_checkpoint or not self._pending:
+            self._pending.append(self._take())
+        self._deep.extend(self._pending)
+        self._pending = []
+        self._doc.clearUndoRedoStacks()
+        # Whatever came before is out of reach of the document's stack now
+        self._need_base = False
+        self._native_bytes = self._since_checkpoint = self._depth = 0
+        self._prune()
+
+    @contextmanager
+    def replacing(self):
+        """Replace the document's content inside this block; undo brings the old content back."""
+        self.compact()
+        self._loading = True
+        try:
+            yield
+        finally:
+            self._loading = False
+        self._drop(self._redo)
+        self._redo = []
+        self._doc.clearUndoRedoStacks()
+        self._depth = 0
+        self._deep.append(self._take())
+
+    def suspend(self):
+        """Before the document is cleared to free memory: history goes to disk and stays valid."""
+        self.compact()
+        self.store.spill_all()
+        self._suspended = True
+
+    def resume(self):
+        """After the document suspended with suspend() has been loaded back as it was."""
+        self._suspended = False
+        self._doc.clearUndoRedoStacks()
+        self._native_bytes = self._since_checkpoint = self._depth = 0
+
+    def close(self):
+        self._idle.stop()
+        self._need_base = False
+        self._deep, self._pending, self._redo = [], [], []
+        self.store.close()
+
+    def handle_key(self, e) -> bool:
+        """Undo or redo for key event `e` past the document's own stack; True when handled."""
+        if self._view.isReadOnly():
+            return False
+        if e.matches(QKeySequence.Undo) and not self._doc.isUndoAvailable() and self.can_undo():
+            self.undo()
+            return True
+        if e.matches(QKeySequence.Redo) and not self._doc.isRedoAvailable() and self._redo:
+            self.redo()
+            return True
+        return False
+
+    def _ignored(self) -> bool:
+        # Read-only while a document streams in or a page-view export runs
+        return self._suspended or self._loading or self._view.isReadOnly()
+
+    def _on_change(self, position: int, removed: int, added: int):
+        # Undoing (redo then available) takes no more memory
+        if self._ignored() or self._doc.isRedoAvailable():
+            return
+        # A format change reports its range as removed and added again
+        cost = max(0, added - removed) * BYTES_PER_INSERTED_CHAR
+        self._native_bytes += cost
+        self._since_checkpoint += cost
+        self._idle.start()
+
+    def _on_command(self):
+        if self._ignored():
+            return
+        # One edit (a format change over many blocks, say) can add many steps
+        depth = self._doc.availableUndoSteps()
+        cost = max(1, depth - self._depth) * BYTES_PER_COMMAND
+        self._depth = depth
+        self._native_bytes += cost
+        self._since_checkpoint += cost
+        if self._need_base and not self._base_queued:
+            self._base_queued = True
+            QTimer.singleShot(0, self, self._take_base)
+        # A new step ends redo, and checkpoints of steps undone before it are off the path
+        if self._redo:
+            self._drop(self._redo)
+            self._redo = []
+        stale = [cp for cp in self._pending if cp.depth >= depth]
+        if stale:
+            self._drop(stale)
+            self._pending = [cp for cp in self._pending if cp.depth < depth]
+        if self._native_bytes > self.budget and not self._compact_queued:
+            # Not from inside the document's own undo bookkeeping
+            self._compact_queued = True
+            QTimer.singleShot(0, self, self.compact)
+
+    def _on_idle(self):
+        if self._since_checkpoint >= self.checkpoint_every() and not self._ignored():
+            self._pending.append(self._take())
+            self._since_checkpoint = 0
+
+    @traced("UndoHistory.baseline")
+    def _take_base(self):
+        """Checkpoint the state the document's own stack starts from.
+
+        Queued at the first edit after reset(): the document's stack is
+        stepped back to that state and forward again, normally one step.
+        """
+        self._base_queued = False
+        if not self._need_base or self._ignored():
+            return
+        self._need_base = False
+        steps = self._doc.availableUndoSteps()
+        cursor = self._view.textCursor()
+        anchor, position = cursor.anchor(), cursor.position()
+        scroll = self._view.verticalScrollBar().value()
+        self._loading = True
+        try:
+            for _ in range(steps):
+                self._doc.undo()
+            self._deep.insert(0, self._take())
+            for _ in range(steps):
+                self._doc.redo()
+        finally:
+            self._loading = False
+        cursor.setPosition(anchor)
+        cursor.setPosition(position, QTextCursor.KeepAnchor)
+        self._view.setTextCursor(cursor)
+        self._view.verticalScrollBar().setValue(scroll)
+
+    @traced("UndoHistory.checkpoint")
+    def _take(self) -> Checkpoint:
+        return self.store.add(self._doc.toHtml(), self._view.textCursor().position(),
+                              self._doc.availableUndoSteps())
+
+    def _load(self, cp: Checkpoint) -> bool:
+        try:
+            html = self.store.read(cp)
+        except (OSError, ValueError, zlib.error):
+            return False
+        self._idle.stop()
+        self._loading = True
+        try:
+            self._doc.setHtml(html)
+        finally:
+            self._loading = False
+        self._doc.clearUndoRedoStacks()
+        self._native_bytes = self._since_checkpoint = self._depth = 0
+        self._doc.setModified(True)
+        cursor = self._view.textCursor()
+        cursor.setPosition(min(cp.cursor, self._doc.characterCount() - 1))
+        self._view.setTextCursor(cursor)
+        self._view.ensureCursorVisible()
+        return True
+
+    def _drop(self, cps: List[Checkpoint]):
+        for cp in cps:
+            self.store.release(cp)
+
+    def _prune(self):
+        # Checkpoints the store had to let go are unreachable, and so is all before them
+        for i in range(len(self._deep) - 1, -1, -1):
+            if not self._deep[i].available():
+                self._drop(self._deep[:i + 1])
+                del self._deep[:i + 1]
+                break
+
+
+def _prune_undo_dir():
+    cutoff = time.time() - UNDO_SPILL_MAX_AGE_S
+    try:
+        names = os.listdir(UNDO_DIR)
+    except OSError:
+        return
+    for name in names:
+        p = os.path.join(UNDO_DIR, name)
+        try:
+            if os.path.getmtime(p) < cutoff:
+                os.remove(p)
+        except OSError:
+            pass
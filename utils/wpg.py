@@ -0,0 +1,145 @@
+import json
+import os
+import zipfile
+from datetime import datetime
+from html import escape
+from typing import Dict, Optional, Tuple
+from PySide6.QtGui import QTextDocument, QTextFormat, QImage, QPixmap
+from PySide6.QtCore import QBuffer, QByteArray, QIODevice, QUrl
+
+from .images import add_image, image_data
+
+WPG_EXT = ".wpg"
+WPG_FORMAT = 1
+
+# Members of a .wpg zip. Each reader opens only the one it needs: the editor
+# content.html plus images/, the home grid thumbnail.png, search text.txt.
+CONTENT = "content.html"
+TEXT = "text.txt"
+THUMBNAIL = "thumbnail.png"
+META = "meta.json"
+IMAGES = "images/"
+
+
+def is_wpg_path(path: str) -> bool:
+    return path.lower().endswith(WPG_EXT)
+
+
+def _png_bytes(img: QImage) -> bytes:
+    buf = QByteArray()
+    dev = QBuffer(buf)
+    dev.open(QIODevice.WriteOnly)
+    img.save(dev, "PNG")
+    dev.close()
+    return bytes(buf)
+
+
+def _image_names(doc: QTextDocument):
+    names = []
+    block = doc.begin()
+    while block.isValid():
+        it = block.begin()
+        while not it.atEnd():
+            fmt = it.fragment().charFormat()
+            if fmt.objectType() == QTextFormat.ImageObject or fmt.isImageFormat():
+                name = fmt.toImageFormat().name()
+                if name and name not in names:
+                    names.append(name)
+            it += 1
+        block = block.next()
+    return names
+
+
+def collect_images(doc: QTextDocument) -> Dict[str, Tuple[str, bytes]]:
+    """Image name in the document -> (member name, data) for every image that resolves."""
+    out = {}
+    for name in _image_names(doc):
+        if name.startswith(IMAGES):
+            member = name
+        else:
+            member = f"{IMAGES}{len(out) + 1}.png"
+        # Originals kept encoded by an ImageDocument are written as they are
+        res = image_data(doc, name)
+        if res is None:
+            res = doc.resource(QTextDocument.ImageResource, QUrl(name))
+        if isinstance(res, QPixmap):
+            res = res.toImage()
+        if isinstance(res, QImage) and not res.isNull():
+            out[name] = (member, _png_bytes(res))
+        elif isinstance(res, (bytes, QByteArray)) and len(res):
+            # Raw file data: keep the original encoding
+            ext = os.path.splitext(QUrl(name).path())[1].lower() or ".png"
+            out[name] = (os.path.splitext(member)[0] + ext, bytes(res))
+    return out
+
+
+def write_wpg(path: str, doc: QTextDocument, thumbnail: Optional[QImage] = None,
+              html: Optional[str] = None, images: Optional[Dict[str, Tuple[str, bytes]]] = None) -> str:
+    """Save `doc` as a .wpg container and return its plain-text extract.
+
+    `html` and `images` are doc.toHtml() and collect_images(doc) when the
+    caller already has them.
+    """
+    html = html if html is not None else doc.toHtml()
+    images = images if images is not None else collect_images(doc)
+    for name, (member, _) in images.items():
+        if member != name:
+            html = html.replace(f'src="{escape(name)}"', f'src="{member}"')
+    # Drop the object replacement characters that stand in for images
+    text = doc.toPlainText().replace("\ufffc", "")
+    meta = {
+        "format": WPG_FORMAT,
+        "title": doc.metaInformation(QTextDocument.DocumentTitle) or os.path.splitext(os.path.basename(path))[0],
+        "saved": datetime.now().isoformat(timespec="seconds"),
+        "chars": len(text),
+        "images": len(images),
+    }
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with zipfile.ZipFile(tmp, "w", zipfile.ZIP_DEFLATED) as z:
+        # meta and thumbnail first and uncompressed: cheap to reach without inflating the rest
+        z.writestr(META, json.dumps(meta, ensure_ascii=False), compress_type=zipfile.ZIP_STORED)
+        if thumbnail is not None and not thumbnail.isNull():
+            z.writestr(THUMBNAIL, _png_bytes(thumbnail), compress_type=zipfile.ZIP_STORED)
+        z.writestr(CONTENT, html)
+        z.writestr(TEXT, text)
+        for member, data in images.values():
+            # PNG/JPEG data does not shrink any further
+            z.writestr(member, data, compress_type=zipfile.ZIP_STORED)
+    os.replace(tmp, path)
+    return text
+
+
+def _read_member(path: str, member: str) -> Optional[bytes]:
+    with zipfile.ZipFile(path) as z:
+        try:
+            return z.read(member)
+        except KeyError:
+            return None
+
+
+def read_wpg_html(path: str) -> str:
+    return (_read_member(path, CONTENT) or b"").decode("utf-8", errors="ignore")
+
+
+def read_wpg_text(path: str) -> str:
+    return (_read_member(path, TEXT) or b"").decode("utf-8", errors="ignore")
+
+
+def read_wpg_thumbnail(path: str) -> Optional[bytes]:
+    return _read_member(path, THUMBNAIL)
+
+
+def read_wpg_meta(path: str) -> Dict:
+    data = _read_member(path, META)
+    return json.loads(data) if data else {}
+
+
+def load_wpg(path: str, doc: QTextDocument):
+    """Replace the contents of `doc` with the container at `path`, images included."""
+    with zipfile.ZipFile(path) as z:
+        html = z.read(CONTENT).decode("utf-8", errors="ignore")
+        doc.clear()
+        for info in z.infolist():
+            if info.filename.startswith(IMAGES) and not info.is_dir():
+                add_image(doc, info.filename, z.read(info))
+    doc.setHtml(html)